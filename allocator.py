@@ -0,0 +1,199 @@
+"""
+SmartRide Reservation Allocator
+Assigns pending reservations to concrete vehicles in one batch
+"""
+
+import time
+import logging
+from datetime import date, timedelta
+
+import availability
+import refdata
+import response_cache
+from db import get_pool
+
+logger = logging.getLogger(__name__)
+
+WINDOW_DAYS = 30
+CHUNK_SIZE = 500
+
+# Locks the batch so two concurrent runs cannot allocate the same rows
+PENDING_QUERY = """
+    SELECT ResID, VehicleTypeID, StartDate, EndDate
+    FROM Reservation
+    WHERE Status = 'PENDING' AND StartDate BETWEEN %s AND %s
+    ORDER BY EndDate, StartDate, ResID
+    FOR UPDATE
+"""
+# Same lock booking.py takes, so a booking can't slip onto a vehicle between
+# the conflict re-check and the confirm
+LOCK_VEHICLES = "SELECT VehicleID FROM Vehicle WHERE VehicleID IN ({placeholders}) ORDER BY VehicleID FOR UPDATE"
+# Assignments that clash with a booking committed after the index was built
+CONFLICTS = """
+    SELECT a.ResID
+    FROM ({assignments}) a
+    WHERE EXISTS (
+              SELECT 1 FROM Rental r
+              WHERE r.VehicleID = a.VehicleID AND r.Status IN ('ACTIVE', 'OVERDUE')
+                AND r.StartDate <= a.EndDate AND (r.DueDate >= a.StartDate OR r.Status = 'OVERDUE'))
+       OR EXISTS (
+              SELECT 1 FROM Reservation c
+              WHERE c.VehicleID = a.VehicleID AND c.Status = 'CONFIRMED'
+                AND c.StartDate <= a.EndDate AND c.EndDate >= a.StartDate)
+"""
+# One statement per chunk: the assignments are joined in as a derived table
+CONFIRM_UPDATE = """
+    UPDATE Reservation res
+    JOIN ({assignments}) a ON a.ResID = res.ResID
+    SET res.VehicleID = a.VehicleID, res.Status = 'CONFIRMED'
+    WHERE res.Status = 'PENDING'
+"""
+
+
+class AllocationReport:
+    """Outcome of one allocation run, with per-type utilization of the window"""
+
+    def __init__(self, window_start, window_end):
+        self.window_start = window_start
+        self.window_end = window_end
+        self.pending = 0
+        self.allocated = 0
+        self.unallocated = []
+        self.utilization = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def to_dict(self):
+        return {
+            'window_start': self.window_start.isoformat(),
+            'window_end': self.window_end.isoformat(),
+            'pending': self.pending,
+            'allocated': self.allocated,
+            'unallocated': self.unallocated,
+            'utilization': self.utilization,
+            'elapsed': round(self.elapsed, 3),
+        }
+
+
+def assign(reservations, index):
+    """Greedy interval scheduling: earliest end date first, best-fit vehicle.
+
+    ``reservations`` are ``(res_id, type_id, start, end)`` tuples. Each one
+    goes to the free vehicle of its type whose previous booking ends
+    closest before it starts (IntervalIndex.best_fit). ``index`` is updated
+    as we go so a vehicle is never handed out twice. Returns
+    ``(assignments, unallocated)`` where assignments are
+    ``(vehicle_id, res_id)`` pairs.
+    """
+    assignments, unallocated = [], []
+    for res_id, type_id, start, end in sorted(reservations, key=lambda r: (r[3], r[2], r[0])):
+        vehicle_id = index.best_fit(start, end, type_id)
+        if vehicle_id is None:
+            unallocated.append(res_id)
+            continue
+        index.add_booking(vehicle_id, start, end)
+        assignments.append((vehicle_id, res_id))
+    return assignments, unallocated
+
+
+def _assignments_sql(count):
+    """Derived table of ``count`` (ResID, VehicleID, StartDate, EndDate) rows"""
+    first = ("SELECT CAST(%s AS UNSIGNED) AS ResID, CAST(%s AS UNSIGNED) AS VehicleID, "
+             "CAST(%s AS DATE) AS StartDate, CAST(%s AS DATE) AS EndDate")
+    return ' UNION ALL '.join([first] + ["SELECT %s, %s, %s, %s"] * (count - 1))
+
+
+def _confirm(cursor, assignments, dates):
+    """Lock the chosen vehicles, drop assignments that now conflict, confirm the rest.
+
+    Returns the ResIDs that were dropped.
+    """
+    vehicle_ids = sorted({vehicle_id for vehicle_id, _ in assignments})
+    for chunk in _chunks(vehicle_ids, CHUNK_SIZE):
+        cursor.execute(LOCK_VEHICLES.format(placeholders=', '.join(['%s'] * len(chunk))), tuple(chunk))
+        cursor.fetchall()
+
+    dropped = set()
+    for chunk in _chunks(assignments, CHUNK_SIZE):
+        params = [value for vehicle_id, res_id in chunk for value in (res_id, vehicle_id) + dates[res_id]]
+        cursor.execute(CONFLICTS.format(assignments=_assignments_sql(len(chunk))), tuple(params))
+        dropped.update(row['ResID'] for row in cursor.fetchall())
+        confirmed = [(vehicle_id, res_id) for vehicle_id, res_id in chunk if res_id not in dropped]
+        if confirmed:
+            params = [value for vehicle_id, res_id in confirmed for value in (res_id, vehicle_id) + dates[res_id]]
+            cursor.execute(CONFIRM_UPDATE.format(assignments=_assignments_sql(len(confirmed))), tuple(params))
+    return dropped
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _utilization(index, window_start, window_end):
+    days = (window_end - window_start).days + 1
+    names = refdata.type_names()
+    rows = []
+    for type_id, (vehicles, booked) in sorted(index.utilization(window_start, window_end).items()):
+        capacity = vehicles * days
+        rows.append({
+            'type': names.get(type_id, str(type_id)),
+            'vehicles': vehicles,
+            'booked_days': booked,
+            'capacity_days': capacity,
+            'utilization': round(100.0 * booked / capacity, 1) if capacity else 0.0,
+        })
+    return rows
+
+
+def allocate(window_start=None, window_end=None, dry_run=False):
+    """Confirm PENDING reservations starting in the window against concrete vehicles.
+
+    Defaults to today through WINDOW_DAYS ahead; a window reaching back
+    before today starts today. Reservations that cannot be placed stay
+    PENDING and are listed in the report. Raises ValueError when the
+    window ends before it starts, e.g. entirely in the past.
+    """
+    window_start = max(window_start or date.today(), date.today())
+    window_end = window_end or window_start + timedelta(days=WINDOW_DAYS)
+    if window_end < window_start:
+        raise ValueError(f"allocation window must end on or after {window_start}")
+    report = AllocationReport(window_start, window_end)
+
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # The conflict re-check must see bookings committed while we waited for the locks
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+            cursor.execute(PENDING_QUERY, (window_start, window_end))
+            reservations = [(row['ResID'], row['VehicleTypeID'], row['StartDate'], row['EndDate'])
+                            for row in cursor.fetchall()]
+            report.pending = len(reservations)
+
+            index = availability.load_index()
+            assignments, report.unallocated = assign(reservations, index)
+            if assignments:
+                dates = {res_id: (start, end) for res_id, _, start, end in reservations}
+                dropped = _confirm(cursor, assignments, dates)
+                if dropped:
+                    assignments = [(vehicle_id, res_id) for vehicle_id, res_id in assignments
+                                   if res_id not in dropped]
+                    report.unallocated = sorted(set(report.unallocated) | dropped)
+            report.allocated = len(assignments)
+            report.utilization = _utilization(index, window_start, window_end)
+
+            if dry_run:
+                conn.rollback()
+            else:
+                conn.commit()
+        finally:
+            cursor.close()
+
+    if report.allocated and not dry_run:
+        availability.invalidate()
+        response_cache.invalidate_tag('vehicles')
+    return report.finish()
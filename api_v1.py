@@ -0,0 +1,319 @@
+"""
+SmartRide REST API v1
+JSON collections with field selection, filtering, keyset pagination and compression, plus batch returns
+"""
+
+import io
+import gzip
+import asyncio
+import hmac
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import Blueprint, Response, current_app, request, session
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+import async_db
+import filters
+import refdata
+import returns
+from pagination import decode_cursor, keyset_clause, keyset_page
+from vehicle_caches import invalidate_vehicle_caches
+
+logger = logging.getLogger(__name__)
+
+api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+# Smaller bodies cost more to compress than they save on the wire
+MIN_COMPRESS_BYTES = 1024
+
+
+class Resource:
+    """One collection: its table, the fields it exposes and the filters it accepts"""
+
+    def __init__(self, table, fields, defaults, equality_filters=None, vehicle_filters=False,
+                 admin_only=False, owner_column=None):
+        self.table = table
+        self.fields = fields                        # API name -> SQL expression; 'id' is the key
+        self.defaults = defaults                    # fields returned without ?fields=
+        self.equality_filters = equality_filters or {}  # query arg -> SQL column
+        self.vehicle_filters = vehicle_filters      # accepts the vehicle list filters
+        self.admin_only = admin_only
+        self.owner_column = owner_column            # customers only see their own rows
+
+    def where(self, args, customer_id):
+        clause, params = "", []
+        if self.vehicle_filters:
+            clause, params = filters.vehicle_filters(args.get('type', ''), args.get('status', ''),
+                                                     args.get('year', ''), args.get('price_range', ''))
+        for name, column in self.equality_filters.items():
+            if args.get(name):
+                clause += f" AND {column} = %s"
+                params.append(args[name])
+        if customer_id is not None:
+            clause += f" AND {self.owner_column} = %s"
+            params.append(customer_id)
+        return clause, params
+
+
+RESOURCES = {
+    'vehicles': Resource(
+        'Vehicle v',
+        {'id': 'v.VehicleID', 'type_id': 'v.TypeID', 'make': 'v.Make', 'model': 'v.Model',
+         'plate_no': 'v.PlateNo', 'year': 'v.Year', 'status': 'v.Status', 'rate_per_day': 'v.RatePerDay',
+         'updated_at': 'v.UpdatedAt'},
+        ['id', 'type_id', 'make', 'model', 'year', 'status', 'rate_per_day'],
+        vehicle_filters=True,
+    ),
+    'rentals': Resource(
+        'Rental r',
+        {'id': 'r.RentalID', 'vehicle_id': 'r.VehicleID', 'customer_id': 'r.CustomerID',
+         'start_date': 'r.StartDate', 'due_date': 'r.DueDate', 'return_date': 'r.ReturnDate',
+         'daily_rate': 'r.DailyRate', 'total_amount': 'r.TotalAmount', 'fine_amount': 'r.FineAmount',
+         'estimated_fine': 'r.EstimatedFine', 'status': 'r.Status', 'updated_at': 'r.UpdatedAt'},
+        ['id', 'vehicle_id', 'customer_id', 'start_date', 'due_date', 'return_date', 'total_amount', 'status'],
+        equality_filters={'status': 'r.Status', 'customer_id': 'r.CustomerID', 'vehicle_id': 'r.VehicleID'},
+        owner_column='r.CustomerID',
+    ),
+    'reservations': Resource(
+        'Reservation res',
+        {'id': 'res.ResID', 'customer_id': 'res.CustomerID', 'vehicle_type_id': 'res.VehicleTypeID',
+         'vehicle_id': 'res.VehicleID', 'reserved_on': 'res.ResDate', 'start_date': 'res.StartDate',
+         'end_date': 'res.EndDate', 'status': 'res.Status', 'updated_at': 'res.UpdatedAt'},
+        ['id', 'customer_id', 'vehicle_type_id', 'vehicle_id', 'start_date', 'end_date', 'status'],
+        equality_filters={'status': 'res.Status', 'customer_id': 'res.CustomerID'},
+        owner_column='res.CustomerID',
+    ),
+    # Never exposes Password
+    'customers': Resource(
+        'Customer c',
+        {'id': 'c.CustomerID', 'name': 'c.Name', 'email': 'c.Email', 'phone': 'c.Phone',
+         'license_no': 'c.LicenseNo', 'created_at': 'c.CreatedAt', 'updated_at': 'c.UpdatedAt'},
+        ['id', 'name', 'email', 'phone'],
+        equality_filters={'email': 'c.Email', 'license_no': 'c.LicenseNo'},
+        admin_only=True,
+    ),
+    'maintenance': Resource(
+        'Maintenance m',
+        {'id': 'm.MaintID', 'vehicle_id': 'm.VehicleID', 'date': 'm.Date', 'description': 'm.Description',
+         'cost': 'm.Cost', 'status': 'm.Status', 'updated_at': 'm.UpdatedAt'},
+        ['id', 'vehicle_id', 'date', 'description', 'cost', 'status'],
+        equality_filters={'status': 'm.Status', 'vehicle_id': 'm.VehicleID'},
+        admin_only=True,
+    ),
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        # Money as a number; integral amounts without the trailing .00
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, datetime):
+        return value.isoformat(timespec='seconds')
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def json_response(payload, status=200):
+    body = json.dumps(payload, default=_json_default, separators=(',', ':'), ensure_ascii=False)
+    return Response(body, status=status, mimetype='application/json')
+
+
+@api.errorhandler(ApiError)
+def _api_error(e):
+    return json_response({'error': e.message}, e.status)
+
+
+def _caller():
+    """``(is_admin, customer_id)`` for the session or bearer token; raises 401 otherwise"""
+    if 'admin_id' in session:
+        return True, None
+    token = current_app.config.get('API_TOKEN')
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return True, None
+    if 'customer_id' in session:
+        return False, session['customer_id']
+    raise ApiError(401, 'Unauthorized')
+
+
+def _resource(name):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        raise ApiError(404, f"Unknown collection '{name}'")
+    is_admin, customer_id = _caller()
+    if resource.admin_only and not is_admin:
+        raise ApiError(403, 'Forbidden')
+    # Customers see their own rentals and reservations, and the whole fleet
+    return resource, customer_id if resource.owner_column else None
+
+
+def _projection(resource):
+    """Requested field names and the SELECT list (the key is always fetched for paging)"""
+    requested = request.args.get('fields')
+    if requested:
+        names = list(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+        unknown = [name for name in names if name not in resource.fields]
+        if unknown:
+            raise ApiError(400, f"Unknown fields: {', '.join(unknown)}; "
+                                f"available: {', '.join(resource.fields)}")
+    else:
+        names = resource.defaults
+    selected = names if 'id' in names else ['id'] + names
+    return names, ', '.join(f"{resource.fields[name]} AS {name}" for name in selected)
+
+
+def _limit():
+    raw = request.args.get('limit', '').strip()
+    if not raw:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(raw)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise ApiError(400, 'limit must be a positive integer')
+    return min(limit, MAX_LIMIT)
+
+
+def _present(rows, names):
+    return [{name: row[name] for name in names} for row in rows]
+
+
+@api.route('/<name>')
+async def list_collection(name):
+    """``{"data": [...], "next_cursor": ...}``; pass next_cursor back as ?after= for the next page"""
+    resource, customer_id = _resource(name)
+    names, select = _projection(resource)
+    limit = _limit()
+    after = None
+    if request.args.get('after'):
+        after = decode_cursor(request.args['after'])
+        # Every collection pages on its integer id, so any other JSON value is forged
+        if not isinstance(after, int) or isinstance(after, bool):
+            raise ApiError(400, 'Malformed cursor')
+
+    # Vehicle type filters resolve through reference data, which may load from the database
+    where, params = await asyncio.to_thread(resource.where, request.args, customer_id)
+    seek_where, order_by, seek_params = keyset_clause(resource.fields['id'], after=after)
+    rows = await async_db.execute_query(
+        f"SELECT {select} FROM {resource.table} WHERE 1=1{where}{seek_where}{order_by} LIMIT %s",
+        tuple(params + seek_params + [limit + 1]), fetch_all=True)
+    if rows is None:
+        raise ApiError(500, 'Query failed')
+    rows, _, next_cursor = keyset_page(rows, limit, 'id', after=after)
+    return json_response({'data': _present(rows, names), 'next_cursor': next_cursor, 'limit': limit})
+
+
+@api.route('/<name>/<int:item_id>')
+async def get_item(name, item_id):
+    resource, customer_id = _resource(name)
+    names, select = _projection(resource)
+    where, params = resource.where({}, customer_id)
+    # fetch_all tells a missing row ([]) apart from a failed query (None)
+    rows = await async_db.execute_query(
+        f"SELECT {select} FROM {resource.table} WHERE {resource.fields['id']} = %s{where} LIMIT 1",
+        tuple([item_id] + params), fetch_all=True)
+    if rows is None:
+        raise ApiError(500, 'Query failed')
+    if not rows:
+        raise ApiError(404, 'Not found')
+    return json_response({'data': _present(rows, names)[0]})
+
+
+@api.route('/vehicle-types')
+async def vehicle_types():
+    """Reference data for type_id / vehicle_type_id fields"""
+    _caller()
+    names = await asyncio.to_thread(refdata.type_names)
+    return json_response({'data': [{'id': type_id, 'name': names[type_id]} for type_id in sorted(names)]})
+
+
+@api.route('/returns', methods=['POST'])
+def process_returns():
+    """Check in a batch of rentals (admin only).
+
+    Takes ``{"returns": [{"rental_id": 1, "return_date": "YYYY-MM-DD"}, ...],
+    "dry_run": false}`` or a text/csv body with RentalID and ReturnDate
+    columns; a missing return date means today. Responds with the
+    per-rental results. Like the admin form, items that don't parse are
+    rejected in the results (with their 1-based ``line``) and the rest
+    are still processed.
+    """
+    is_admin, _ = _caller()
+    if not is_admin:
+        raise ApiError(403, 'Forbidden')
+
+    dry_run = request.args.get('dry_run') == '1'
+    if request.mimetype == 'text/csv':
+        pairs, parse_errors = returns.parse_csv(io.StringIO(request.get_data(as_text=True)))
+    else:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get('returns'), list):
+            raise ApiError(400, 'Expected a JSON object with a "returns" list, or a text/csv body')
+        dry_run = dry_run or body.get('dry_run') is True
+        pairs, parse_errors = [], []
+        for position, item in enumerate(body['returns'], start=1):
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError('expected an object with rental_id and return_date')
+                pairs.append(returns.parse_pair(item.get('rental_id', ''), item.get('return_date')))
+            except ValueError as e:
+                parse_errors.append({'line': position, 'error': str(e)})
+    if not pairs and not parse_errors:
+        raise ApiError(400, 'No returns given')
+
+    try:
+        report = returns.process_returns(pairs, processed_by=session.get('admin_id'), dry_run=dry_run,
+                                         parse_errors=parse_errors)
+    except ValueError as e:
+        raise ApiError(400, str(e))
+    except Exception as e:
+        logger.error(f"Return processing failed: {e}")
+        raise ApiError(500, 'Return processing failed')
+    if report.returned and not dry_run:
+        invalidate_vehicle_caches()
+    return json_response(dict(report.to_dict(), dry_run=dry_run))
+
+
+def _accepted_encodings():
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        token, _, params = part.strip().partition(';')
+        if token and params.replace(' ', '') not in ('q=0', 'q=0.0'):
+            accepted.add(token.lower())
+    return accepted
+
+
+@api.after_request
+def _compress(response):
+    if (response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.content_length is None or response.content_length < MIN_COMPRESS_BYTES):
+        return response
+    accepted = _accepted_encodings()
+    if brotli is not None and 'br' in accepted:
+        encoding, body = 'br', brotli.compress(response.get_data(), quality=5)
+    elif 'gzip' in accepted:
+        encoding, body = 'gzip', gzip.compress(response.get_data(), compresslevel=6)
+    else:
+        response.vary.add('Accept-Encoding')
+        return response
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
@@ -6,8 +6,7 @@ Flask Application Main File
 --- FINAL CORRECTED AND COMPLETED VERSION ---
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
-from flask_mysqldb import MySQL
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, abort, current_app
 # WERKZEUG 3.0+ requires this new import
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
@@ -15,9 +14,38 @@ import os
 from functools import wraps
 import logging
 from dotenv import load_dotenv
+from markupsafe import Markup
 from admin_config import ADMIN_CREDENTIALS
 import io
-import csv
+import hmac
+import asyncio
+import itertools
+import click
+import async_db
+import db
+import allocator
+import api_v1
+import availability
+import booking
+import bulk_import
+import exports
+import fanout
+import filters
+import index_advisor
+import instrumentation
+import migrate
+import overdue
+import refdata
+import reports
+import response_cache
+import returns
+import rollup
+import stats_service
+from cache import TTLCache
+from db import execute_query, get_db_connection
+from pagination import decode_cursor, keyset_clause, keyset_page, page_window
+from search import hits_query
+from vehicle_caches import invalidate_vehicle_caches, vehicle_count_cache
 
 # Load environment variables
 load_dotenv()
@@ -32,10 +60,63 @@ app.config['MYSQL_USER'] = os.environ.get('MYSQL_USER', 'root')
 app.config['MYSQL_PASSWORD'] = os.environ.get('MYSQL_PASSWORD', 'your-mysql-password') # Make sure to set this
 app.config['MYSQL_DB'] = os.environ.get('MYSQL_DB', 'smartride_rental')
 app.config['MYSQL_PORT'] = int(os.environ.get('MYSQL_PORT', 3306))
-app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
-
-# Initialize MySQL
-mysql = MySQL(app)
+app.config['MYSQL_POOL_MIN_SIZE'] = int(os.environ.get('MYSQL_POOL_MIN_SIZE', 1))
+app.config['MYSQL_POOL_MAX_SIZE'] = int(os.environ.get('MYSQL_POOL_MAX_SIZE', 10))
+app.config['MYSQL_POOL_IDLE_TIMEOUT'] = int(os.environ.get('MYSQL_POOL_IDLE_TIMEOUT', 300))
+app.config['MYSQL_POOL_TIMEOUT'] = int(os.environ.get('MYSQL_POOL_TIMEOUT', 10))
+app.config['MYSQL_POOL_PING_INTERVAL'] = int(os.environ.get('MYSQL_POOL_PING_INTERVAL', 5))
+
+app.config['DASHBOARD_STATS_TTL'] = int(os.environ.get('DASHBOARD_STATS_TTL', 30))
+app.config['CUSTOMER_STATS_TTL'] = int(os.environ.get('CUSTOMER_STATS_TTL', 90))
+app.config['AVAILABILITY_TTL'] = int(os.environ.get('AVAILABILITY_TTL', 5))
+app.config['AVAILABILITY_INDEX_TTL'] = int(os.environ.get('AVAILABILITY_INDEX_TTL', 60))
+app.config['REFDATA_TTL'] = int(os.environ.get('REFDATA_TTL', 300))
+# Seconds between CacheVersion checks so workers notice each other's writes (0 = off)
+app.config['REFDATA_VERSION_CHECK'] = int(os.environ.get('REFDATA_VERSION_CHECK', 5))
+# Seconds between incremental DailyRollup refreshes (0 = only via the CLI)
+app.config['ROLLUP_REFRESH_INTERVAL'] = int(os.environ.get('ROLLUP_REFRESH_INTERVAL', 60))
+# Seconds between overdue sweeps (0 = only via the CLI) and rows per UPDATE batch
+app.config['OVERDUE_SWEEP_INTERVAL'] = int(os.environ.get('OVERDUE_SWEEP_INTERVAL', 300))
+app.config['OVERDUE_SWEEP_BATCH'] = int(os.environ.get('OVERDUE_SWEEP_BATCH', 500))
+# Statements slower than this are logged (0 = off); SERVER_TIMING adds the response header
+app.config['SLOW_QUERY_MS'] = int(os.environ.get('SLOW_QUERY_MS', 200))
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '1') == '1'
+# Lets a Prometheus scraper read /admin/metrics with "Authorization: Bearer <token>"
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN', '')
+# Threads (each borrowing a pooled connection) for running a page's independent
+# queries side by side, and the per-query time limit
+app.config['QUERY_FANOUT_WORKERS'] = int(os.environ.get('QUERY_FANOUT_WORKERS', 8))
+app.config['QUERY_TIMEOUT_MS'] = int(os.environ.get('QUERY_TIMEOUT_MS', 5000))
+# Page and fragment cache: seconds, per-worker LRU limits, or a shared Redis
+app.config['RESPONSE_CACHE_TTL'] = int(os.environ.get('RESPONSE_CACHE_TTL', 30))
+app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+app.config['RESPONSE_CACHE_MAX_BYTES'] = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+app.config['RESPONSE_CACHE_URL'] = os.environ.get('RESPONSE_CACHE_URL', '')
+# Seconds between reads of other workers' purges from CacheVersion (in-memory cache only; 0 = off)
+app.config['RESPONSE_CACHE_VERSION_CHECK'] = int(os.environ.get('RESPONSE_CACHE_VERSION_CHECK', 5))
+# Serve async views' queries from an aiomysql pool (run under asgi.py); 0 = the sync pool
+app.config['ASYNC_DB'] = os.environ.get('ASYNC_DB', '0') == '1'
+# The aiomysql pool is separate from the sync pool and counts towards the
+# server's max_connections too, so it has its own (smaller) limits
+app.config['ASYNC_DB_POOL_MIN_SIZE'] = int(os.environ.get('ASYNC_DB_POOL_MIN_SIZE', 1))
+app.config['ASYNC_DB_POOL_MAX_SIZE'] = int(os.environ.get('ASYNC_DB_POOL_MAX_SIZE', 5))
+# Lets partner integrations call /api/v1 with "Authorization: Bearer <token>" (admin scope)
+app.config['API_TOKEN'] = os.environ.get('API_TOKEN', '')
+# Start-up schema check: off, warn, require (refuse to start) or apply (run pending migrations)
+app.config['MIGRATIONS_CHECK'] = os.environ.get('MIGRATIONS_CHECK', 'warn')
+
+# Initialize the per-worker MySQL connection pool
+db.init_app(app)
+async_db.init_app(app)
+fanout.init_app(app)
+instrumentation.init_app(app)
+stats_service.init_app(app)
+refdata.init_app(app)
+availability.init_app(app)
+response_cache.init_app(app)
+rollup.init_app(app)
+overdue.init_app(app)
+app.register_blueprint(api_v1.api)
 
 # Logging configuration
 # ---MOVED--- logging.basicConfig(level=logging.INFO) --- THIS LINE WAS MOVED ---
@@ -49,7 +130,7 @@ def login_required(f):
         if 'customer_id' not in session:
             flash('Please log in to access this page.', 'warning')
             return redirect(url_for('customer_login'))
-        return f(*args, **kwargs)
+        return current_app.ensure_sync(f)(*args, **kwargs)
     return decorated_function
 
 def admin_required(f):
@@ -59,54 +140,59 @@ def admin_required(f):
         if 'admin_id' not in session:
             flash('Please log in as administrator to access this page.', 'error')
             return redirect(url_for('admin_login'))
-        return f(*args, **kwargs)
+        return current_app.ensure_sync(f)(*args, **kwargs)
     return decorated_function
 
 # Utility Functions
-def get_db_connection():
-    """Get database connection"""
+def parse_date_range(start, end):
+    """Parse a pair of YYYY-MM-DD strings; None unless both are valid and ordered"""
     try:
-        return mysql.connection
-    except Exception as e:
-        logger.error(f"Database connection error: {e}")
+        start_date = datetime.strptime(start, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
         return None
+    return (start_date, end_date) if start_date <= end_date else None
+
+CUSTOMER_STATS_QUERY = """
+    SELECT COALESCE(SUM(r.Status IN ('ACTIVE', 'OVERDUE')), 0) AS active_rentals,
+           COALESCE(SUM(r.Status = 'COMPLETED'), 0) AS completed_rentals,
+           COALESCE(SUM(CASE WHEN r.Status = 'COMPLETED'
+                             THEN r.TotalAmount + r.FineAmount END), 0) AS total_spent,
+           (SELECT COUNT(*) FROM Reservation res
+            WHERE res.CustomerID = %s AND res.Status = 'PENDING') AS pending_reservations
+    FROM Rental r
+    WHERE r.CustomerID = %s
+"""
 
-def execute_query(query, params=None, fetch_one=False, fetch_all=False):
-    """Execute database query safely and return lowercase dict keys"""
-    conn = get_db_connection()
-    if conn is None:
-        logger.error("Failed to get DB connection.")
-        return None
-    
-    try:
-        cursor = conn.cursor()  # This will be DictCursor due to app.config
-        cursor.execute(query, params or ())
-        
-        # This normalization is required by all your templates
-        def normalize_keys(row):
-            return {k.lower(): v for k, v in row.items()} if row else None
-
-        if fetch_one:
-            row = cursor.fetchone()
-            result = normalize_keys(row)
-        elif fetch_all:
-            rows = cursor.fetchall()
-            result = [normalize_keys(r) for r in rows]
-        else:
-            conn.commit()
-            result = cursor.lastrowid if cursor.description is None else cursor.rowcount
-        
-        cursor.close()
-        return result
-    except Exception as e:
-        logger.error(f"Query execution error: {e}")
-        conn.rollback()
-        return None
+def build_customer_stats(row):
+    """Customer dashboard counters from a CUSTOMER_STATS_QUERY row (one round-trip)"""
+    row = row or {}
+    return {
+        'active_rentals': int(row.get('active_rentals') or 0),
+        'completed_rentals': int(row.get('completed_rentals') or 0),
+        'pending_reservations': int(row.get('pending_reservations') or 0),
+        # Same figure as GetCustomerTotalSpending(), computed in the same scan
+        'total_spent': f"{row.get('total_spent') or 0:.2f}",
+    }
+
+# The stats poller asks every minute, so entries outlive one poll interval
+# and repeat polls (and their 304s) skip CUSTOMER_STATS_QUERY. The customer's
+# own bookings and reservations drop their entry; other changes (returns,
+# the overdue sweep) show up within CUSTOMER_STATS_TTL.
+customer_stats_cache = TTLCache(ttl=app.config['CUSTOMER_STATS_TTL'], maxsize=4096, name='customer-stats')
+
+def load_customer_stats(customer_id):
+    """Fresh counters for one customer; a failed query raises so it isn't cached"""
+    row = execute_query(CUSTOMER_STATS_QUERY, (customer_id, customer_id), fetch_one=True)
+    if row is None:
+        raise RuntimeError("Failed to load customer stats")
+    return build_customer_stats(row)
 
 # Routes
 
 # Home Routes
 @app.route('/')
+@response_cache.cached_page()
 def index():
     """Homepage"""
     return render_template('index.html')
@@ -170,6 +256,7 @@ def customer_register():
         )
         
         if result:
+            stats_service.invalidate()
             flash('Registration successful! Please log in.', 'success')
             return redirect(url_for('customer_login'))
         else:
@@ -194,51 +281,30 @@ def forgot_password():
 
 @app.route('/customer/dashboard')
 @login_required
-def customer_dashboard():
+async def customer_dashboard():
     """Customer dashboard"""
     customer_id = session['customer_id']
-    stats = {}
-    
-    stats['active_rentals'] = execute_query(
-        "SELECT COUNT(*) as count FROM Rental WHERE CustomerID = %s AND Status = 'ACTIVE'",
-        (customer_id,), fetch_one=True
-    )['count']
-    
-    stats['completed_rentals'] = execute_query(
-        "SELECT COUNT(*) as count FROM Rental WHERE CustomerID = %s AND Status = 'COMPLETED'",
-        (customer_id,), fetch_one=True
-    )['count']
-    
-    stats['pending_reservations'] = execute_query(
-        "SELECT COUNT(*) as count FROM Reservation WHERE CustomerID = %s AND Status = 'PENDING'",
-        (customer_id,), fetch_one=True
-    )['count']
-    
-    # Use the SQL Function
-    total_spent_result = execute_query(
-        "SELECT GetCustomerTotalSpending(%s) as total",
-        (customer_id,), fetch_one=True
-    )
-    total_spent = total_spent_result['total'] or 0
-    stats['total_spent'] = f"{total_spent:.2f}"
-    
-    current_rentals = execute_query(
-        """SELECT r.RentalID, r.StartDate, r.DueDate, v.Make, v.Model, v.PlateNo
-           FROM Rental r
-           JOIN Vehicle v ON r.VehicleID = v.VehicleID
-           WHERE r.CustomerID = %s AND r.Status = 'ACTIVE'
-           ORDER BY r.StartDate DESC LIMIT 5""",
-        (customer_id,), fetch_all=True
-    )
-    
-    upcoming_reservations = execute_query(
-        """SELECT res.ResID, res.StartDate, res.EndDate, res.ResDate, vt.Name as VehicleType
-           FROM Reservation res
-           JOIN VehicleType vt ON res.VehicleTypeID = vt.TypeID
-           WHERE res.CustomerID = %s AND res.Status = 'PENDING'
-           ORDER BY res.StartDate ASC LIMIT 5""",
-        (customer_id,), fetch_all=True
+    # Independent queries, issued concurrently when ASYNC_DB is on
+    stats_row, current_rentals, upcoming_reservations = await asyncio.gather(
+        async_db.execute_query(CUSTOMER_STATS_QUERY, (customer_id, customer_id), fetch_one=True),
+        async_db.execute_query(
+            """SELECT r.RentalID, r.StartDate, r.DueDate, v.Make, v.Model, v.PlateNo
+               FROM Rental r
+               JOIN Vehicle v ON r.VehicleID = v.VehicleID
+               WHERE r.CustomerID = %s AND r.Status IN ('ACTIVE', 'OVERDUE')
+               ORDER BY r.StartDate DESC LIMIT 5""",
+            (customer_id,), fetch_all=True
+        ),
+        async_db.execute_query(
+            """SELECT res.ResID, res.StartDate, res.EndDate, res.ResDate, vt.Name as VehicleType
+               FROM Reservation res
+               JOIN VehicleType vt ON res.VehicleTypeID = vt.TypeID
+               WHERE res.CustomerID = %s AND res.Status = 'PENDING'
+               ORDER BY res.StartDate ASC LIMIT 5""",
+            (customer_id,), fetch_all=True
+        ),
     )
+    stats = build_customer_stats(stats_row)
     
     return render_template('customer/dashboard.html',
                          customer={'name': session['customer_name']},
@@ -248,56 +314,59 @@ def customer_dashboard():
 
 @app.route('/customer/vehicles')
 @login_required
-def customer_vehicles():
+async def customer_vehicles():
     """Browse available vehicles"""
     vehicle_type = request.args.get('vehicle_type', '')
     price_range = request.args.get('price_range', '')
     year = request.args.get('year', '')
     status = request.args.get('status', 'AVAILABLE')
+    date_range = parse_date_range(request.args.get('start_date'), request.args.get('end_date'))
+    if date_range and status == 'AVAILABLE':
+        # "Available" means free for the requested dates, not free today
+        status = ''
     
-    query = """
-        SELECT v.VehicleID, v.Make, v.Model, v.Year, v.PlateNo, v.Status, v.RatePerDay,
-               vt.TypeID, vt.Name as TypeName
-        FROM Vehicle v
-        JOIN VehicleType vt ON v.TypeID = vt.TypeID
-        WHERE 1=1
-    """
-    params = []
-    
-    if vehicle_type:
-        query += " AND vt.Name = %s"
-        params.append(vehicle_type)
-    if status:
-        query += " AND v.Status = %s"
-        params.append(status)
-    if year:
-        query += " AND v.Year = %s"
-        params.append(year)
-    if price_range:
-        if price_range == '0-50':
-            query += " AND v.RatePerDay <= 50"
-        elif price_range == '51-100':
-            query += " AND v.RatePerDay BETWEEN 51 AND 100"
-        elif price_range == '101-200':
-            query += " AND v.RatePerDay BETWEEN 101 AND 200"
-        elif price_range == '201+':
-            query += " AND v.RatePerDay > 200"
-    
-    query += " ORDER BY v.RatePerDay ASC"
-    
-    vehicles = execute_query(query, tuple(params), fetch_all=True) or []
-    
-    vehicle_counts = {}
-    for vtype in ['Car', 'Bus', 'Bike', 'Scooter']:
-        count_result = execute_query(
-            "SELECT COUNT(*) as count FROM Vehicle v JOIN VehicleType vt ON v.TypeID = vt.TypeID WHERE vt.Name = %s AND v.Status = 'AVAILABLE'",
-            (vtype,), fetch_one=True
-        )
-        vehicle_counts[f"{vtype.lower()}_count"] = count_result['count']
+    # The rendered list depends only on the filters, so every customer shares it
+    list_args = {'vehicle_type': vehicle_type, 'price_range': price_range, 'year': year, 'status': status,
+                 'start_date': request.args.get('start_date', ''), 'end_date': request.args.get('end_date', '')}
+    # The fragment store (Redis, or CacheVersion polls for the shared tags) and the
+    # reference-data and availability caches block on I/O, so those calls run
+    # off the view's event loop
+    vehicle_list, cache_key = await asyncio.to_thread(
+        response_cache.get_fragment, 'customer_vehicles', list_args, tags=('vehicles',))
+    if vehicle_list is None:
+        # Type names come from the reference-data cache, so no VehicleType join
+        where, params = await asyncio.to_thread(filters.vehicle_filters, vehicle_type, status, year, price_range)
+        query = """
+            SELECT v.VehicleID, v.Make, v.Model, v.Year, v.PlateNo, v.Status, v.RatePerDay, v.TypeID
+            FROM Vehicle v
+            WHERE 1=1
+        """ + where + " ORDER BY v.RatePerDay ASC"
+
+        vehicles = await async_db.execute_query(query, tuple(params), fetch_all=True)
+        cacheable = vehicles is not None
+        vehicles = vehicles or []
+        free_ids = None
+        if date_range:
+            try:
+                free_ids = await asyncio.to_thread(availability.free_vehicle_ids, *date_range)
+                vehicles = [vehicle for vehicle in vehicles if vehicle['vehicleid'] in free_ids]
+            except RuntimeError as e:
+                logger.error(f"Availability index unavailable: {e}")
+                flash('Could not check availability for those dates. Please try again.', 'error')
+                vehicles = []
+                cacheable = False
+        type_names = await asyncio.to_thread(refdata.type_names)
+        for vehicle in vehicles:
+            vehicle['typename'] = type_names.get(vehicle['typeid'])
+
+        vehicle_list = render_template('customer/_vehicle_list.html', vehicles=vehicles, free_ids=free_ids)
+        if cacheable:
+            await asyncio.to_thread(response_cache.set_fragment, cache_key, vehicle_list)
     
+    available_counts = await asyncio.to_thread(availability.available_counts, *(date_range or ()))
     return render_template('customer/vehicles.html',
-                         vehicles=vehicles,
-                         **vehicle_counts)
+                         vehicle_list=Markup(vehicle_list),
+                         available_counts=available_counts)
 
 @app.route('/customer/booking/new', methods=['GET', 'POST'])
 @login_required
@@ -310,21 +379,33 @@ def new_booking():
             due_date = request.form['due_date']
             customer_id = session['customer_id']
             
-            # Use the SafeCreateRental stored procedure
-            # We use StaffID 1 (John Admin) as the default processor for customer-side bookings
-            params = (vehicle_id, customer_id, start_date, due_date, 1) 
-            result = execute_query(
-                "CALL SafeCreateRental(%s, %s, %s, %s, %s, @p_result, @p_rental_id)",
-                params
-            )
-            result_status = execute_query("SELECT @p_result as result, @p_rental_id as rental_id", fetch_one=True)
-
-            if result_status and result_status['result'] == 'SUCCESS':
-                flash(f"Booking successful! Your Rental ID is {result_status['rental_id']}.", 'success')
-                return redirect(url_for('customer_bookings'))
-            else:
-                flash(f"Booking failed: {result_status['result']}", 'error')
+            date_range = parse_date_range(start_date, due_date)
+            if not date_range:
+                flash('Please choose a valid start and end date.', 'error')
+                return redirect(url_for('new_booking', vehicle_id=vehicle_id))
+            idempotency_key = request.form.get('idempotency_key') or None
+            # Cheap pre-check against the in-memory index; the booking service re-checks
+            # under a row lock. A resubmitted form fails the pre-check, so look up its key.
+            if not availability.is_vehicle_free(vehicle_id, *date_range):
+                result = booking.find_booking(idempotency_key, customer_id) if idempotency_key else None
+                if result:
+                    flash(f"Booking successful! Your Rental ID is {result['rental_id']}.", 'success')
+                    return redirect(url_for('customer_bookings'))
+                flash('That vehicle is already booked for those dates.', 'error')
+                return redirect(url_for('new_booking', vehicle_id=vehicle_id))
+            
+            result = booking.create_booking(int(vehicle_id), customer_id, *date_range,
+                                            idempotency_key=idempotency_key)
+            if not result['replayed']:
+                invalidate_vehicle_caches(reindex=False)
+                customer_stats_cache.invalidate(customer_id)
+                availability.record_booking(vehicle_id, *date_range)
+            flash(f"Booking successful! Your Rental ID is {result['rental_id']}.", 'success')
+            return redirect(url_for('customer_bookings'))
+        except booking.BookingError as e:
+            flash(f"Booking failed: {e}", 'error')
         except Exception as e:
+            logger.error(f"Booking failed: {e}")
             flash(f"An error occurred: {e}", 'error')
         
         return redirect(url_for('new_booking', vehicle_id=request.form.get('vehicle_id')))
@@ -339,7 +420,8 @@ def new_booking():
             fetch_one=True
         )
         
-    return render_template('customer/booking_new.html', vehicle=vehicle)
+    return render_template('customer/booking_new.html', vehicle=vehicle,
+                         idempotency_key=booking.new_idempotency_key())
 
 @app.route('/customer/bookings')
 @login_required
@@ -380,6 +462,7 @@ def customer_reservations():
                 (customer_id, type_id, start_date, end_date)
             )
             if result:
+                customer_stats_cache.invalidate(customer_id)
                 flash('Reservation made successfully!', 'success')
             else:
                 flash('Failed to make reservation. Check dates.', 'error')
@@ -399,7 +482,7 @@ def customer_reservations():
         (customer_id,),
         fetch_all=True
     )
-    vehicle_types = execute_query("SELECT * FROM VehicleType", fetch_all=True)
+    vehicle_types = refdata.vehicle_types()
     return render_template('customer/reservations.html', 
                            reservations=reservations or [], 
                            vehicle_types=vehicle_types or [])
@@ -503,130 +586,101 @@ def admin_login():
 
 @app.route('/admin/dashboard')
 @admin_required
-def admin_dashboard():
+async def admin_dashboard():
     """Admin dashboard"""
-    stats = {}
-    
-    stats['total_vehicles'] = execute_query("SELECT COUNT(*) as count FROM Vehicle", fetch_one=True)['count']
-    
-    vehicle_status = execute_query("SELECT Status, COUNT(*) as count FROM Vehicle GROUP BY Status", fetch_all=True) or []
-    stats.setdefault('available_vehicles', 0)
-    stats.setdefault('rented_vehicles', 0)
-    stats.setdefault('maintenance_vehicles', 0)
-    for status in vehicle_status:
-        if status['status'] == 'AVAILABLE':
-            stats['available_vehicles'] = status['count']
-        elif status['status'] == 'RENTED':
-            stats['rented_vehicles'] = status['count']
-        elif status['status'] == 'MAINTENANCE':
-            stats['maintenance_vehicles'] = status['count']
-    
-    stats['active_rentals'] = execute_query("SELECT COUNT(*) as count FROM Rental WHERE Status = 'ACTIVE'", fetch_one=True)['count']
-    
-    # Use the View
-    stats['overdue_rentals'] = execute_query("SELECT COUNT(*) as count FROM vw_overdue_rentals", fetch_one=True)['count']
-    
-    stats['total_customers'] = execute_query("SELECT COUNT(*) as count FROM Customer", fetch_one=True)['count']
-    
-    monthly_revenue = execute_query(
-        "SELECT SUM(TotalAmount + FineAmount) as total FROM Rental WHERE Status='COMPLETED' AND MONTH(ReturnDate) = MONTH(CURDATE()) AND YEAR(ReturnDate) = YEAR(CURDATE())",
-        fetch_one=True
-    )['total'] or 0
-    stats['monthly_revenue'] = f"{monthly_revenue:.2f}"
-    
-    daily_revenue = execute_query(
-        "SELECT SUM(TotalAmount + FineAmount) as total FROM Rental WHERE Status='COMPLETED' AND DATE(ReturnDate) = CURDATE()",
-        fetch_one=True
-    )['total'] or 0
-    stats['daily_revenue'] = f"{daily_revenue:.2f}"
-    
-    recent_rentals = execute_query(
-        """SELECT r.RentalID, r.StartDate, r.DueDate, r.Status,
-                  c.Name as CustomerName, v.Make, v.Model
-           FROM Rental r
-           JOIN Customer c ON r.CustomerID = c.CustomerID
-           JOIN Vehicle v ON r.VehicleID = v.VehicleID
-           ORDER BY r.StartDate DESC LIMIT 10""",
-        fetch_all=True
-    ) or []
-    
-    vehicle_type_stats = execute_query(
-        """SELECT vt.Name, COUNT(v.VehicleID) as total,
-                  SUM(CASE WHEN v.Status = 'AVAILABLE' THEN 1 ELSE 0 END) as available
-           FROM VehicleType vt
-           LEFT JOIN Vehicle v ON vt.TypeID = v.TypeID
-           GROUP BY vt.TypeID, vt.Name""",
-        fetch_all=True
-    ) or []
-    
-    type_stats = {}
-    for stat in vehicle_type_stats:
-        type_name = stat['name'].lower()
-        type_stats[f"{type_name}_stats"] = {
-            'total': stat['total'] or 0,
-            'available': stat['available'] or 0
-        }
+    snapshot = await stats_service.get_admin_snapshot_async()
     
     return render_template('admin/dashboard.html',
                          admin={'name': session['admin_name']},
                          current_date=datetime.now().strftime('%Y-%m-%d'),
                          current_time=datetime.now().strftime('%H:%M:%S'),
-                         recent_rentals=recent_rentals,
-                         **stats,
-                         **type_stats)
+                         recent_rentals=snapshot['recent_rentals'],
+                         **snapshot['stats'],
+                         **snapshot['type_stats'])
 
 @app.route('/admin/vehicles')
 @admin_required
 def admin_vehicles():
-    """Admin vehicle management"""
+    """Admin vehicle management
+
+    Pages with opaque keyset cursors on VehicleID (``after``/``before``);
+    ``page=N`` still jumps via OFFSET for the windowed page links and for
+    relevance-ranked search results.
+    """
     vehicle_type = request.args.get('type', '')
     status = request.args.get('status', '')
-    search = request.args.get('search', '')
-    page = int(request.args.get('page', 1))
+    search = request.args.get('search', '').strip()
+    # Ranked search results page by OFFSET; plain listings use keyset cursors
+    after = None if search else decode_cursor(request.args.get('after'))
+    before = None if search else decode_cursor(request.args.get('before'))
+    cursor_mode = after is not None or before is not None
+    page = 1 if cursor_mode else max(1, request.args.get('page', 1, type=int) or 1)
     per_page = 20
 
-    base_query = """
+    params = []
+    hits = hits_query('vehicle', search)
+    if hits:
+        base_query = f"""
+        FROM ({hits[0]}) s
+        JOIN Vehicle v ON v.VehicleID = s.VehicleID
+        WHERE 1=1
+    """
+        params.extend(hits[1])
+    else:
+        base_query = """
         FROM Vehicle v
-        JOIN VehicleType vt ON v.TypeID = vt.TypeID
         WHERE 1=1
     """
-    params = []
 
-    if vehicle_type:
-        base_query += " AND vt.Name = %s"
-        params.append(vehicle_type)
-    if status:
-        base_query += " AND v.Status = %s"
-        params.append(status)
-    if search:
-        base_query += " AND (v.Make LIKE %s OR v.Model LIKE %s OR v.PlateNo LIKE %s)"
-        search_param = f"%{search}%"
-        params.extend([search_param, search_param, search_param])
-
-    # Count query
-    count_query = "SELECT COUNT(*) AS count " + base_query
-    count_result = execute_query(count_query, tuple(params), fetch_one=True)
-    total_vehicles = count_result['count'] if count_result else 0
-    
-    # Pagination
-    offset = (page - 1) * per_page
+    where, where_params = filters.vehicle_filters(vehicle_type, status)
+    base_query += where
+    params.extend(where_params)
+
+    # Count query, cached per filter combination
+    def count_vehicles():
+        count_result = execute_query("SELECT COUNT(*) AS count " + base_query, tuple(params), fetch_one=True)
+        return count_result['count'] if count_result else 0
+    total_vehicles = vehicle_count_cache.get((vehicle_type, status, search), count_vehicles)
     total_pages = (total_vehicles + per_page - 1) // per_page if total_vehicles > 0 else 1
     
     # Data query
+    if hits:
+        seek_where, order_by, seek_params = "", " ORDER BY s.relevance DESC, v.VehicleID ASC", []
+    else:
+        seek_where, order_by, seek_params = keyset_clause('v.VehicleID', after=after, before=before)
     data_query = """
         SELECT 
             v.VehicleID, v.Make, v.Model, v.Year, v.PlateNo, v.Status, 
-            v.RatePerDay, vt.Name as TypeName
-    """ + base_query + f" ORDER BY v.VehicleID ASC LIMIT {per_page} OFFSET {offset}"
+            v.RatePerDay, v.TypeID
+    """ + base_query + seek_where + order_by + " LIMIT %s"
+    query_params = params + seek_params + [per_page + 1]
+    if not cursor_mode and page > 1:
+        data_query += " OFFSET %s"
+        query_params.append((page - 1) * per_page)
     
-    vehicles = execute_query(data_query, tuple(params), fetch_all=True) or []
+    rows = execute_query(data_query, tuple(query_params), fetch_all=True) or []
+    vehicles, prev_cursor, next_cursor = keyset_page(
+        rows, per_page, 'vehicleid', after=after, before=before,
+        has_prev=None if cursor_mode else page > 1
+    )
+    if hits:
+        # Relevance order has no stable key to seek on; use the page links
+        prev_cursor = next_cursor = None
+    type_names = refdata.type_names()
+    for vehicle in vehicles:
+        vehicle['typename'] = type_names.get(vehicle['typeid'])
     
+    filter_args = {k: v for k, v in (('type', vehicle_type), ('status', status), ('search', search)) if v}
     return render_template(
         'admin/vehicles.html',
         vehicles=vehicles,
         total_vehicles=total_vehicles,
-        page=page,
-        total_pages=total_pages
+        page=None if cursor_mode else page,
+        total_pages=total_pages,
+        page_window=page_window(page, total_pages) if not cursor_mode else [],
+        prev_cursor=prev_cursor,
+        next_cursor=next_cursor,
+        filter_args=filter_args
     )
 
 @app.route('/admin/vehicles/add', methods=['GET', 'POST'])
@@ -649,6 +703,7 @@ def admin_add_vehicle():
                 (type_id, make, model, plate_no, year, rate)
             )
             if result:
+                invalidate_vehicle_caches()
                 flash('Vehicle added successfully!', 'success')
                 return redirect(url_for('admin_vehicles'))
             else:
@@ -659,7 +714,7 @@ def admin_add_vehicle():
         return redirect(url_for('admin_add_vehicle'))
 
     # GET Request
-    vehicle_types = execute_query("SELECT * FROM VehicleType ORDER BY Name", fetch_all=True)
+    vehicle_types = refdata.vehicle_types()
     return render_template('admin/vehicle_add.html', vehicle_types=vehicle_types or [])
 
 @app.route('/admin/vehicles/<int:vehicle_id>')
@@ -706,6 +761,7 @@ def admin_edit_vehicle(vehicle_id):
                 (type_id, make, model, plate_no, year, rate, status, vehicle_id)
             )
             if result:
+                invalidate_vehicle_caches()
                 flash('Vehicle updated successfully!', 'success')
             else:
                 flash('Failed to update vehicle. Plate No. may already exist.', 'error')
@@ -724,7 +780,7 @@ def admin_edit_vehicle(vehicle_id):
         flash('Vehicle not found.', 'error')
         return redirect(url_for('admin_vehicles'))
         
-    vehicle_types = execute_query("SELECT * FROM VehicleType ORDER BY Name", fetch_all=True)
+    vehicle_types = refdata.vehicle_types()
     return render_template('admin/vehicle_edit.html', vehicle=vehicle, vehicle_types=vehicle_types or [])
 
 @app.route('/admin/vehicles/<int:vehicle_id>/delete', methods=['POST'])
@@ -734,6 +790,7 @@ def admin_delete_vehicle(vehicle_id):
     try:
         result = execute_query("DELETE FROM Vehicle WHERE VehicleID = %s", (vehicle_id,))
         if result:
+            invalidate_vehicle_caches()
             flash('Vehicle deleted successfully.', 'success')
         else:
             flash('Failed to delete vehicle. It may be associated with rentals.', 'error')
@@ -755,6 +812,7 @@ def admin_vehicle_maintenance(vehicle_id):
         # This will trigger the tr_maintenance_update_vehicle_status trigger,
         # which sets the vehicle status to 'MAINTENANCE'.
         if result:
+            invalidate_vehicle_caches()
             return jsonify({'success': True, 'message': 'Vehicle set to maintenance.'})
         else:
             return jsonify({'success': False, 'message': 'Failed to create maintenance record.'}), 500
@@ -765,55 +823,93 @@ def admin_vehicle_maintenance(vehicle_id):
 @admin_required
 def admin_export_vehicles():
     """Export vehicles to CSV"""
-    vehicles = execute_query(
-        """
-        SELECT v.VehicleID, vt.Name as Type, v.Make, v.Model, v.Year, v.PlateNo, v.RatePerDay, v.Status
-        FROM Vehicle v
-        JOIN VehicleType vt ON v.TypeID = vt.TypeID
-        ORDER BY v.VehicleID
-        """,
-        fetch_all=True
+    return admin_export('vehicles')
+
+@app.route('/admin/export/<dataset>')
+@admin_required
+def admin_export(dataset):
+    """Stream a table export as CSV (``?gzip=1`` for a compressed download)"""
+    if dataset not in exports.EXPORTS:
+        abort(404)
+    compress = request.args.get('gzip') == '1'
+    
+    try:
+        filename, chunks = exports.export_stream(dataset, compress=compress)
+        # Pull the first chunk now so query errors surface before headers are sent
+        first = next(chunks, b'')
+    except Exception as e:
+        logger.error(f"Export of {dataset} failed: {e}")
+        flash(f'Failed to export {dataset}.', 'error')
+        return redirect(url_for('admin_dashboard'))
+    
+    return Response(
+        itertools.chain([first], chunks),
+        mimetype='application/gzip' if compress else 'text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
     )
+
+@app.route('/admin/import/<kind>', methods=['GET', 'POST'])
+@admin_required
+def admin_bulk_import(kind):
+    """Bulk import vehicles or customers from an uploaded CSV"""
+    if kind not in bulk_import.IMPORTERS:
+        abort(404)
     
-    if not vehicles:
-        flash('No vehicles to export.', 'info')
-        return redirect(url_for('admin_vehicles'))
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Please choose a CSV file to import.', 'error')
+            return redirect(url_for('admin_bulk_import', kind=kind))
+        try:
+            stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+            report = bulk_import.IMPORTERS[kind](stream, dry_run=request.form.get('dry_run') == '1').to_dict()
+        except Exception as e:
+            logger.error(f"Bulk import of {kind} failed: {e}")
+            flash(f'Import failed: {e}', 'error')
+            return redirect(url_for('admin_bulk_import', kind=kind))
         
-    output = io.StringIO()
-    writer = csv.writer(output)
+        if report['inserted']:
+            invalidate_vehicle_caches()
+            flash(f"Imported {report['inserted']} {kind}.", 'success')
+        if report['error_count']:
+            flash(f"{report['error_count']} rows were rejected.", 'warning')
     
-    # Write header
-    writer.writerow(vehicles[0].keys())
-    # Write data
-    for vehicle in vehicles:
-        writer.writerow(vehicle.values())
-        
-    output.seek(0)
-    return (
-        output.getvalue(),
-        200,
-        {
-            'Content-Type': 'text/csv',
-            'Content-Disposition': 'attachment; filename="vehicles_export.csv"',
-        },
-    )
+    return render_template('admin/import.html', kind=kind, report=report)
 
 @app.route('/admin/customers')
 @admin_required
 def admin_customers():
     """Show all customers"""
-    search = request.args.get('search', '')
-    query = "SELECT * FROM Customer"
+    search = request.args.get('search', '').strip()
+    page = max(1, request.args.get('page', 1, type=int) or 1)
+    per_page = 25
     params = []
     
-    if search:
-        query += " WHERE Name LIKE %s OR Email LIKE %s OR LicenseNo LIKE %s"
-        search_param = f"%{search}%"
-        params.extend([search_param, search_param, search_param])
-        
-    query += " ORDER BY Name"
-    customers = execute_query(query, tuple(params), fetch_all=True)
-    return render_template('admin/customers.html', customers=customers or [])
+    hits = hits_query('customer', search)
+    if hits:
+        base_query = f" FROM ({hits[0]}) s JOIN Customer c ON c.CustomerID = s.CustomerID"
+        order_by = " ORDER BY s.relevance DESC, c.Name"
+        params.extend(hits[1])
+    else:
+        base_query = " FROM Customer c"
+        order_by = " ORDER BY c.Name"
+    
+    count_result = execute_query("SELECT COUNT(*) AS count" + base_query, tuple(params), fetch_one=True)
+    total_customers = count_result['count'] if count_result else 0
+    total_pages = (total_customers + per_page - 1) // per_page if total_customers > 0 else 1
+    
+    # Never select password hashes for the listing
+    query = ("SELECT c.CustomerID, c.Name, c.Email, c.Phone, c.LicenseNo, c.CreatedAt"
+             + base_query + order_by + " LIMIT %s OFFSET %s")
+    customers = execute_query(query, tuple(params + [per_page, (page - 1) * per_page]), fetch_all=True)
+    return render_template('admin/customers.html',
+                           customers=customers or [],
+                           total_customers=total_customers,
+                           page=page,
+                           total_pages=total_pages,
+                           page_window=page_window(page, total_pages),
+                           filter_args={'search': search} if search else {})
 
 @app.route('/admin/customers/add', methods=['GET', 'POST'])
 @admin_required
@@ -846,6 +942,7 @@ def admin_add_customer():
             )
             
             if result:
+                stats_service.invalidate()
                 flash('Customer added successfully!', 'success')
                 return redirect(url_for('admin_customers'))
             else:
@@ -863,42 +960,96 @@ def admin_rentals():
 @app.route('/admin/rentals/active')
 @admin_required
 def admin_active_rentals():
-    rentals = execute_query("SELECT * FROM vw_rental_history WHERE Status = 'ACTIVE' ORDER BY StartDate DESC", fetch_all=True)
+    # Late rentals are still out once the sweeper marks them OVERDUE; they show with their estimated fine
+    rentals = execute_query(
+        """
+        SELECT h.*, r.EstimatedFine
+        FROM vw_rental_history h
+        JOIN Rental r ON r.RentalID = h.RentalID
+        WHERE h.Status IN ('ACTIVE', 'OVERDUE')
+        ORDER BY h.StartDate DESC
+        """,
+        fetch_all=True
+    )
     return render_template('admin/rentals.html', rentals=rentals or [], title="Active Rentals")
 
 @app.route('/admin/rentals/overdue')
 @admin_required
 def admin_overdue_rentals():
-    rentals = execute_query("SELECT * FROM vw_overdue_rentals ORDER BY DaysOverdue DESC", fetch_all=True)
+    # Status is maintained by the overdue sweeper, so this is an idx_rental_status_due range scan
+    rentals = execute_query("SELECT * FROM vw_overdue_rentals ORDER BY DueDate", fetch_all=True)
     return render_template('admin/rentals.html', rentals=rentals or [], title="Overdue Rentals")
 
-@app.route('/admin/reservations')
-@admin_required
-def admin_reservations():
+def render_reservations(report=None):
+    """Reservation list, optionally with an allocation report"""
     reservations = execute_query(
         """
-        SELECT r.*, vt.Name as TypeName, c.Name as CustomerName
+        SELECT r.*, vt.Name as TypeName, c.Name as CustomerName, v.PlateNo
         FROM Reservation r
         JOIN VehicleType vt ON r.VehicleTypeID = vt.TypeID
         JOIN Customer c ON r.CustomerID = c.CustomerID
+        LEFT JOIN Vehicle v ON r.VehicleID = v.VehicleID
         ORDER BY r.StartDate DESC
         """,
         fetch_all=True
     )
-    return render_template('admin/reservations.html', reservations=reservations or [])
+    return render_template('admin/reservations.html', reservations=reservations or [], report=report)
+
+@app.route('/admin/reservations')
+@admin_required
+def admin_reservations():
+    return render_reservations()
+
+@app.route('/admin/reservations/allocate', methods=['POST'])
+@admin_required
+def admin_allocate_reservations():
+    """Assign vehicles to pending reservations in a date window"""
+    window = parse_date_range(request.form.get('start_date'), request.form.get('end_date'))
+    if (request.form.get('start_date') or request.form.get('end_date')) and not window:
+        flash('Please choose a valid allocation window.', 'error')
+        return redirect(url_for('admin_reservations'))
+    try:
+        report = allocator.allocate(*(window or ()), dry_run=request.form.get('dry_run') == '1').to_dict()
+    except ValueError as e:
+        flash(f'Please choose a valid allocation window: {e}.', 'error')
+        return redirect(url_for('admin_reservations'))
+    except Exception as e:
+        logger.error(f"Reservation allocation failed: {e}")
+        flash(f'Allocation failed: {e}', 'error')
+        return redirect(url_for('admin_reservations'))
+    
+    flash(f"Allocated {report['allocated']} of {report['pending']} pending reservations.", 'success')
+    if report['unallocated']:
+        flash(f"{len(report['unallocated'])} reservations could not be placed and remain pending.", 'warning')
+    return render_reservations(report)
 
 @app.route('/admin/reports')
 @admin_required
 def admin_reports():
-    """Generate reports"""
-    # Example: Use the cursor procedure
-    month = int(request.args.get('month', datetime.now().month))
-    year = int(request.args.get('year', datetime.now().year))
+    """Revenue report for a month or an arbitrary date range"""
+    today = datetime.now()
+    month = request.args.get('month', today.month, type=int)
+    year = request.args.get('year', today.year, type=int)
+    group_by = request.args.get('group_by', 'type')
+    if group_by not in reports.DIMENSIONS:
+        group_by = 'type'
     
-    execute_query(f"CALL GenerateMonthlyRevenueReport({month}, {year})")
-    report_data = execute_query("SELECT * FROM temp_monthly_report", fetch_all=True)
+    date_range = parse_date_range(request.args.get('start_date'), request.args.get('end_date'))
+    if not date_range:
+        if not 1 <= month <= 12 or not 2000 <= year <= 9999:
+            month, year = today.month, today.year
+        date_range = reports.month_range(year, month)
     
-    return render_template('admin/reports.html', report_data=report_data or [], month=month, year=year)
+    try:
+        report_data = reports.revenue_report(*date_range, group_by=group_by)
+    except RuntimeError as e:
+        logger.error(f"Revenue report failed: {e}")
+        flash('Could not generate the report. Please try again.', 'error')
+        report_data = []
+    
+    return render_template('admin/reports.html', report_data=report_data, report_month=month,
+                         report_year=year, start_date=date_range[0], end_date=date_range[1],
+                         group_by=group_by, dimensions=sorted(reports.DIMENSIONS))
 
 @app.route('/admin/admin-management')
 @admin_required
@@ -1014,11 +1165,46 @@ def admin_add_maintenance():
     """Stub for adding maintenance"""
     return render_template('admin/maintenance_add.html')
 
-@app.route('/admin/rentals/return')
+@app.route('/admin/rentals/return', methods=['GET', 'POST'])
 @admin_required
 def admin_process_return():
-    """Stub for processing returns"""
-    return render_template('admin/rentals_return.html')
+    """Check in a batch of rentals typed into the form or uploaded as a CSV"""
+    report = None
+    if request.method == 'POST':
+        default_date = request.form.get('return_date') or None
+        try:
+            default_date = default_date and datetime.strptime(default_date, '%Y-%m-%d').date()
+        except ValueError:
+            flash('Please choose a valid return date.', 'error')
+            return redirect(url_for('admin_process_return'))
+        
+        upload = request.files.get('file')
+        if upload and upload.filename:
+            stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+            pairs, parse_errors = returns.parse_csv(stream, default_date)
+        else:
+            pairs, parse_errors = returns.parse_lines(request.form.get('rentals', ''), default_date)
+        if not pairs and not parse_errors:
+            flash('Enter at least one rental ID or upload a CSV file.', 'error')
+            return redirect(url_for('admin_process_return'))
+        
+        # Lines that don't parse are reported with the other rejections
+        try:
+            report = returns.process_returns(pairs, processed_by=session.get('admin_id'),
+                                             dry_run=request.form.get('dry_run') == '1',
+                                             parse_errors=parse_errors).to_dict()
+        except Exception as e:
+            logger.error(f"Return processing failed: {e}")
+            flash(f'Return processing failed: {e}', 'error')
+            return redirect(url_for('admin_process_return'))
+        
+        if report['returned'] and request.form.get('dry_run') != '1':
+            invalidate_vehicle_caches()
+            flash(f"Processed {report['returned']} returns.", 'success')
+        if report['rejected']:
+            flash(f"{report['rejected']} returns were rejected.", 'warning')
+    
+    return render_template('admin/rentals_return.html', report=report, today=datetime.now().date())
 
 @app.route('/admin/reports/daily')
 @admin_required
@@ -1051,15 +1237,58 @@ def internal_server_error(e):
 
 # API Routes (for AJAX calls)
 @app.route('/api/dashboard/stats')
-def api_dashboard_stats():
-    """API endpoint for dashboard statistics"""
+async def api_dashboard_stats():
+    """API endpoint for dashboard statistics
+
+    Responses carry an ETag over the counters alone (the snapshot time
+    goes in X-Generated-At), so pollers sending If-None-Match get an
+    empty 304 while nothing has changed.
+    """
     if 'admin_id' not in session and 'customer_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    return jsonify({
-        'timestamp': datetime.now().isoformat(),
-        'status': 'success'
-    })
+    scope = request.args.get('scope')
+    if scope not in ('admin', 'customer'):
+        scope = 'admin' if 'admin_id' in session else 'customer'
+    
+    generated_at = None
+    if scope == 'admin' and 'admin_id' in session:
+        snapshot = await stats_service.get_admin_snapshot_async()
+        stats = snapshot['stats']
+        generated_at = snapshot['generated_at']
+    elif scope == 'customer' and 'customer_id' in session:
+        customer_id = session['customer_id']
+        try:
+            stats = await asyncio.to_thread(customer_stats_cache.get, customer_id,
+                                            lambda: load_customer_stats(customer_id))
+        except RuntimeError as e:
+            logger.error(f"Customer stats unavailable: {e}")
+            stats = build_customer_stats(None)
+    else:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    response = jsonify({'status': 'success', 'scope': scope, **stats})
+    response.add_etag()
+    if generated_at:
+        response.headers['X-Generated-At'] = generated_at
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+@app.route('/admin/metrics')
+def admin_metrics():
+    """Prometheus metrics for this worker: route and query latency histograms, pool gauges"""
+    token = app.config['METRICS_TOKEN']
+    authorized = 'admin_id' in session or (
+        token and hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"))
+    if not authorized:
+        abort(403)
+    return Response(instrumentation.render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/db/pool')
+@admin_required
+def api_db_pool_stats():
+    """API endpoint for connection pool statistics"""
+    return jsonify(db.get_pool().stats())
 
 # --- NEW FUNCTION TO FIX PASSWORDS ---
 def check_and_fix_passwords():
@@ -1097,14 +1326,182 @@ def check_and_fix_passwords():
         conn.rollback()
 
 
+# CLI Commands
+@app.cli.command('import-csv')
+@click.argument('kind', type=click.Choice(sorted(bulk_import.IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=bulk_import.BATCH_SIZE, show_default=True)
+@click.option('--dry-run', is_flag=True, help='Validate and roll back instead of committing.')
+def import_csv_command(kind, path, batch_size, dry_run):
+    """Bulk import vehicles or customers from a CSV file"""
+    with open(path, newline='', encoding='utf-8-sig') as stream:
+        report = bulk_import.IMPORTERS[kind](stream, batch_size=batch_size, dry_run=dry_run)
+    click.echo(f"{report.rows} rows read, {report.inserted} inserted, "
+               f"{report.error_count} rejected in {report.elapsed:.2f}s")
+    for error in report.errors:
+        click.echo(f"  line {error['line']}: {error['error']}", err=True)
+    if report.inserted:
+        invalidate_vehicle_caches()
+
+
+@app.cli.command('process-returns')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--date', 'return_date', type=click.DateTime(formats=['%Y-%m-%d']), help='Return date for rows without one (default today).')
+@click.option('--processed-by', type=int, help='StaffID recorded on the returned rentals.')
+@click.option('--dry-run', is_flag=True, help='Validate and roll back instead of committing.')
+def process_returns_command(path, return_date, processed_by, dry_run):
+    """Check in the rentals listed in a CSV file (RentalID, ReturnDate)"""
+    with open(path, newline='', encoding='utf-8-sig') as stream:
+        pairs, parse_errors = returns.parse_csv(stream, return_date and return_date.date())
+    report = returns.process_returns(pairs, processed_by=processed_by, dry_run=dry_run, parse_errors=parse_errors)
+    click.echo(f"{report.submitted} returns read, {report.returned} processed, {report.rejected} rejected, "
+               f"{report.total_fines} in fines in {report.elapsed:.2f}s")
+    for result in report.results:
+        if result['status'] == 'rejected':
+            where = f"line {result['line']}" if 'line' in result else f"rental {result['rental_id']}"
+            click.echo(f"  {where}: {result['error']}", err=True)
+    if report.returned and not dry_run:
+        invalidate_vehicle_caches()
+
+
+@app.cli.command('allocate-reservations')
+@click.option('--start', 'window_start', type=click.DateTime(formats=['%Y-%m-%d']), help='Window start (default today).')
+@click.option('--end', 'window_end', type=click.DateTime(formats=['%Y-%m-%d']), help='Window end (default start + 30 days).')
+@click.option('--dry-run', is_flag=True, help='Compute assignments and roll back instead of committing.')
+def allocate_reservations_command(window_start, window_end, dry_run):
+    """Assign vehicles to pending reservations in a date window"""
+    try:
+        report = allocator.allocate(window_start and window_start.date(), window_end and window_end.date(),
+                                    dry_run=dry_run)
+    except ValueError as e:
+        click.echo(str(e), err=True)
+        raise SystemExit(1)
+    click.echo(f"{report.window_start} to {report.window_end}: {report.allocated} of {report.pending} "
+               f"pending reservations allocated in {report.elapsed:.3f}s")
+    if report.unallocated:
+        click.echo(f"  unallocated: {', '.join(str(res_id) for res_id in report.unallocated)}", err=True)
+    for row in report.utilization:
+        click.echo(f"  {row['type']:<10} {row['vehicles']:>4} vehicles  "
+                   f"{row['booked_days']:>6}/{row['capacity_days']:<6} vehicle-days  {row['utilization']:5.1f}%")
+
+
+@app.cli.command('refdata-invalidate')
+def refdata_invalidate_command():
+    """Tell every worker to reload cached reference data"""
+    bumped = refdata.invalidate()
+    if bumped:
+        click.echo('Reference data version bumped.')
+    elif bumped is None:
+        click.echo('Could not bump the reference data version; see the log.', err=True)
+        raise SystemExit(1)
+    else:
+        click.echo('REFDATA_VERSION_CHECK is 0, so there is no shared version to bump; '
+                   f"other workers reload within REFDATA_TTL ({app.config['REFDATA_TTL']}s).")
+
+
+@app.cli.command('rollup-refresh')
+def rollup_refresh_command():
+    """Bring the DailyRollup table up to date"""
+    rebuilt = rollup.refresh()
+    if rebuilt is None:
+        click.echo('Another worker is refreshing the rollup.')
+    else:
+        click.echo(f"Rollup rebuilt from {rebuilt[0] or 'the first rental'} to {rebuilt[1]}.")
+
+
+@app.cli.command('rollup-backfill')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), help='First day (default first rental).')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), help='Last day (default today).')
+def rollup_backfill_command(start, end):
+    """Rebuild DailyRollup rows for a date range"""
+    written = rollup.backfill(start and start.date(), end and end.date())
+    click.echo(f"{written} rollup rows written.")
+
+
+@app.cli.command('sweep-overdue')
+@click.option('--batch-size', default=overdue.BATCH_SIZE, show_default=True)
+def sweep_overdue_command(batch_size):
+    """Mark rentals past their due date as OVERDUE and refresh fine estimates"""
+    report = overdue.sweep(batch_size)
+    if report is None:
+        click.echo('Another worker is sweeping overdue rentals.')
+        return
+    click.echo(f"{report.marked} rentals marked overdue, {report.fines_updated} fine estimates updated "
+               f"in {report.batches} batches, {report.started} vehicles marked rented ({report.elapsed:.3f}s)")
+
+
+@app.cli.command('index-advisor')
+@click.option('--min-rows', default=index_advisor.MIN_ROWS, show_default=True,
+              help='Ignore plan rows estimated to read fewer rows than this.')
+@click.option('--ignore', multiple=True, help='Endpoint to leave out (repeatable).')
+@click.option('--verbose', is_flag=True, help='List every page crawled and query seen.')
+def index_advisor_command(min_rows, ignore, verbose):
+    """EXPLAIN the queries every GET page issues; exits 1 on full scans or filesorts"""
+    report = index_advisor.check(app, min_rows=min_rows, ignore=ignore)
+    if verbose:
+        for endpoint, url, status in report.pages:
+            click.echo(f"  {status} {url} ({endpoint})")
+        for endpoint, reason in report.skipped:
+            click.echo(f"  skipped {endpoint}: {reason}")
+    click.echo(f"{len(report.pages)} pages crawled, {len(report.queries)} distinct queries, "
+               f"{len(report.findings)} findings")
+    for finding in report.findings:
+        click.echo(f"  {finding}", err=True)
+        if verbose:
+            click.echo(f"    {index_advisor.normalize(finding.query)}", err=True)
+    if not report.ok:
+        raise SystemExit(1)
+
+
+@app.cli.command('db-migrate')
+@click.option('--target', type=int, help='Stop after this migration version.')
+@click.option('--dry-run', is_flag=True, help='Print the pending statements without running them.')
+def db_migrate_command(target, dry_run):
+    """Apply pending schema migrations from migrations/"""
+    try:
+        report = migrate.migrate(target=target, dry_run=dry_run)
+    except migrate.MigrationError as e:
+        click.echo(str(e), err=True)
+        raise SystemExit(1)
+    if not report.applied:
+        click.echo('Schema is up to date.')
+    for migration, statements, elapsed in report.applied:
+        if dry_run:
+            click.echo(f"-- {migration}")
+            for statement in statements:
+                click.echo(f"{statement};")
+        else:
+            click.echo(f"Applied {migration} ({len(statements)} statements, {elapsed:.2f}s)")
+
+
+@app.cli.command('db-migrations')
+def db_migrations_command():
+    """List schema migrations and whether each has been applied"""
+    for migration, state in migrate.status():
+        click.echo(f"  {state:<10} {migration}")
+
+
+@app.cli.command('db-baseline')
+@click.argument('version', type=int)
+def db_baseline_command(version):
+    """Mark migrations up to VERSION as applied without running them"""
+    recorded = migrate.baseline(version)
+    click.echo(f"Recorded {len(recorded)} migrations as applied.")
+
+
 # Database initialization
 def init_db():
     """Initialize database tables"""
     try:
         with app.app_context():
+            db.get_pool().warm_up()
             conn = get_db_connection()
             if conn:
                 logger.info("Database connection successful")
+                mode = app.config['MIGRATIONS_CHECK']
+                if not migrate.check(mode) and mode == 'require':
+                    logger.error("Database schema is behind migrations/; run `flask db-migrate`")
+                    return False
                 # --- ADDED PASSWORD FIX CALL ---
                 check_and_fix_passwords()
                 return True
@@ -0,0 +1,11 @@
+"""
+SmartRide ASGI Entry Point
+Serves the Flask app under an ASGI server: uvicorn asgi:asgi_app --workers 4
+"""
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app
+
+# Set ASYNC_DB=1 so the async views query the aiomysql pool
+asgi_app = WsgiToAsgi(app)
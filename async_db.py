@@ -0,0 +1,139 @@
+"""
+SmartRide Async Data Access
+aiomysql pool on a dedicated event loop, with an awaitable execute_query for async views
+"""
+
+import time
+import asyncio
+import logging
+import threading
+
+import aiomysql
+
+import db
+import fanout
+
+logger = logging.getLogger(__name__)
+
+# Flask runs every async view on its own short-lived event loop, and an
+# aiomysql pool belongs to the loop that created it, so the pool lives on
+# one long-lived loop thread and views hand their statements to it.
+_state = {'loop': None, 'thread': None, 'pool': None, 'checkout_timeout': 10}
+
+
+def enabled():
+    """True once init_app() has started the async pool (ASYNC_DB=1)"""
+    return _state['pool'] is not None
+
+
+async def _execute(query, params, fetch_one, fetch_all):
+    conn = await asyncio.wait_for(_state['pool'].acquire(), _state['checkout_timeout'])
+    try:
+        async with conn.cursor() as cursor:
+            started = time.perf_counter()
+            await cursor.execute(query, params or ())
+            if fetch_one:
+                result = db._normalize_keys(await cursor.fetchone())
+            elif fetch_all:
+                result = [db._normalize_keys(row) for row in await cursor.fetchall()]
+            else:
+                # autocommit pool, so writes are committed like db.execute_query's
+                result = cursor.lastrowid if cursor.description is None else cursor.rowcount
+            return result, time.perf_counter() - started
+    finally:
+        _state['pool'].release(conn)
+
+
+async def execute_query(query, params=None, fetch_one=False, fetch_all=False):
+    """Awaitable db.execute_query: same arguments, lowercase dict keys, None on error.
+
+    Without ASYNC_DB the statement runs on the fan-out thread pool, so
+    gathered queries still overlap on separate sync pool connections.
+    """
+    loop = _state['loop']
+    if not enabled():
+        try:
+            return await asyncio.wrap_future(fanout.submit(query, params, fetch_one=fetch_one, fetch_all=fetch_all))
+        except Exception as e:
+            logger.error(f"Query execution error: {e}")
+            return None
+    try:
+        if asyncio.get_running_loop() is loop:
+            result, elapsed = await _execute(query, params, fetch_one, fetch_all)
+        else:
+            future = asyncio.run_coroutine_threadsafe(_execute(query, params, fetch_one, fetch_all), loop)
+            result, elapsed = await asyncio.wrap_future(future)
+    except Exception as e:
+        logger.error(f"Async query execution error: {e}")
+        return None
+    # Reported from the caller's context so per-request counters see it
+    db.notify_query_listeners(query, params, elapsed)
+    return result
+
+
+async def gather_queries(queries):
+    """Run named (sql, fetch_all) queries concurrently; returns {name: result}"""
+    results = await asyncio.gather(*(
+        execute_query(sql, fetch_all=fetch_all, fetch_one=not fetch_all)
+        for sql, fetch_all in queries.values()
+    ))
+    return dict(zip(queries, results))
+
+
+def run(coroutine):
+    """Run ``coroutine`` on the async pool's loop from synchronous code and wait for it"""
+    return asyncio.run_coroutine_threadsafe(coroutine, _state['loop']).result()
+
+
+def close():
+    """Close the async pool and stop its loop"""
+    loop, pool = _state['loop'], _state['pool']
+    if loop is None:
+        return
+    _state['pool'] = None
+
+    async def shutdown():
+        pool.close()
+        await pool.wait_closed()
+
+    try:
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=5)
+    except Exception as e:
+        logger.error(f"Async pool shutdown error: {e}")
+    loop.call_soon_threadsafe(loop.stop)
+    _state['loop'] = _state['thread'] = None
+
+
+def init_app(app):
+    """Start the aiomysql pool on its loop thread when ASYNC_DB is set.
+
+    Sized by ASYNC_DB_POOL_MIN_SIZE/MAX_SIZE, on top of the sync pool,
+    which still serves the sync views.
+    """
+    if not app.config.get('ASYNC_DB') or enabled():
+        return None
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name='async-db', daemon=True)
+    thread.start()
+    create = aiomysql.create_pool(
+        host=app.config['MYSQL_HOST'],
+        user=app.config['MYSQL_USER'],
+        password=app.config['MYSQL_PASSWORD'],
+        db=app.config['MYSQL_DB'],
+        port=app.config['MYSQL_PORT'],
+        charset=app.config.get('MYSQL_CHARSET', 'utf8'),
+        autocommit=True,
+        minsize=app.config.get('ASYNC_DB_POOL_MIN_SIZE', 1),
+        maxsize=app.config.get('ASYNC_DB_POOL_MAX_SIZE', 5),
+        pool_recycle=app.config['MYSQL_POOL_IDLE_TIMEOUT'],
+        cursorclass=aiomysql.DictCursor,
+    )
+    try:
+        pool = asyncio.run_coroutine_threadsafe(create, loop).result()
+    except Exception as e:
+        logger.error(f"Async database pool unavailable, using the sync pool: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        return None
+    _state.update(loop=loop, thread=thread, pool=pool,
+                  checkout_timeout=app.config['MYSQL_POOL_TIMEOUT'])
+    return pool
@@ -0,0 +1,281 @@
+"""
+SmartRide Availability
+Per-type availability counts and a date-range interval index over bookings
+"""
+
+import bisect
+import logging
+import threading
+from datetime import date
+
+import refdata
+from cache import TTLCache
+from db import execute_query
+
+logger = logging.getLogger(__name__)
+
+AVAILABLE_BY_TYPE_QUERY = """
+    SELECT TypeID, COUNT(*) AS available
+    FROM Vehicle
+    WHERE Status = 'AVAILABLE'
+    GROUP BY TypeID
+"""
+
+VEHICLES_QUERY = "SELECT VehicleID, TypeID, Status FROM Vehicle"
+# Bookings that hold a vehicle: in-flight rentals and reservations already
+# allocated to a specific vehicle
+RENTAL_INTERVALS_QUERY = """
+    SELECT VehicleID, StartDate, DueDate, Status
+    FROM Rental
+    WHERE Status IN ('ACTIVE', 'OVERDUE')
+"""
+RESERVATION_INTERVALS_QUERY = """
+    SELECT VehicleID, StartDate, EndDate
+    FROM Reservation
+    WHERE Status = 'CONFIRMED' AND VehicleID IS NOT NULL
+"""
+
+# Authoritative single-vehicle check from the schema, for vehicles the index hasn't seen
+IS_AVAILABLE_QUERY = "SELECT IsVehicleAvailable(%s, %s, %s) AS available"
+
+# An overdue rental has no known end, so it blocks every later date
+OPEN_END = date.max.toordinal()
+
+_cache = TTLCache(ttl=5, maxsize=2, name='availability')
+_index_cache = TTLCache(ttl=60, maxsize=1, refresh_ahead=0.8, name='availability-index')
+
+
+def init_app(app):
+    """Apply AVAILABILITY_TTL and AVAILABILITY_INDEX_TTL from app config"""
+    _cache.ttl = app.config.get('AVAILABILITY_TTL', _cache.ttl)
+    _index_cache.ttl = app.config.get('AVAILABILITY_INDEX_TTL', _index_cache.ttl)
+
+
+def _ordinal(day):
+    return day if isinstance(day, int) else day.toordinal()
+
+
+class _Schedule:
+    """Booked intervals of one vehicle, sorted by start.
+
+    ``booked`` is ``(starts, ends, max_ends)`` where ``max_ends[i]`` is the
+    latest end among the first ``i + 1`` intervals, so an overlap test is
+    one bisect plus one comparison. Writers replace the tuple wholesale so
+    readers never see a half-applied insert.
+    """
+
+    __slots__ = ('type_id', 'status', 'booked')
+
+    def __init__(self, type_id, status):
+        self.type_id = type_id
+        self.status = status
+        self.booked = ((), (), ())
+
+    def load(self, intervals):
+        intervals.sort()
+        self.booked = self._with_max([start for start, _ in intervals], [end for _, end in intervals])
+
+    def add(self, start, end):
+        starts, ends, _ = self.booked
+        position = bisect.bisect_right(starts, start)
+        self.booked = self._with_max(list(starts[:position]) + [start] + list(starts[position:]),
+                                     list(ends[:position]) + [end] + list(ends[position:]))
+
+    @staticmethod
+    def _with_max(starts, ends):
+        max_ends, latest = [], None
+        for end in ends:
+            latest = end if latest is None or end > latest else latest
+            max_ends.append(latest)
+        return starts, ends, max_ends
+
+    def is_free(self, start, end):
+        """True if no interval overlaps the inclusive range ``[start, end]``"""
+        if self.status == 'MAINTENANCE':
+            return False
+        starts, _, max_ends = self.booked
+        count = bisect.bisect_right(starts, end)  # intervals starting on or before ``end``
+        return count == 0 or max_ends[count - 1] < start
+
+    def booked_days(self, start, end):
+        """Days in ``[start, end]`` covered by at least one interval"""
+        days, covered_to = 0, start - 1
+        for b_start, b_end in zip(*self.booked[:2]):
+            if b_start > end:
+                break
+            b_start, b_end = max(b_start, covered_to + 1), min(b_end, end)
+            if b_end >= b_start:
+                days += b_end - b_start + 1
+                covered_to = b_end
+        return days
+
+
+class IntervalIndex:
+    """In-memory interval index answering fleet-wide date-range availability.
+
+    Dates are inclusive on both ends, matching IsVehicleAvailable in the
+    schema. Vehicles in MAINTENANCE are never free.
+    """
+
+    def __init__(self):
+        self._schedules = {}
+        self._by_type = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, vehicles, intervals):
+        """Build from ``(vehicle_id, type_id, status)`` and ``(vehicle_id, start, end)`` rows"""
+        index = cls()
+        for vehicle_id, type_id, status in vehicles:
+            index._schedules[vehicle_id] = _Schedule(type_id, status)
+            index._by_type.setdefault(type_id, []).append(vehicle_id)
+        pending = {}
+        for vehicle_id, start, end in intervals:
+            if vehicle_id in index._schedules:
+                pending.setdefault(vehicle_id, []).append((_ordinal(start), _ordinal(end)))
+        for vehicle_id, booked in pending.items():
+            index._schedules[vehicle_id].load(booked)
+        for vehicle_ids in index._by_type.values():
+            vehicle_ids.sort()
+        return index
+
+    def add_booking(self, vehicle_id, start, end):
+        """Record a new booking made after the index was built"""
+        with self._lock:
+            schedule = self._schedules.get(vehicle_id)
+            if schedule is not None:
+                schedule.add(_ordinal(start), _ordinal(end))
+
+    def is_free(self, vehicle_id, start, end):
+        schedule = self._schedules.get(vehicle_id)
+        return schedule is not None and schedule.is_free(_ordinal(start), _ordinal(end))
+
+    def free_vehicles(self, start, end, type_id=None):
+        """IDs of vehicles (optionally of one type) free for the whole range"""
+        start, end = _ordinal(start), _ordinal(end)
+        vehicle_ids = self._schedules if type_id is None else self._by_type.get(type_id, ())
+        schedules = self._schedules
+        return {vehicle_id for vehicle_id in vehicle_ids if schedules[vehicle_id].is_free(start, end)}
+
+    def free_counts(self, start, end):
+        """TypeID -> number of vehicles free for the whole range"""
+        start, end = _ordinal(start), _ordinal(end)
+        return {type_id: sum(1 for vehicle_id in vehicle_ids if self._schedules[vehicle_id].is_free(start, end))
+                for type_id, vehicle_ids in self._by_type.items()}
+
+    def best_fit(self, start, end, type_id):
+        """Free vehicle of the type whose previous booking ends latest before ``start``.
+
+        Picking the tightest gap leaves other vehicles' calendars open for
+        later, longer requests. Ties go to the lowest VehicleID; None if no
+        vehicle of the type is free.
+        """
+        start, end = _ordinal(start), _ordinal(end)
+        best_id, best_end = None, None
+        for vehicle_id in self._by_type.get(type_id, ()):
+            schedule = self._schedules[vehicle_id]
+            if schedule.status == 'MAINTENANCE':
+                continue
+            starts, _, max_ends = schedule.booked
+            count = bisect.bisect_right(starts, end)
+            previous_end = max_ends[count - 1] if count else 0
+            if previous_end >= start:
+                continue
+            if previous_end == start - 1:
+                return vehicle_id  # no gap at all; nothing can fit tighter
+            if best_end is None or previous_end > best_end:
+                best_id, best_end = vehicle_id, previous_end
+        return best_id
+
+    def utilization(self, start, end):
+        """TypeID -> (bookable vehicles, booked vehicle-days) over ``[start, end]``"""
+        start, end = _ordinal(start), _ordinal(end)
+        usage = {}
+        for type_id, vehicle_ids in self._by_type.items():
+            schedules = [self._schedules[vehicle_id] for vehicle_id in vehicle_ids]
+            bookable = [schedule for schedule in schedules if schedule.status != 'MAINTENANCE']
+            usage[type_id] = (len(bookable), sum(schedule.booked_days(start, end) for schedule in bookable))
+        return usage
+
+    def __len__(self):
+        return len(self._schedules)
+
+    def __contains__(self, vehicle_id):
+        return vehicle_id in self._schedules
+
+
+def load_index():
+    """Build a fresh index from the database (bypasses the shared cache)"""
+    vehicles = execute_query(VEHICLES_QUERY, fetch_all=True)
+    rentals = execute_query(RENTAL_INTERVALS_QUERY, fetch_all=True)
+    reservations = execute_query(RESERVATION_INTERVALS_QUERY, fetch_all=True)
+    if vehicles is None or rentals is None or reservations is None:
+        raise RuntimeError("Failed to load bookings for the availability index")
+    intervals = [(row['vehicleid'], row['startdate'],
+                  OPEN_END if row['status'] == 'OVERDUE' else row['duedate']) for row in rentals]
+    intervals.extend((row['vehicleid'], row['startdate'], row['enddate']) for row in reservations)
+    return IntervalIndex.build(((row['vehicleid'], row['typeid'], row['status']) for row in vehicles), intervals)
+
+
+def get_index():
+    """The shared interval index, rebuilt every AVAILABILITY_INDEX_TTL seconds"""
+    return _index_cache.get('index', load_index)
+
+
+def _load_counts():
+    rows = execute_query(AVAILABLE_BY_TYPE_QUERY, fetch_all=True)
+    if rows is None:
+        raise RuntimeError("Failed to count available vehicles")
+    return {row['typeid']: row['available'] for row in rows}
+
+
+def counts_by_type_id():
+    """TypeID -> number of AVAILABLE vehicles (types with none are absent)"""
+    return _cache.get('by_type_id', _load_counts)
+
+
+def available_counts(start=None, end=None):
+    """Type name -> number of bookable vehicles, covering every VehicleType.
+
+    Without dates this counts vehicles whose status is AVAILABLE right now;
+    with dates it counts vehicles free for the whole range.
+    """
+    try:
+        counts = counts_by_type_id() if start is None else get_index().free_counts(start, end)
+    except RuntimeError as e:
+        logger.error(f"Availability counts unavailable: {e}")
+        counts = {}
+    return {row['name']: counts.get(row['typeid'], 0) for row in refdata.vehicle_types()}
+
+
+def free_vehicle_ids(start, end, type_id=None):
+    """IDs of vehicles free between ``start`` and ``end`` (inclusive)"""
+    return get_index().free_vehicles(start, end, type_id)
+
+
+def is_vehicle_free(vehicle_id, start, end):
+    """Pre-check one vehicle; the booking procedure re-checks in the database.
+
+    A vehicle added since the index was built is an index miss, not a
+    conflict, so it is checked with IsVehicleAvailable instead.
+    """
+    vehicle_id = int(vehicle_id)
+    index = get_index()
+    if vehicle_id in index:
+        return index.is_free(vehicle_id, start, end)
+    row = execute_query(IS_AVAILABLE_QUERY, (vehicle_id, start, end), fetch_one=True)
+    if row is None:
+        raise RuntimeError("Failed to check vehicle availability")
+    return bool(row['available'])
+
+
+def record_booking(vehicle_id, start, end):
+    """Add a just-committed booking to this worker's index"""
+    get_index().add_booking(int(vehicle_id), start, end)
+
+
+def invalidate(reindex=True):
+    """Forget cached counts; ``reindex`` also drops the interval index"""
+    _cache.invalidate()
+    if reindex:
+        _index_cache.invalidate()
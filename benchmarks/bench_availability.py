@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+SmartRide - Availability Benchmark
+
+Builds an in-memory fleet with 50k rentals (no database needed) and times
+fleet-wide "which vehicles of type X are free between D1 and D2" queries:
+a per-vehicle scan of its bookings, as IsVehicleAvailable does, against the
+interval index in availability.py.
+
+Usage:
+    python benchmarks/bench_availability.py [--vehicles 2000] [--rentals 50000] [--queries 500]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from availability import IntervalIndex
+
+TYPE_IDS = [1, 2, 3, 4]
+STATUSES = ['AVAILABLE'] * 18 + ['RENTED', 'MAINTENANCE']
+
+
+def generate(vehicle_count, rental_count, rng):
+    vehicles = [(vehicle_id, rng.choice(TYPE_IDS), rng.choice(STATUSES))
+                for vehicle_id in range(1, vehicle_count + 1)]
+    today = date.today()
+    rentals = []
+    for _ in range(rental_count):
+        start = today + timedelta(days=rng.randint(-30, 365))
+        rentals.append((rng.randint(1, vehicle_count), start, start + timedelta(days=rng.randint(1, 14))))
+    return vehicles, rentals
+
+
+def scan_free(vehicles, bookings_by_vehicle, type_id, start, end):
+    """Baseline: check every booking of every vehicle of the type"""
+    free = set()
+    for vehicle_id, vehicle_type, status in vehicles:
+        if vehicle_type != type_id or status == 'MAINTENANCE':
+            continue
+        if not any(b_start <= end and b_end >= start for b_start, b_end in bookings_by_vehicle.get(vehicle_id, ())):
+            free.add(vehicle_id)
+    return free
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--vehicles', type=int, default=2000)
+    parser.add_argument('--rentals', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vehicles, rentals = generate(args.vehicles, args.rentals, rng)
+    bookings_by_vehicle = {}
+    for vehicle_id, start, end in rentals:
+        bookings_by_vehicle.setdefault(vehicle_id, []).append((start, end))
+
+    t0 = time.perf_counter()
+    index = IntervalIndex.build(vehicles, rentals)
+    build_ms = (time.perf_counter() - t0) * 1000
+    print(f"{args.vehicles} vehicles, {args.rentals} rentals; index built in {build_ms:.1f} ms\n")
+
+    today = date.today()
+    queries = []
+    for _ in range(args.queries):
+        start = today + timedelta(days=rng.randint(0, 365))
+        queries.append((rng.choice(TYPE_IDS), start, start + timedelta(days=rng.randint(1, 10))))
+
+    t0 = time.perf_counter()
+    expected = [scan_free(vehicles, bookings_by_vehicle, *query) for query in queries]
+    scan_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    actual = [index.free_vehicles(start, end, type_id) for type_id, start, end in queries]
+    index_s = time.perf_counter() - t0
+
+    assert actual == expected, "index disagrees with the scan"
+    print(f"{'method':<16} {'total ms':>10} {'per query ms':>13}")
+    for name, seconds in (('per-vehicle scan', scan_s), ('interval index', index_s)):
+        print(f"{name:<16} {seconds * 1000:10.1f} {seconds * 1000 / len(queries):13.3f}")
+    print(f"\nspeed-up: {scan_s / index_s:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
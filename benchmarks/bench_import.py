@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+SmartRide - Bulk Import Benchmark
+
+Times importing N generated vehicles and customers the way the admin forms
+do it (one INSERT + COMMIT per row, passwords hashed inline) against
+bulk_import (batched executemany in one transaction, passwords hashed in a
+process pool). Rows are deleted again afterwards.
+
+Usage:
+    python benchmarks/bench_import.py [--rows 2000]
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+from app import app
+import bulk_import
+from db import get_pool
+
+
+def vehicle_csv(rows, prefix):
+    lines = ["Type,Make,Model,PlateNo,Year,RatePerDay"]
+    lines += [f"Car,Toyota,Corolla,{prefix}{i:06d},2022,{30 + i % 50}" for i in range(rows)]
+    return "\n".join(lines) + "\n"
+
+
+def customer_csv(rows, prefix):
+    lines = ["Name,Email,Phone,LicenseNo,Password"]
+    lines += [f"Bench User {i},{prefix.lower()}{i}@bench.example,555-{i % 10000:04d},{prefix}{i:06d},secret{i}"
+              for i in range(rows)]
+    return "\n".join(lines) + "\n"
+
+
+def per_row_vehicles(text):
+    """The admin_add_vehicle() path: one INSERT and one COMMIT per row"""
+    import csv
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        for row in csv.DictReader(io.StringIO(text)):
+            cursor.execute(
+                "INSERT INTO Vehicle (TypeID, Make, Model, PlateNo, Year, RatePerDay) VALUES (%s, %s, %s, %s, %s, %s)",
+                (1, row['Make'], row['Model'], row['PlateNo'], row['Year'], row['RatePerDay']))
+            conn.commit()
+        cursor.close()
+
+
+def per_row_customers(text):
+    """The admin_add_customer() path: hash inline, one INSERT and COMMIT per row"""
+    import csv
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        for row in csv.DictReader(io.StringIO(text)):
+            cursor.execute(
+                "INSERT INTO Customer (Name, Email, Phone, LicenseNo, Password) VALUES (%s, %s, %s, %s, %s)",
+                (row['Name'], row['Email'], row['Phone'], row['LicenseNo'], generate_password_hash(row['Password'])))
+            conn.commit()
+        cursor.close()
+
+
+def cleanup(prefix):
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM Vehicle WHERE PlateNo LIKE %s", (prefix + '%',))
+        cursor.execute("DELETE FROM Customer WHERE LicenseNo LIKE %s", (prefix + '%',))
+        conn.commit()
+        cursor.close()
+
+
+def timed(label, fn, rows):
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<28} {elapsed:8.2f}s  {rows / elapsed:9.1f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    args = parser.parse_args()
+
+    with app.app_context():
+        try:
+            timed('vehicles, per row', lambda: per_row_vehicles(vehicle_csv(args.rows, 'BRA')), args.rows)
+            timed('vehicles, bulk_import', lambda: bulk_import.import_vehicles(
+                io.StringIO(vehicle_csv(args.rows, 'BRB'))), args.rows)
+            timed('customers, per row', lambda: per_row_customers(customer_csv(args.rows, 'BRC')), args.rows)
+            timed('customers, bulk_import', lambda: bulk_import.import_customers(
+                io.StringIO(customer_csv(args.rows, 'BRD'))), args.rows)
+        finally:
+            for prefix in ('BRA', 'BRB', 'BRC', 'BRD'):
+                cleanup(prefix)
+
+
+if __name__ == '__main__':
+    main()
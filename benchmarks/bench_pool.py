@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+SmartRide - Connection Pool Benchmark
+
+Compares a fresh MySQLdb connection per request (what Flask-MySQLdb did)
+against borrowing from db.ConnectionPool. Each "request" runs one cheap
+query, so the difference is the TCP + auth handshake.
+
+Usage:
+    python benchmarks/bench_pool.py [--requests 500] [--threads 4]
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MySQLdb
+import MySQLdb.cursors
+from dotenv import load_dotenv
+
+from db import ConnectionPool
+
+QUERY = "SELECT COUNT(*) AS count FROM Rental WHERE CustomerID = %s AND Status = 'ACTIVE'"
+
+
+def connect_kwargs():
+    load_dotenv()
+    return {
+        'host': os.environ.get('MYSQL_HOST', 'localhost'),
+        'user': os.environ.get('MYSQL_USER', 'root'),
+        'passwd': os.environ.get('MYSQL_PASSWORD', ''),
+        'db': os.environ.get('MYSQL_DB', 'smartride_rental'),
+        'port': int(os.environ.get('MYSQL_PORT', 3306)),
+        'cursorclass': MySQLdb.cursors.DictCursor,
+    }
+
+
+def per_request_connection(kwargs):
+    conn = MySQLdb.connect(**kwargs)
+    cursor = conn.cursor()
+    cursor.execute(QUERY, (1,))
+    cursor.fetchone()
+    cursor.close()
+    conn.close()
+
+
+def pooled_connection(pool):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(QUERY, (1,))
+        cursor.fetchone()
+        cursor.close()
+
+
+def run(label, fn, total, threads):
+    latencies = []
+    lock = threading.Lock()
+    per_thread = total // threads
+
+    def worker():
+        local = []
+        for _ in range(per_thread):
+            t0 = time.perf_counter()
+            fn()
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000
+    print(f"{label:<24} {len(latencies) / elapsed:9.1f} req/s   p50 {p50:7.2f} ms   p95 {p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    kwargs = connect_kwargs()
+    pool = ConnectionPool(kwargs, min_size=args.threads, max_size=args.threads)
+    pool.warm_up()
+
+    run('connect per request', lambda: per_request_connection(kwargs), args.requests, args.threads)
+    run('pooled connection', lambda: pooled_connection(pool), args.requests, args.threads)
+    print(f"pool stats: {pool.stats()}")
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+SmartRide - Search Benchmark
+
+Loads a generated dataset (100k vehicles and 100k customers by default) into
+a scratch database and times the old leading-wildcard LIKE search against the
+prefix + FULLTEXT queries built by search.py.
+
+Usage:
+    python benchmarks/bench_search.py [--rows 100000] [--database smartride_bench] [--keep]
+"""
+
+import os
+import sys
+import time
+import random
+import string
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MySQLdb
+from dotenv import load_dotenv
+
+from search import hits_query
+
+MAKES = {
+    'Toyota': ['Camry', 'Corolla', 'Yaris', 'Hilux'],
+    'Honda': ['Civic', 'Accord', 'CBR150R', 'PCX 150'],
+    'BMW': ['320i', 'X3', 'X5', 'R1250'],
+    'Mercedes': ['C-Class', 'Sprinter', 'E-Class'],
+    'Yamaha': ['R15', 'NMAX', 'MT-15'],
+    'Ford': ['Transit', 'Focus', 'Ranger'],
+    'Vespa': ['Primavera', 'Sprint'],
+}
+FIRST_NAMES = ['Alice', 'Bob', 'Carol', 'David', 'Erin', 'Farah', 'Gopal', 'Hana', 'Ivan', 'Jun']
+LAST_NAMES = ['Johnson', 'Smith', 'Davis', 'Wilson', 'Kumar', 'Joshi', 'Lee', 'Garcia', 'Chen']
+
+SCHEMA = [
+    """CREATE TABLE Vehicle (
+        VehicleID INT PRIMARY KEY AUTO_INCREMENT,
+        TypeID INT NOT NULL,
+        Make VARCHAR(50) NOT NULL,
+        Model VARCHAR(50) NOT NULL,
+        PlateNo VARCHAR(20) NOT NULL UNIQUE,
+        Year YEAR NOT NULL,
+        RatePerDay DECIMAL(10,2) NOT NULL
+    )""",
+    """CREATE TABLE Customer (
+        CustomerID INT PRIMARY KEY AUTO_INCREMENT,
+        Name VARCHAR(100) NOT NULL,
+        Email VARCHAR(100) NOT NULL UNIQUE,
+        Phone VARCHAR(15) NOT NULL,
+        LicenseNo VARCHAR(20) NOT NULL UNIQUE
+    )""",
+    "CREATE INDEX idx_vehicle_plate ON Vehicle(PlateNo)",
+    "CREATE INDEX idx_customer_email ON Customer(Email)",
+    "CREATE INDEX idx_customer_license ON Customer(LicenseNo)",
+    "CREATE FULLTEXT INDEX ft_vehicle_search ON Vehicle(Make, Model, PlateNo)",
+    "CREATE FULLTEXT INDEX ft_customer_search ON Customer(Name, Email, LicenseNo)",
+]
+
+LEGACY = {
+    'vehicle': "SELECT VehicleID FROM Vehicle WHERE Make LIKE %s OR Model LIKE %s OR PlateNo LIKE %s",
+    'customer': "SELECT CustomerID FROM Customer WHERE Name LIKE %s OR Email LIKE %s OR LicenseNo LIKE %s",
+}
+
+TERMS = {
+    'vehicle': ['Civic', 'BMW X5', 'PL0042', 'Sprinter'],
+    'customer': ['Kumar', 'alice.smith12@example.com', 'DL00077', 'Hana Lee'],
+}
+
+
+def generate(cursor, rows, batch=5000):
+    rng = random.Random(42)
+    vehicles = []
+    for i in range(rows):
+        make = rng.choice(list(MAKES))
+        vehicles.append((rng.randint(1, 4), make, rng.choice(MAKES[make]), f"PL{i:06d}",
+                         rng.randint(2015, 2025), rng.randint(15, 250)))
+    customers = []
+    for i in range(rows):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        phone = ''.join(rng.choice(string.digits) for _ in range(10))
+        customers.append((f"{first} {last}", f"{first.lower()}.{last.lower()}{i}@example.com",
+                          phone, f"DL{i:07d}"))
+    for start in range(0, rows, batch):
+        cursor.executemany(
+            "INSERT INTO Vehicle (TypeID, Make, Model, PlateNo, Year, RatePerDay) VALUES (%s, %s, %s, %s, %s, %s)",
+            vehicles[start:start + batch])
+        cursor.executemany(
+            "INSERT INTO Customer (Name, Email, Phone, LicenseNo) VALUES (%s, %s, %s, %s)",
+            customers[start:start + batch])
+
+
+def timed(cursor, sql, params, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        cursor.execute(sql, params)
+        found = len(cursor.fetchall())
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--database', default='smartride_bench')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--keep', action='store_true', help="don't drop the scratch database")
+    args = parser.parse_args()
+
+    load_dotenv()
+    conn = MySQLdb.connect(
+        host=os.environ.get('MYSQL_HOST', 'localhost'),
+        user=os.environ.get('MYSQL_USER', 'root'),
+        passwd=os.environ.get('MYSQL_PASSWORD', ''),
+        port=int(os.environ.get('MYSQL_PORT', 3306)),
+    )
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+    cursor.execute(f"CREATE DATABASE `{args.database}`")
+    cursor.execute(f"USE `{args.database}`")
+    for statement in SCHEMA:
+        cursor.execute(statement)
+
+    print(f"Generating {args.rows} vehicles and {args.rows} customers...")
+    t0 = time.perf_counter()
+    generate(cursor, args.rows)
+    conn.commit()
+    cursor.execute("ANALYZE TABLE Vehicle, Customer")
+    cursor.fetchall()
+    print(f"  loaded in {time.perf_counter() - t0:.1f}s\n")
+
+    print(f"{'target':<9} {'term':<28} {'LIKE %x% ms':>12} {'search.py ms':>13} {'rows':>12}")
+    for target, terms in TERMS.items():
+        for term in terms:
+            like = f"%{term}%"
+            legacy_ms, legacy_rows = timed(cursor, LEGACY[target], (like, like, like), args.repeat)
+            sql, params = hits_query(target, term)
+            new_ms, new_rows = timed(cursor, sql, params, args.repeat)
+            print(f"{target:<9} {term:<28} {legacy_ms:12.2f} {new_ms:13.2f} {legacy_rows:>5} / {new_rows:<5}")
+
+    if not args.keep:
+        cursor.execute(f"DROP DATABASE `{args.database}`")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
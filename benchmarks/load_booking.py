@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+SmartRide - Concurrent Booking Load Test
+
+Hammers booking.create_booking() from N threads against the database in
+.env and checks the invariants:
+
+  1. contention: N clients book the same vehicle for the same dates with
+     different idempotency keys; exactly one must succeed.
+  2. double submit: N clients send the same idempotency key; exactly one
+     rental may be created and every client gets its RentalID back.
+  3. random ranges: N clients book random overlapping ranges on one vehicle;
+     no two committed rentals may overlap.
+
+A throwaway vehicle and customer are created for the run and removed
+afterwards (unless --keep). Exits non-zero if any invariant is violated.
+
+Usage:
+    python benchmarks/load_booking.py [--clients 32] [--rounds 5]
+"""
+
+import os
+import sys
+import time
+import uuid
+import random
+import argparse
+import threading
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from flask import Flask
+
+import booking
+import db
+
+
+def make_pool(clients):
+    load_dotenv()
+    app = Flask(__name__)
+    app.config.update(
+        MYSQL_HOST=os.environ.get('MYSQL_HOST', 'localhost'),
+        MYSQL_USER=os.environ.get('MYSQL_USER', 'root'),
+        MYSQL_PASSWORD=os.environ.get('MYSQL_PASSWORD', ''),
+        MYSQL_DB=os.environ.get('MYSQL_DB', 'smartride_rental'),
+        MYSQL_PORT=int(os.environ.get('MYSQL_PORT', 3306)),
+        MYSQL_POOL_MIN_SIZE=0,
+        MYSQL_POOL_MAX_SIZE=clients + 2,
+        MYSQL_POOL_IDLE_TIMEOUT=300,
+        MYSQL_POOL_TIMEOUT=60,
+        MYSQL_POOL_PING_INTERVAL=5,
+    )
+    return db.init_app(app)
+
+
+def run_clients(clients, target):
+    """Start ``clients`` threads on a barrier so they hit the database together"""
+    barrier = threading.Barrier(clients)
+    results = [None] * clients
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = ('ok', target(i))
+        except booking.BookingError as e:
+            results[i] = ('refused', str(e))
+        except Exception as e:
+            results[i] = ('error', repr(e))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - t0
+
+
+def setup(pool):
+    tag = uuid.uuid4().hex[:8].upper()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT TypeID FROM VehicleType ORDER BY TypeID LIMIT 1")
+        type_id = cursor.fetchone()['TypeID']
+        cursor.execute("INSERT INTO Vehicle (TypeID, Make, Model, PlateNo, Year, RatePerDay) "
+                       "VALUES (%s, 'Load', 'Test', %s, 2024, 50.00)", (type_id, f"LT{tag}"))
+        vehicle_id = cursor.lastrowid
+        cursor.execute("INSERT INTO Customer (Name, Email, Phone, LicenseNo, Password) "
+                       "VALUES ('Load Test', %s, '000', %s, '!')", (f"loadtest-{tag}@example.com", f"LT{tag}"))
+        customer_id = cursor.lastrowid
+        conn.commit()
+        cursor.close()
+    return vehicle_id, customer_id
+
+
+def teardown(pool, vehicle_id, customer_id):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM BookingRequest WHERE CustomerID = %s", (customer_id,))
+        cursor.execute("DELETE FROM Rental WHERE VehicleID = %s", (vehicle_id,))
+        cursor.execute("DELETE FROM Vehicle WHERE VehicleID = %s", (vehicle_id,))
+        cursor.execute("DELETE FROM Customer WHERE CustomerID = %s", (customer_id,))
+        conn.commit()
+        cursor.close()
+
+
+def committed_rentals(pool, vehicle_id):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT RentalID, StartDate, DueDate FROM Rental "
+                       "WHERE VehicleID = %s AND Status = 'ACTIVE' ORDER BY StartDate", (vehicle_id,))
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+
+def clear_rentals(pool, vehicle_id, customer_id):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM BookingRequest WHERE CustomerID = %s", (customer_id,))
+        cursor.execute("DELETE FROM Rental WHERE VehicleID = %s", (vehicle_id,))
+        conn.commit()
+        cursor.close()
+
+
+def summarize(name, results, elapsed):
+    counts = {}
+    for outcome, _ in results:
+        counts[outcome] = counts.get(outcome, 0) + 1
+    print(f"  {name:<14} {elapsed * 1000:8.1f} ms  " + ', '.join(f"{k}={v}" for k, v in sorted(counts.items())))
+    for outcome, detail in results:
+        if outcome == 'error':
+            print(f"    error: {detail}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--keep', action='store_true', help="don't delete the test vehicle and customer")
+    args = parser.parse_args()
+
+    pool = make_pool(args.clients)
+    vehicle_id, customer_id = setup(pool)
+    failures = []
+    rng = random.Random(42)
+    try:
+        for round_no in range(1, args.rounds + 1):
+            print(f"round {round_no} ({args.clients} clients)")
+            start = date.today() + timedelta(days=1)
+            due = start + timedelta(days=3)
+
+            results, elapsed = run_clients(args.clients, lambda i: booking.create_booking(
+                vehicle_id, customer_id, start, due, idempotency_key=str(uuid.uuid4())))
+            counts = summarize('contention', results, elapsed)
+            if counts.get('ok', 0) != 1:
+                failures.append(f"round {round_no}: {counts.get('ok', 0)} clients booked the same dates")
+            clear_rentals(pool, vehicle_id, customer_id)
+
+            key = str(uuid.uuid4())
+            results, elapsed = run_clients(args.clients, lambda i: booking.create_booking(
+                vehicle_id, customer_id, start, due, idempotency_key=key))
+            summarize('double submit', results, elapsed)
+            rental_ids = {detail['rental_id'] for outcome, detail in results if outcome == 'ok'}
+            rentals = committed_rentals(pool, vehicle_id)
+            if len(rentals) != 1 or len(rental_ids) != 1 or any(outcome != 'ok' for outcome, _ in results):
+                failures.append(f"round {round_no}: one key produced {len(rentals)} rentals / ids {sorted(rental_ids)}")
+            clear_rentals(pool, vehicle_id, customer_id)
+
+            def random_range(i):
+                offset = rng.randint(1, 60)
+                first = date.today() + timedelta(days=offset)
+                return booking.create_booking(vehicle_id, customer_id, first,
+                                              first + timedelta(days=rng.randint(1, 6)),
+                                              idempotency_key=str(uuid.uuid4()))
+            results, elapsed = run_clients(args.clients, random_range)
+            summarize('random ranges', results, elapsed)
+            rentals = committed_rentals(pool, vehicle_id)
+            latest = None
+            for rental in rentals:
+                if latest and rental['StartDate'] <= latest['DueDate']:
+                    failures.append(f"round {round_no}: rentals {latest['RentalID']} and "
+                                    f"{rental['RentalID']} overlap")
+                if latest is None or rental['DueDate'] > latest['DueDate']:
+                    latest = rental
+            clear_rentals(pool, vehicle_id, customer_id)
+    finally:
+        if not args.keep:
+            teardown(pool, vehicle_id, customer_id)
+        pool.close_all()
+
+    if failures:
+        print("\nFAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nOK: no double allocation")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+SmartRide - HTTP Load Test
+
+Drives a running server (gunicorn or `flask run`) with concurrent virtual
+users and reports p50/p95/p99 latency, error counts and throughput per step:
+
+  customer  login -> vehicles -> booking form -> book (--book-ratio of
+            iterations, random future dates) -> my bookings
+  admin     login -> dashboard -> vehicles (first --pages keyset pages)
+            -> revenue report for a random recent month -> stats API
+
+Customers log in as the accounts made by seed_data.py. When the server
+sends Server-Timing (SERVER_TIMING=1) the database time and query count
+per step are reported as well.
+
+Results can be saved with --out and compared with a previous run with
+--compare; the exit status is 1 when any step's p95 got slower, or its
+error rate higher, by more than --threshold percent.
+
+Usage:
+    python benchmarks/load_test.py --base-url http://localhost:8000 [--customers 20] [--admins 2]
+                                   [--duration 60 | --iterations 50] [--out run.json] [--compare base.json]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode, urljoin
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+BOOKING_LINK = re.compile(r'/customer/booking/new\?vehicle_id=(\d+)')
+IDEMPOTENCY_KEY = re.compile(r'name="idempotency_key" value="([^"]+)"')
+NEXT_PAGE = re.compile(r'href="([^"]*/admin/vehicles\?[^"]*after=[^"]*)"[^>]*>Next<')
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+# Steps with fewer samples (the logins) are shown but never flagged as regressions
+MIN_COMPARE_SAMPLES = 20
+
+
+class NoRedirect(HTTPRedirectHandler):
+    """Time every response on its own instead of following redirects"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Recorder:
+    """Latencies per step, shared by all virtual users"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)     # step -> [seconds]
+        self.db_samples = defaultdict(list)  # step -> [(seconds, queries)]
+        self.errors = defaultdict(int)
+        self.error_examples = {}
+        self._lock = threading.Lock()
+
+    def record(self, step, elapsed, ok, db=None, error=None):
+        with self._lock:
+            self.samples[step].append(elapsed)
+            if db is not None:
+                self.db_samples[step].append(db)
+            if not ok:
+                self.errors[step] += 1
+                self.error_examples.setdefault(step, error)
+
+
+class VirtualUser(threading.Thread):
+    """One browser session running its flow until the run ends"""
+
+    def __init__(self, role, index, args, recorder, deadline, start_delay):
+        super().__init__(name=f"{role}-{index}", daemon=True)
+        self.role = role
+        self.index = index
+        self.args = args
+        self.recorder = recorder
+        self.deadline = deadline
+        self.start_delay = start_delay
+        self.rng = random.Random(f"{args.seed}-{role}-{index}")
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()), NoRedirect())
+
+    def request(self, step, path, data=None, expect=(200,)):
+        """Issue one request and record it under ``step``; returns the body or None"""
+        url = urljoin(self.args.base_url, path)
+        body = urlencode(data).encode() if data is not None else None
+        started = time.perf_counter()
+        status, text, timing = None, '', None
+        try:
+            response = self.opener.open(Request(url, data=body), timeout=self.args.timeout)
+            status, text = response.status, response.read().decode('utf-8', 'replace')
+            timing = response.headers.get('Server-Timing')
+        except HTTPError as e:
+            status, timing = e.code, e.headers.get('Server-Timing')
+            e.read()
+        except (URLError, OSError) as e:
+            self.recorder.record(step, time.perf_counter() - started, False, error=str(e))
+            return None
+        elapsed = time.perf_counter() - started
+        db = None
+        match = SERVER_TIMING_DB.search(timing or '')
+        if match:
+            db = (float(match.group(1)) / 1000.0, int(match.group(2)))
+        ok = status in expect
+        self.recorder.record(step, elapsed, ok, db=db, error=None if ok else f"HTTP {status} for {path}")
+        return text if ok else None
+
+    def run(self):
+        time.sleep(self.start_delay)
+        if not self.login():
+            return
+        iterations = 0
+        while time.monotonic() < self.deadline and (not self.args.iterations or iterations < self.args.iterations):
+            if self.role == 'customer':
+                self.customer_flow()
+            else:
+                self.admin_flow()
+            iterations += 1
+            if self.args.think_time:
+                time.sleep(self.rng.expovariate(1.0 / self.args.think_time))
+
+    def login(self):
+        if self.role == 'customer':
+            account = self.rng.randrange(self.args.seeded_customers)
+            form = {'email': self.args.customer_email.format(account), 'password': self.args.customer_password}
+            return self.request('customer_login', '/customer/login', form, expect=(302,)) is not None
+        form = {'username': self.args.admin_user, 'password': self.args.admin_password}
+        return self.request('admin_login', '/admin/login', form, expect=(302,)) is not None
+
+    def customer_flow(self):
+        page = self.request('customer_vehicles', '/customer/vehicles')
+        vehicle_ids = BOOKING_LINK.findall(page or '')
+        if not vehicle_ids:
+            return
+        vehicle_id = self.rng.choice(vehicle_ids)
+        form = self.request('booking_form', f"/customer/booking/new?vehicle_id={vehicle_id}")
+        key = IDEMPOTENCY_KEY.search(form or '')
+        if key and self.rng.random() < self.args.book_ratio:
+            start = date.today() + timedelta(days=self.rng.randint(30, 365))
+            due = start + timedelta(days=self.rng.randint(1, 7))
+            self.request('booking_submit', '/customer/booking/new', {
+                'vehicle_id': vehicle_id, 'start_date': start.isoformat(),
+                'due_date': due.isoformat(), 'idempotency_key': key.group(1),
+            }, expect=(302,))
+        self.request('customer_bookings', '/customer/bookings')
+
+    def admin_flow(self):
+        self.request('admin_dashboard', '/admin/dashboard')
+        path = '/admin/vehicles'
+        for _ in range(self.args.pages):
+            page = self.request('admin_vehicles', path)
+            match = NEXT_PAGE.search(page or '')
+            if not match:
+                break
+            path = match.group(1).replace('&amp;', '&')
+        month = date.today().replace(day=1) - timedelta(days=31 * self.rng.randint(0, 11))
+        self.request('admin_reports', f"/admin/reports?year={month.year}&month={month.month}")
+        self.request('dashboard_stats_api', '/api/dashboard/stats')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(samples, errors, db_samples, wall):
+    values = sorted(samples)
+    summary = {
+        'count': len(values),
+        'errors': errors,
+        'error_rate': round(errors / len(values), 4) if values else 0.0,
+        'throughput_rps': round(len(values) / wall, 2) if wall else 0.0,
+        'mean_ms': round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        'max_ms': round(values[-1] * 1000, 2) if values else 0.0,
+    }
+    for pct in (50, 95, 99):
+        summary[f'p{pct}_ms'] = round(percentile(values, pct) * 1000, 2)
+    if db_samples:
+        db_times = sorted(seconds for seconds, _ in db_samples)
+        summary['db_p50_ms'] = round(percentile(db_times, 50) * 1000, 2)
+        summary['db_p95_ms'] = round(percentile(db_times, 95) * 1000, 2)
+        summary['queries_mean'] = round(sum(queries for _, queries in db_samples) / len(db_samples), 1)
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(args):
+    recorder = Recorder()
+    users = [('customer', i) for i in range(args.customers)] + [('admin', i) for i in range(args.admins)]
+    started = time.monotonic()
+    deadline = started + args.ramp_up + (args.duration if args.duration else 24 * 3600)
+    threads = [VirtualUser(role, index, args, recorder, deadline,
+                           start_delay=args.ramp_up * n / max(1, len(users)))
+               for n, (role, index) in enumerate(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - started
+
+    steps = {step: summarize(samples, recorder.errors[step], recorder.db_samples[step], wall)
+             for step, samples in sorted(recorder.samples.items())}
+    all_samples = [value for samples in recorder.samples.values() for value in samples]
+    return {
+        'meta': {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'base_url': args.base_url,
+            'git_commit': git_commit(),
+            'customers': args.customers,
+            'admins': args.admins,
+            'duration': args.duration,
+            'iterations': args.iterations,
+            'book_ratio': args.book_ratio,
+            'seed': args.seed,
+            'wall_seconds': round(wall, 2),
+        },
+        'steps': steps,
+        'total': summarize(all_samples, sum(recorder.errors.values()), [], wall),
+        'error_examples': recorder.error_examples,
+    }
+
+
+def print_results(results):
+    print(f"{'step':<22} {'count':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'db p95':>8} {'queries':>8}")
+    rows = list(results['steps'].items()) + [('TOTAL', results['total'])]
+    for step, s in rows:
+        print(f"{step:<22} {s['count']:>7} {s['errors']:>5} {s['throughput_rps']:>8.1f} {s['p50_ms']:>8.1f} "
+              f"{s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f} {s.get('db_p95_ms', float('nan')):>8.1f} "
+              f"{s.get('queries_mean', float('nan')):>8.1f}")
+    for step, error in results['error_examples'].items():
+        print(f"  {step}: {error}")
+
+
+def compare(results, baseline, threshold):
+    """Print p95 and error-rate changes against ``baseline``; returns the regressed steps"""
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('git_commit') or 'baseline'} "
+          f"({baseline['meta'].get('started_at')}):")
+    print(f"{'step':<22} {'p95 before':>11} {'p95 now':>9} {'change':>8} {'rps before':>11} {'rps now':>9}")
+    for step, now in results['steps'].items():
+        before = baseline['steps'].get(step)
+        if not before:
+            continue
+        change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+        flag = ''
+        if min(now['count'], before['count']) < MIN_COMPARE_SAMPLES:
+            flag = '  (too few samples)'
+        elif change > threshold or now['error_rate'] > before['error_rate'] * (1 + threshold / 100) + 0.001:
+            regressions.append(step)
+            flag = '  REGRESSED'
+        print(f"{step:<22} {before['p95_ms']:>11.1f} {now['p95_ms']:>9.1f} {change:>+7.1f}% "
+              f"{before['throughput_rps']:>11.1f} {now['throughput_rps']:>9.1f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--customers', type=int, default=20, help='concurrent customer users')
+    parser.add_argument('--admins', type=int, default=2, help='concurrent admin users')
+    parser.add_argument('--duration', type=float, default=60, help='seconds after ramp-up (0 = until --iterations)')
+    parser.add_argument('--iterations', type=int, default=0, help='flows per user (0 = until --duration)')
+    parser.add_argument('--ramp-up', type=float, default=5, help='seconds over which users start')
+    parser.add_argument('--think-time', type=float, default=0, help='mean pause between flows, seconds')
+    parser.add_argument('--book-ratio', type=float, default=0.2, help='share of customer flows that book')
+    parser.add_argument('--pages', type=int, default=3, help='admin vehicle pages per flow')
+    parser.add_argument('--seeded-customers', type=int, default=1000,
+                        help='log in as customer0..N-1 from seed_data.py')
+    parser.add_argument('--customer-email', default='customer{}@seed.example')
+    parser.add_argument('--customer-password', default='seed-password')
+    parser.add_argument('--admin-user', default='admin')
+    parser.add_argument('--admin-password', default='admin')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', help='write the results as JSON')
+    parser.add_argument('--compare', help='previous --out file to compare against')
+    parser.add_argument('--threshold', type=float, default=20, help='allowed p95 regression, percent')
+    args = parser.parse_args()
+    if not args.duration and not args.iterations:
+        parser.error('give --duration or --iterations')
+
+    print(f"{args.customers} customers and {args.admins} admins against {args.base_url}")
+    results = run(args)
+    print_results(results)
+
+    if args.out:
+        with open(args.out, 'w') as stream:
+            json.dump(results, stream, indent=2)
+        print(f"\nWrote {args.out}")
+
+    if args.compare:
+        with open(args.compare) as stream:
+            regressions = compare(results, json.load(stream), args.threshold)
+        if regressions:
+            print(f"\nRegressed beyond {args.threshold:.0f}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+SmartRide - Synthetic Data Generator
+
+Seeds the database in .env with production-like volumes for benchmarks,
+the load test and `flask index-advisor`:
+
+  vehicles      types weighted Car > Bike > Scooter > Bus, log-normal daily
+                rates per type, model years skewed recent, ~3% in maintenance
+  customers     one shared password (see PASSWORD) so the load test can log in
+  rentals       laid end to end per vehicle over --history-days, so no vehicle
+                is double-booked; rental lengths are geometric (mean ~3 days)
+                and customers are Zipf-distributed, so a few rent a lot.
+                Past rentals are COMPLETED (10% late, with fines), CANCELLED or
+                OVERDUE; current ones ACTIVE
+  reservations  PENDING over the next 60 days, COMPLETED/CANCELLED in the past
+  maintenance   spread over the history, SCHEDULED when in the future
+
+Seeded rows are tagged (PlateNo SEED..., e-mail @seed.example) so --reset
+removes exactly them. Historical rentals need the trigger from
+database/smartride_schema_fixed.sql, which allows past start dates.
+Afterwards run `flask rollup-backfill` and `flask sweep-overdue`.
+
+Usage:
+    python benchmarks/seed_data.py [--vehicles 2000] [--customers 20000] [--rentals 200000]
+                                   [--reservations 20000] [--maintenance 5000] [--reset]
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import argparse
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MySQLdb
+from dotenv import load_dotenv
+from flask import Flask
+from werkzeug.security import generate_password_hash
+
+import db
+
+PLATE_PREFIX = 'SEED'
+EMAIL_DOMAIN = 'seed.example'
+PASSWORD = 'seed-password'
+BATCH_SIZE = 5000
+ER_SIGNAL_EXCEPTION = 1644
+
+TYPE_WEIGHTS = {'Car': 60, 'Bike': 20, 'Scooter': 15, 'Bus': 5}
+TYPE_BASE_RATE = {'Car': 55, 'Bike': 25, 'Scooter': 15, 'Bus': 180}
+MAKES = {
+    'Car': [('Toyota', 'Camry'), ('Honda', 'Civic'), ('BMW', '320i'), ('Ford', 'Focus'), ('Hyundai', 'Elantra')],
+    'Bike': [('Yamaha', 'MT-15'), ('Honda', 'CB300R'), ('KTM', 'Duke 390')],
+    'Scooter': [('Vespa', 'Primavera'), ('Honda', 'Activa'), ('Yamaha', 'Fascino')],
+    'Bus': [('Volvo', '9400'), ('Tata', 'Starbus'), ('Mercedes', 'Tourismo')],
+}
+FIRST_NAMES = ['Aarav', 'Maya', 'Liam', 'Olivia', 'Noah', 'Emma', 'Arjun', 'Sofia', 'Ethan', 'Zara',
+               'Lucas', 'Isla', 'Rohan', 'Mia', 'Omar', 'Chloe', 'Kabir', 'Ava', 'Leo', 'Nina']
+LAST_NAMES = ['Sharma', 'Smith', 'Patel', 'Garcia', 'Khan', 'Brown', 'Chen', 'Silva', 'Kim', 'Müller',
+              'Singh', 'Rossi', 'Novak', 'Haddad', 'Okafor', 'Jones', 'Ito', 'Dubois', 'Costa', 'Nair']
+
+INSERT_VEHICLE = ("INSERT INTO Vehicle (TypeID, Make, Model, PlateNo, Year, Status, RatePerDay) "
+                  "VALUES (%s, %s, %s, %s, %s, %s, %s)")
+INSERT_CUSTOMER = ("INSERT INTO Customer (Name, Email, Phone, LicenseNo, Password) "
+                   "VALUES (%s, %s, %s, %s, %s)")
+INSERT_RENTAL = ("INSERT INTO Rental (VehicleID, CustomerID, StartDate, DueDate, ReturnDate, DailyRate, "
+                 "TotalAmount, FineAmount, Status, ProcessedBy) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)")
+INSERT_RESERVATION = ("INSERT INTO Reservation (CustomerID, VehicleTypeID, ResDate, StartDate, EndDate, Status) "
+                      "VALUES (%s, %s, %s, %s, %s, %s)")
+INSERT_MAINTENANCE = ("INSERT INTO Maintenance (VehicleID, Date, Description, Cost, Status) "
+                      "VALUES (%s, %s, %s, %s, %s)")
+
+# Rented if a rental holds it today, in the workshop if a job is open, else available
+RESTORE_VEHICLE_STATUS = f"""
+    UPDATE Vehicle v
+    SET v.Status = CASE
+        WHEN EXISTS (SELECT 1 FROM Rental r WHERE r.VehicleID = v.VehicleID
+                     AND r.Status IN ('ACTIVE', 'OVERDUE') AND r.StartDate <= CURDATE()) THEN 'RENTED'
+        WHEN EXISTS (SELECT 1 FROM Maintenance m WHERE m.VehicleID = v.VehicleID
+                     AND m.Status IN ('SCHEDULED', 'IN_PROGRESS') AND m.Date <= CURDATE()) THEN 'MAINTENANCE'
+        ELSE 'AVAILABLE' END
+    WHERE v.PlateNo LIKE '{PLATE_PREFIX}%'
+"""
+
+
+def customer_email(index):
+    """E-mail of the ``index``-th seeded customer (the load test logs in with these)"""
+    return f"customer{index}@{EMAIL_DOMAIN}"
+
+
+def make_pool():
+    load_dotenv()
+    app = Flask(__name__)
+    app.config.update(
+        MYSQL_HOST=os.environ.get('MYSQL_HOST', 'localhost'),
+        MYSQL_USER=os.environ.get('MYSQL_USER', 'root'),
+        MYSQL_PASSWORD=os.environ.get('MYSQL_PASSWORD', ''),
+        MYSQL_DB=os.environ.get('MYSQL_DB', 'smartride_rental'),
+        MYSQL_PORT=int(os.environ.get('MYSQL_PORT', 3306)),
+        MYSQL_POOL_MIN_SIZE=0,
+        MYSQL_POOL_MAX_SIZE=1,
+    )
+    return db.init_app(app)
+
+
+def insert_batches(conn, cursor, statement, rows, batch_size):
+    for offset in range(0, len(rows), batch_size):
+        cursor.executemany(statement, rows[offset:offset + batch_size])
+        conn.commit()
+
+
+def geometric(rng, mean):
+    """Geometric number of days >= 1 with the given mean"""
+    p = 1.0 / mean
+    return 1 + int(math.log(1.0 - rng.random()) / math.log(1.0 - p))
+
+
+def zipf_picker(rng, ids, skew=1.1):
+    """Pick from ``ids`` with probability proportional to 1 / rank ** skew"""
+    weights = [1.0 / (rank + 1) ** skew for rank in range(len(ids))]
+    shuffled = list(ids)
+    rng.shuffle(shuffled)
+    cumulative, total = [], 0.0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+
+    def pick():
+        return shuffled[min(len(shuffled) - 1, _bisect(cumulative, rng.random() * total))]
+    return pick
+
+
+def _bisect(values, x):
+    lo, hi = 0, len(values)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if values[mid] < x:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def vehicle_rows(rng, count, types):
+    names = [name for name in types if name in TYPE_WEIGHTS] or list(types)
+    weights = [TYPE_WEIGHTS.get(name, 1) for name in names]
+    this_year = date.today().year
+    rows = []
+    for i in range(count):
+        name = rng.choices(names, weights)[0]
+        make, model = rng.choice(MAKES.get(name, MAKES['Car']))
+        rate = Decimal(TYPE_BASE_RATE.get(name, 50) * rng.lognormvariate(0, 0.35)).quantize(Decimal('0.01'))
+        year = this_year - min(10, int(rng.expovariate(1 / 3.0)))
+        status = 'MAINTENANCE' if rng.random() < 0.03 else 'AVAILABLE'
+        rows.append((types[name], make, model, f"{PLATE_PREFIX}{i:07d}", year, status, rate))
+    return rows
+
+
+def customer_rows(rng, count, password_hash):
+    rows = []
+    for i in range(count):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        rows.append((name, customer_email(i), f"555-{rng.randrange(10 ** 7):07d}", f"SL{i:08d}", password_hash))
+    return rows
+
+
+def rental_rows(rng, target, vehicles, customer_ids, history_days, staff_ids):
+    """Back-to-back rentals per vehicle so none overlap; about ``target`` in total"""
+    today = date.today()
+    first_day = today - timedelta(days=history_days)
+    mean_length = 3.0
+    # Average gap between rentals that spreads the target evenly over the fleet
+    mean_cycle = max(mean_length + 0.5, len(vehicles) * history_days / max(1, target))
+    mean_gap = mean_cycle - mean_length
+    pick_customer = zipf_picker(rng, customer_ids)
+    rows = []
+    for vehicle_id, rate, vehicle_status in vehicles:
+        day = first_day + timedelta(days=int(rng.expovariate(1 / mean_gap)))
+        while day <= today + timedelta(days=30) and len(rows) < target:
+            length = geometric(rng, mean_length)
+            due = day + timedelta(days=length)
+            if vehicle_status == 'MAINTENANCE' and due >= today:
+                break  # in the workshop now
+            total = rate * (length + 1)  # CalculateRentalAmount counts both ends
+            returned, fine, status = None, Decimal('0.00'), 'ACTIVE'
+            roll = rng.random()
+            if due < today:
+                if roll < 0.03:
+                    status = 'CANCELLED'
+                elif roll < 0.05 and due >= today - timedelta(days=30):
+                    status = 'OVERDUE'
+                else:
+                    late = geometric(rng, 2.0) if roll > 0.90 else 0
+                    returned = min(today, due + timedelta(days=late))
+                    fine = (rate * Decimal('0.10') * (returned - due).days).quantize(Decimal('0.01'))
+                    status = 'COMPLETED'
+            rows.append((vehicle_id, pick_customer(), day, due, returned, rate, total, fine, status,
+                         rng.choice(staff_ids) if staff_ids else None))
+            # OVERDUE and ACTIVE rentals hold the vehicle, so nothing follows them
+            if status in ('ACTIVE', 'OVERDUE'):
+                break
+            end = returned or due
+            day = end + timedelta(days=1 + int(rng.expovariate(1 / max(0.5, mean_gap))))
+    return rows
+
+
+def reservation_rows(rng, count, customer_ids, type_ids):
+    today = date.today()
+    pick_customer = zipf_picker(rng, customer_ids)
+    rows = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            start = today + timedelta(days=rng.randint(1, 60))
+            status = 'PENDING'
+        else:
+            start = today - timedelta(days=rng.randint(1, 365))
+            status = 'COMPLETED' if rng.random() < 0.8 else 'CANCELLED'
+        end = start + timedelta(days=geometric(rng, 3.0))
+        booked = min(today, start - timedelta(days=rng.randint(0, 30)))
+        rows.append((pick_customer(), rng.choice(type_ids), booked, start, end, status))
+    return rows
+
+
+def maintenance_rows(rng, count, vehicles, history_days):
+    """Past and scheduled jobs, plus one IN_PROGRESS job per vehicle seeded in MAINTENANCE"""
+    today = date.today()
+    jobs = ['Oil change', 'Tyre replacement', 'Brake service', 'Annual inspection', 'Battery replacement']
+    vehicle_ids = [vehicle_id for vehicle_id, _, _ in vehicles]
+    rows = [(vehicle_id, today, rng.choice(jobs), Decimal('0.00'), 'IN_PROGRESS')
+            for vehicle_id, _, status in vehicles if status == 'MAINTENANCE']
+    for _ in range(count):
+        day = today - timedelta(days=rng.randint(-30, history_days))
+        status = 'SCHEDULED' if day > today else 'COMPLETED'
+        cost = Decimal(80 * rng.lognormvariate(0, 0.6)).quantize(Decimal('0.01'))
+        rows.append((rng.choice(vehicle_ids), day, rng.choice(jobs), cost, status))
+    return rows
+
+
+def reset(conn, cursor):
+    """Delete every seeded row (and rows that reference them)"""
+    seeded_vehicles = f"SELECT VehicleID FROM Vehicle WHERE PlateNo LIKE '{PLATE_PREFIX}%'"
+    seeded_customers = f"SELECT CustomerID FROM Customer WHERE Email LIKE '%@{EMAIL_DOMAIN}'"
+    for statement in (
+        f"DELETE FROM BookingRequest WHERE CustomerID IN ({seeded_customers})",
+        f"DELETE FROM Rental WHERE VehicleID IN ({seeded_vehicles}) OR CustomerID IN ({seeded_customers})",
+        f"DELETE FROM Reservation WHERE CustomerID IN ({seeded_customers})",
+        f"DELETE FROM Maintenance WHERE VehicleID IN ({seeded_vehicles})",
+        f"DELETE FROM Vehicle WHERE PlateNo LIKE '{PLATE_PREFIX}%'",
+        f"DELETE FROM Customer WHERE Email LIKE '%@{EMAIL_DOMAIN}'",
+    ):
+        cursor.execute(statement)
+        print(f"  {cursor.rowcount:>8} rows  {statement.split(' WHERE')[0]}")
+    conn.commit()
+
+
+def seeded_ids(cursor, query):
+    cursor.execute(query)
+    return [tuple(row.values()) if len(row) > 1 else next(iter(row.values())) for row in cursor.fetchall()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--vehicles', type=int, default=2000)
+    parser.add_argument('--customers', type=int, default=20000)
+    parser.add_argument('--rentals', type=int, default=200000)
+    parser.add_argument('--reservations', type=int, default=20000)
+    parser.add_argument('--maintenance', type=int, default=5000)
+    parser.add_argument('--history-days', type=int, default=730)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='delete previously seeded rows first')
+    parser.add_argument('--reset-only', action='store_true', help='delete seeded rows and stop')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pool = make_pool()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if args.reset or args.reset_only:
+                print("Removing seeded rows")
+                reset(conn, cursor)
+                if args.reset_only:
+                    return
+
+            cursor.execute("SELECT TypeID, Name FROM VehicleType")
+            types = {row['Name']: row['TypeID'] for row in cursor.fetchall()}
+            cursor.execute("SELECT StaffID FROM Staff")
+            staff_ids = [row['StaffID'] for row in cursor.fetchall()]
+
+            steps = []
+            t0 = time.perf_counter()
+            insert_batches(conn, cursor, INSERT_VEHICLE, vehicle_rows(rng, args.vehicles, types), args.batch_size)
+            steps.append(('vehicles', args.vehicles, time.perf_counter() - t0))
+
+            t0 = time.perf_counter()
+            password_hash = generate_password_hash(PASSWORD)  # one hash for everyone; hashing dominates otherwise
+            insert_batches(conn, cursor, INSERT_CUSTOMER, customer_rows(rng, args.customers, password_hash),
+                           args.batch_size)
+            steps.append(('customers', args.customers, time.perf_counter() - t0))
+
+            vehicles = seeded_ids(cursor, f"SELECT VehicleID, RatePerDay, Status FROM Vehicle "
+                                          f"WHERE PlateNo LIKE '{PLATE_PREFIX}%' ORDER BY VehicleID")
+            customer_ids = seeded_ids(cursor, f"SELECT CustomerID FROM Customer "
+                                              f"WHERE Email LIKE '%@{EMAIL_DOMAIN}' ORDER BY CustomerID")
+            conn.commit()
+
+            t0 = time.perf_counter()
+            rentals = rental_rows(rng, args.rentals, vehicles, customer_ids, args.history_days, staff_ids)
+            try:
+                insert_batches(conn, cursor, INSERT_RENTAL, rentals, args.batch_size)
+            except MySQLdb.OperationalError as e:
+                if e.args and e.args[0] == ER_SIGNAL_EXCEPTION:
+                    sys.exit(f"Rental trigger refused historical rows ({e.args[1]}); "
+                             "create the database from database/smartride_schema_fixed.sql")
+                raise
+            steps.append(('rentals', len(rentals), time.perf_counter() - t0))
+
+            t0 = time.perf_counter()
+            rows = reservation_rows(rng, args.reservations, customer_ids, list(types.values()))
+            insert_batches(conn, cursor, INSERT_RESERVATION, rows, args.batch_size)
+            steps.append(('reservations', len(rows), time.perf_counter() - t0))
+
+            t0 = time.perf_counter()
+            rows = maintenance_rows(rng, args.maintenance, vehicles, args.history_days)
+            insert_batches(conn, cursor, INSERT_MAINTENANCE, rows, args.batch_size)
+            steps.append(('maintenance', len(rows), time.perf_counter() - t0))
+
+            # The rental and maintenance triggers flip Vehicle.Status on every insert
+            cursor.execute(RESTORE_VEHICLE_STATUS)
+            conn.commit()
+
+            # Fresh index statistics so plans match the new volumes
+            for table in ('Vehicle', 'Customer', 'Rental', 'Reservation', 'Maintenance'):
+                cursor.execute(f"ANALYZE TABLE {table}")
+                cursor.fetchall()
+        finally:
+            cursor.close()
+    pool.close_all()
+
+    for name, count, elapsed in steps:
+        print(f"  {name:<13} {count:>9} rows  {elapsed:7.2f}s  ({count / elapsed if elapsed else 0:,.0f} rows/s)")
+    print(f"\nCustomers log in as {customer_email(0)} .. {customer_email(args.customers - 1)} "
+          f"with password '{PASSWORD}'.")
+    print("Next: flask rollup-backfill && flask sweep-overdue")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+SmartRide Booking Service
+Creates rentals under a vehicle row lock, with client idempotency keys
+"""
+
+import uuid
+import logging
+from decimal import Decimal
+
+import MySQLdb
+
+from db import get_pool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROCESSED_BY = 1  # John Admin processes customer-side bookings
+DEADLOCK_RETRIES = 2
+
+ER_DUP_ENTRY = 1062
+ER_LOCK_DEADLOCK = 1213
+ER_SIGNAL_EXCEPTION = 1644
+
+CLAIM_KEY = "INSERT INTO BookingRequest (IdempotencyKey, CustomerID) VALUES (%s, %s)"
+REPLAY_KEY = """
+    SELECT b.CustomerID, b.RentalID, r.TotalAmount
+    FROM BookingRequest b
+    LEFT JOIN Rental r ON b.RentalID = r.RentalID
+    WHERE b.IdempotencyKey = %s
+"""
+LOCK_VEHICLE = "SELECT VehicleID, Status, RatePerDay FROM Vehicle WHERE VehicleID = %s FOR UPDATE"
+CONFLICTS = """
+    SELECT 'rental' AS Kind, RentalID AS ID
+    FROM Rental
+    WHERE VehicleID = %s AND Status IN ('ACTIVE', 'OVERDUE')
+      AND StartDate <= %s AND (DueDate >= %s OR Status = 'OVERDUE')
+    UNION ALL
+    SELECT 'reservation', ResID
+    FROM Reservation
+    WHERE VehicleID = %s AND Status = 'CONFIRMED'
+      AND StartDate <= %s AND EndDate >= %s
+    LIMIT 1
+"""
+INSERT_RENTAL = """
+    INSERT INTO Rental (VehicleID, CustomerID, StartDate, DueDate, DailyRate, TotalAmount, ProcessedBy)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+RECORD_KEY = "UPDATE BookingRequest SET RentalID = %s WHERE IdempotencyKey = %s"
+
+
+class BookingError(Exception):
+    """The booking was rejected; the message is safe to show the customer"""
+
+
+def new_idempotency_key():
+    """Key for a booking form; the same key on resubmit returns the first result"""
+    return str(uuid.uuid4())
+
+
+def _valid_key(key):
+    try:
+        return str(uuid.UUID(key))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def _replay(cursor, key, customer_id):
+    cursor.execute(REPLAY_KEY, (key,))
+    row = cursor.fetchone()
+    if row is None or row['RentalID'] is None:
+        # The first attempt is gone (rolled back or rental deleted); let the caller retry
+        raise BookingError('This booking request is no longer valid. Please try again.')
+    if row['CustomerID'] != customer_id:
+        raise BookingError('Invalid booking request.')
+    return {'rental_id': row['RentalID'], 'total_amount': row['TotalAmount'], 'replayed': True}
+
+
+def find_booking(idempotency_key, customer_id):
+    """Result of an already-committed booking for this key, or None"""
+    key = _valid_key(idempotency_key)
+    if key is None:
+        return None
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            return _replay(cursor, key, customer_id)
+        except BookingError:
+            return None
+        finally:
+            cursor.close()
+
+
+def _book(conn, cursor, key, vehicle_id, customer_id, start_date, due_date, processed_by):
+    # Each read after the lock must see rentals committed while we waited
+    cursor.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+
+    if key:
+        try:
+            cursor.execute(CLAIM_KEY, (key, customer_id))
+        except MySQLdb.IntegrityError as e:
+            conn.rollback()
+            if e.args and e.args[0] == ER_DUP_ENTRY:
+                return _replay(cursor, key, customer_id)
+            raise BookingError('Customer does not exist.')
+
+    cursor.execute(LOCK_VEHICLE, (vehicle_id,))
+    vehicle = cursor.fetchone()
+    if vehicle is None:
+        raise BookingError('Vehicle does not exist.')
+    if vehicle['Status'] == 'MAINTENANCE':
+        raise BookingError('Vehicle is under maintenance.')
+
+    cursor.execute(CONFLICTS, (vehicle_id, due_date, start_date, vehicle_id, due_date, start_date))
+    if cursor.fetchone():
+        raise BookingError('Vehicle is not available for the selected dates.')
+
+    days = (due_date - start_date).days + 1  # same as CalculateRentalAmount
+    daily_rate = vehicle['RatePerDay']
+    total_amount = daily_rate * Decimal(days)
+    try:
+        cursor.execute(INSERT_RENTAL, (vehicle_id, customer_id, start_date, due_date,
+                                       daily_rate, total_amount, processed_by))
+    except MySQLdb.OperationalError as e:
+        if e.args and e.args[0] == ER_SIGNAL_EXCEPTION:  # tr_rental_validate_dates
+            raise BookingError(e.args[1])
+        raise
+    except MySQLdb.IntegrityError:
+        raise BookingError('Customer does not exist.')
+    rental_id = cursor.lastrowid
+
+    if key:
+        cursor.execute(RECORD_KEY, (rental_id, key))
+    conn.commit()
+    return {'rental_id': rental_id, 'total_amount': total_amount, 'replayed': False}
+
+
+def create_booking(vehicle_id, customer_id, start_date, due_date,
+                   processed_by=DEFAULT_PROCESSED_BY, idempotency_key=None):
+    """Book ``vehicle_id`` for ``[start_date, due_date]`` in one transaction.
+
+    The Vehicle row is locked with SELECT ... FOR UPDATE, so concurrent
+    bookings of the same vehicle queue up and each one sees the rentals
+    committed before it. An ``idempotency_key`` is claimed with a
+    primary-key insert. A resubmitted form blocks on that key until the
+    first attempt finishes, then gets the first attempt's rental back
+    instead of a second one. Deadlock victims are retried.
+
+    Returns ``{'rental_id', 'total_amount', 'replayed'}``; raises
+    BookingError when the booking is refused.
+    """
+    key = None
+    if idempotency_key is not None:
+        key = _valid_key(idempotency_key)
+        if key is None:
+            raise BookingError('Invalid booking request.')
+
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for attempt in range(DEADLOCK_RETRIES + 1):
+                try:
+                    return _book(conn, cursor, key, vehicle_id, customer_id, start_date, due_date, processed_by)
+                except MySQLdb.OperationalError as e:
+                    conn.rollback()
+                    if not e.args or e.args[0] != ER_LOCK_DEADLOCK or attempt == DEADLOCK_RETRIES:
+                        raise
+                    logger.warning(f"Booking of vehicle {vehicle_id} deadlocked; retrying")
+                except Exception:
+                    conn.rollback()
+                    raise
+        finally:
+            cursor.close()
@@ -0,0 +1,334 @@
+"""
+SmartRide Bulk Import
+Validates CSV uploads row by row and inserts them in executemany batches
+"""
+
+import csv
+import time
+import logging
+import threading
+import multiprocessing
+from decimal import Decimal, InvalidOperation
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import MySQLdb
+from werkzeug.security import generate_password_hash
+
+from db import get_pool
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 200
+# Smaller batches are hashed in the calling thread; a process round trip costs more
+INLINE_HASH_ROWS = 50
+
+VEHICLE_INSERT = """
+    INSERT INTO Vehicle (TypeID, Make, Model, PlateNo, Year, RatePerDay)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+CUSTOMER_INSERT = """
+    INSERT INTO Customer (Name, Email, Phone, LicenseNo, Password)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+
+class ImportReport:
+    """Outcome of one import: counts plus per-row errors keyed by CSV line"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.rows = 0
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        self.errors.sort(key=lambda error: error['line'])
+        return self
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'elapsed': round(self.elapsed, 3),
+        }
+
+
+def _field(row, *names):
+    """First non-empty value among alternative column names"""
+    for name in names:
+        value = row.get(name)
+        if value is not None and value.strip():
+            return value.strip()
+    return ''
+
+
+def _batches(reader, size):
+    batch = []
+    for row in reader:
+        # DictReader line_num is the line the row ended on (header is line 1)
+        batch.append((reader.line_num, row))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _existing(cursor, column, table, values):
+    """Subset of ``values`` already present in ``table.column``"""
+    if not values:
+        return set()
+    placeholders = ', '.join(['%s'] * len(values))
+    cursor.execute(f"SELECT {column} FROM {table} WHERE {column} IN ({placeholders})", tuple(values))
+    return {row[column] for row in cursor.fetchall()}
+
+
+def _insert_batch(cursor, statement, items, report):
+    """executemany the batch; on a row error retry row by row to pin it down.
+
+    MySQLdb may split a large executemany into several INSERTs, so the
+    batch runs under a savepoint: a failure undoes the chunks that already
+    went in before the row-by-row retry, which stays in the same transaction.
+    """
+    if not items:
+        return
+    cursor.execute("SAVEPOINT import_batch")
+    try:
+        cursor.executemany(statement, [values for _, values in items])
+        report.inserted += len(items)
+        return
+    except (MySQLdb.IntegrityError, MySQLdb.DataError):
+        cursor.execute("ROLLBACK TO SAVEPOINT import_batch")
+    for line, values in items:
+        try:
+            cursor.execute(statement, values)
+            report.inserted += 1
+        except (MySQLdb.IntegrityError, MySQLdb.DataError) as e:
+            report.error(line, e.args[1] if len(e.args) > 1 else str(e))
+
+
+def _load_vehicle_types(cursor):
+    cursor.execute("SELECT TypeID, Name FROM VehicleType")
+    rows = cursor.fetchall()
+    return {row['TypeID'] for row in rows}, {row['Name'].lower(): row['TypeID'] for row in rows}
+
+
+def _validate_vehicle(row, type_ids, type_names):
+    type_value = _field(row, 'TypeID', 'Type', 'TypeName')
+    make = _field(row, 'Make')
+    model = _field(row, 'Model')
+    plate_no = _field(row, 'PlateNo', 'Plate').upper()
+    year = _field(row, 'Year')
+    rate = _field(row, 'RatePerDay', 'Rate')
+
+    missing = [name for name, value in (('TypeID/Type', type_value), ('Make', make), ('Model', model),
+                                        ('PlateNo', plate_no), ('Year', year), ('RatePerDay', rate)) if not value]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+    if type_value.isdigit() and int(type_value) in type_ids:
+        type_id = int(type_value)
+    elif type_value.lower() in type_names:
+        type_id = type_names[type_value.lower()]
+    else:
+        raise ValueError(f"unknown vehicle type '{type_value}'")
+
+    if not year.isdigit() or not 1901 <= int(year) <= 2155:
+        raise ValueError(f"invalid Year '{year}'")
+    try:
+        rate_value = Decimal(rate)
+    except InvalidOperation:
+        raise ValueError(f"invalid RatePerDay '{rate}'")
+    if not rate_value.is_finite():
+        raise ValueError(f"invalid RatePerDay '{rate}'")
+    if rate_value <= 0:
+        raise ValueError("RatePerDay must be positive")
+    if len(plate_no) > 20:
+        raise ValueError("PlateNo longer than 20 characters")
+
+    return (type_id, make[:50], model[:50], plate_no, int(year), rate_value)
+
+
+def import_vehicles(stream, batch_size=BATCH_SIZE, dry_run=False):
+    """Import Vehicle rows from a CSV text stream in one transaction.
+
+    Columns: TypeID or Type (name), Make, Model, PlateNo, Year, RatePerDay.
+    """
+    report = ImportReport('vehicles')
+    reader = csv.DictReader(stream)
+    seen_plates = set()
+
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            type_ids, type_names = _load_vehicle_types(cursor)
+            for batch in _batches(reader, batch_size):
+                valid = []
+                for line, row in batch:
+                    report.rows += 1
+                    try:
+                        values = _validate_vehicle(row, type_ids, type_names)
+                    except ValueError as e:
+                        report.error(line, str(e))
+                        continue
+                    if values[3] in seen_plates:
+                        report.error(line, f"duplicate PlateNo '{values[3]}' in file")
+                        continue
+                    seen_plates.add(values[3])
+                    valid.append((line, values))
+
+                taken = {plate.upper() for plate in _existing(cursor, 'PlateNo', 'Vehicle', [v[3] for _, v in valid])}
+                items = []
+                for line, values in valid:
+                    if values[3] in taken:
+                        report.error(line, f"PlateNo '{values[3]}' already exists")
+                    else:
+                        items.append((line, values))
+                _insert_batch(cursor, VEHICLE_INSERT, items, report)
+
+            if dry_run:
+                conn.rollback()
+                report.inserted = 0
+            else:
+                conn.commit()
+        finally:
+            cursor.close()
+
+    return report.finish()
+
+
+def _validate_customer(row):
+    name = _field(row, 'Name')
+    if not name:
+        name = ' '.join(part for part in (_field(row, 'FirstName', 'firstName'),
+                                          _field(row, 'LastName', 'lastName')) if part)
+    email = _field(row, 'Email').lower()
+    phone = _field(row, 'Phone')
+    license_no = _field(row, 'LicenseNo', 'License').upper()
+    password = _field(row, 'Password')
+
+    missing = [label for label, value in (('Name', name), ('Email', email), ('Phone', phone),
+                                          ('LicenseNo', license_no), ('Password', password)) if not value]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    if '@' not in email or len(email) > 100:
+        raise ValueError(f"invalid Email '{email}'")
+    if len(phone) > 15:
+        raise ValueError("Phone longer than 15 characters")
+    if len(license_no) > 20:
+        raise ValueError("LicenseNo longer than 20 characters")
+
+    return [name[:100], email, phone, license_no, password]
+
+
+_hash_pool = {'executor': None, 'lock': threading.Lock()}
+
+
+def _hash_executor(workers=None):
+    """The process pool shared by every import, started on first use.
+
+    spawn, not fork: forking a threaded web worker can deadlock the child.
+    Spawned children re-import the app, so the pool is created once and
+    kept; ``workers`` only sizes it then.
+    """
+    with _hash_pool['lock']:
+        if _hash_pool['executor'] is None:
+            _hash_pool['executor'] = ProcessPoolExecutor(max_workers=workers,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+        return _hash_pool['executor']
+
+
+def _hash_passwords(passwords, workers=None):
+    if len(passwords) < INLINE_HASH_ROWS:
+        return [generate_password_hash(password) for password in passwords]
+    executor = _hash_executor(workers)
+    chunksize = max(1, len(passwords) // ((workers or multiprocessing.cpu_count()) * 4))
+    try:
+        return list(executor.map(generate_password_hash, passwords, chunksize=chunksize))
+    except BrokenProcessPool:
+        # A child died; start a fresh pool next time and finish this batch here
+        logger.error("Password hashing pool broke; hashing this batch inline")
+        with _hash_pool['lock']:
+            if _hash_pool['executor'] is executor:
+                _hash_pool['executor'] = None
+        return [generate_password_hash(password) for password in passwords]
+
+
+def import_customers(stream, batch_size=BATCH_SIZE, dry_run=False, hash_workers=None):
+    """Import Customer rows from a CSV text stream in one transaction.
+
+    Columns: Name (or FirstName + LastName), Email, Phone, LicenseNo,
+    Password. pbkdf2 hashing is CPU-bound, so each batch's passwords are
+    hashed across a shared process pool, or inline for small batches.
+    """
+    report = ImportReport('customers')
+    reader = csv.DictReader(stream)
+    seen_emails, seen_licenses = set(), set()
+
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for batch in _batches(reader, batch_size):
+                valid = []
+                for line, row in batch:
+                    report.rows += 1
+                    try:
+                        values = _validate_customer(row)
+                    except ValueError as e:
+                        report.error(line, str(e))
+                        continue
+                    if values[1] in seen_emails:
+                        report.error(line, f"duplicate Email '{values[1]}' in file")
+                        continue
+                    if values[3] in seen_licenses:
+                        report.error(line, f"duplicate LicenseNo '{values[3]}' in file")
+                        continue
+                    seen_emails.add(values[1])
+                    seen_licenses.add(values[3])
+                    valid.append((line, values))
+
+                emails = {e.lower() for e in _existing(cursor, 'Email', 'Customer', [v[1] for _, v in valid])}
+                licenses = {l.upper() for l in _existing(cursor, 'LicenseNo', 'Customer', [v[3] for _, v in valid])}
+                items = []
+                for line, values in valid:
+                    if values[1] in emails:
+                        report.error(line, f"Email '{values[1]}' already exists")
+                    elif values[3] in licenses:
+                        report.error(line, f"LicenseNo '{values[3]}' already exists")
+                    else:
+                        items.append((line, values))
+
+                hashes = _hash_passwords([values[4] for _, values in items], hash_workers)
+                for (_, values), hashed in zip(items, hashes):
+                    values[4] = hashed
+                _insert_batch(cursor, CUSTOMER_INSERT, [(line, tuple(values)) for line, values in items], report)
+
+            if dry_run:
+                conn.rollback()
+                report.inserted = 0
+            else:
+                conn.commit()
+        finally:
+            cursor.close()
+
+    return report.finish()
+
+
+IMPORTERS = {
+    'vehicles': import_vehicles,
+    'customers': import_customers,
+}
@@ -0,0 +1,155 @@
+"""
+SmartRide In-Process Caching
+Thread-safe TTL cache with single-flight loading and background refresh
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ('value', 'loaded_at', 'has_value', 'loading', 'refreshing', 'event', 'error')
+
+    def __init__(self):
+        self.value = None
+        self.loaded_at = 0.0
+        self.has_value = False
+        self.loading = False       # a synchronous load is in flight
+        self.refreshing = False    # a background refresh is in flight
+        self.event = None
+        self.error = None
+
+
+class TTLCache:
+    """Keyed cache where each value expires ``ttl`` seconds after loading.
+
+    Concurrent misses for the same key share one load (single-flight): the
+    first caller runs the loader while the others wait for its result. Once
+    a value is older than ``refresh_ahead * ttl`` it is still served, but a
+    daemon thread reloads it so readers rarely pay for the load themselves.
+    Invalidation discards the value and any load already in flight.
+    """
+
+    def __init__(self, ttl, maxsize=128, refresh_ahead=None, name='cache'):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.refresh_ahead = refresh_ahead
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._stats = {'hits': 0, 'misses': 0, 'loads': 0, 'refreshes': 0, 'errors': 0}
+
+    def get(self, key, loader):
+        """Return the cached value for ``key``, calling ``loader()`` on a miss"""
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = _Entry()
+                    self._evict()
+                self._entries.move_to_end(key)
+
+                age = time.monotonic() - entry.loaded_at
+                if entry.has_value and age < self.ttl:
+                    self._stats['hits'] += 1
+                    if (self.refresh_ahead is not None and not entry.refreshing
+                            and not entry.loading and age >= self.ttl * self.refresh_ahead):
+                        entry.refreshing = True
+                        self._start_refresh(key, entry, loader, self._generation)
+                    return entry.value
+
+                if entry.has_value and (entry.loading or entry.refreshing):
+                    # Stale-while-revalidate: someone is already reloading
+                    self._stats['hits'] += 1
+                    return entry.value
+                if entry.loading:
+                    event = entry.event
+                else:
+                    self._stats['misses'] += 1
+                    entry.loading = True
+                    entry.event = threading.Event()
+                    generation = self._generation
+                    event = None
+
+            if event is not None:
+                event.wait()
+                with self._lock:
+                    if entry.error is not None and not entry.has_value:
+                        raise entry.error
+                continue
+
+            return self._load(key, entry, loader, generation)
+
+    def _load(self, key, entry, loader, generation):
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+                entry.loading = False
+                entry.error = e
+                entry.event.set()
+            raise
+        with self._lock:
+            self._stats['loads'] += 1
+            entry.loading = False
+            entry.error = None
+            if generation == self._generation:
+                entry.value = value
+                entry.loaded_at = time.monotonic()
+                entry.has_value = True
+            entry.event.set()
+        return value
+
+    def _start_refresh(self, key, entry, loader, generation):
+        def refresh():
+            try:
+                value = loader()
+            except Exception as e:
+                logger.error(f"Background refresh of {self.name}[{key!r}] failed: {e}")
+                with self._lock:
+                    self._stats['errors'] += 1
+                    entry.refreshing = False
+                return
+            with self._lock:
+                self._stats['refreshes'] += 1
+                entry.refreshing = False
+                if generation == self._generation and self._entries.get(key) is entry:
+                    entry.value = value
+                    entry.loaded_at = time.monotonic()
+                    entry.has_value = True
+
+        threading.Thread(target=refresh, name=f"{self.name}-refresh", daemon=True).start()
+
+    def _evict(self):
+        while len(self._entries) > self.maxsize:
+            oldest_key = next(iter(self._entries))
+            if self._entries[oldest_key].loading:
+                break
+            del self._entries[oldest_key]
+
+    def invalidate(self, key=None):
+        """Drop one key (or everything) and ignore loads started before now"""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                stale = list(self._entries.items())
+            else:
+                stale = [(key, self._entries[key])] if key in self._entries else []
+            for k, entry in stale:
+                entry.has_value = False
+                entry.value = None
+                if not entry.loading:
+                    del self._entries[k]
+
+    def stats(self):
+        """Snapshot of hit/miss counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        return stats
@@ -8,6 +8,8 @@ CREATE DATABASE IF NOT EXISTS smartride_rental;
 USE smartride_rental;
 
 -- Drop existing tables (for clean setup)
+DROP TABLE IF EXISTS BookingRequest;
+DROP TABLE IF EXISTS DailyRollup;
 DROP TABLE IF EXISTS Maintenance;
 DROP TABLE IF EXISTS Rental;
 DROP TABLE IF EXISTS Reservation;
@@ -15,6 +17,8 @@ DROP TABLE IF EXISTS Vehicle;
 DROP TABLE IF EXISTS VehicleType;
 DROP TABLE IF EXISTS Customer;
 DROP TABLE IF EXISTS Staff;
+DROP TABLE IF EXISTS CacheVersion;
+DROP TABLE IF EXISTS SchemaMigration;
 
 -- =============================================
 -- ENTITY TABLES
@@ -76,6 +80,7 @@ CREATE TABLE Rental (
     DailyRate DECIMAL(10,2) NOT NULL,
     TotalAmount DECIMAL(10,2) NOT NULL,
     FineAmount DECIMAL(10,2) DEFAULT 0.00,
+    EstimatedFine DECIMAL(10,2) DEFAULT 0.00,
     Status ENUM('ACTIVE', 'COMPLETED', 'OVERDUE', 'CANCELLED') DEFAULT 'ACTIVE',
     ProcessedBy INT,
     CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -90,6 +95,7 @@ CREATE TABLE Reservation (
     ResID INT PRIMARY KEY AUTO_INCREMENT,
     CustomerID INT NOT NULL,
     VehicleTypeID INT NOT NULL,
+    VehicleID INT NULL,
     ResDate DATE NOT NULL,
     StartDate DATE NOT NULL,
     EndDate DATE NOT NULL,
@@ -97,7 +103,8 @@ CREATE TABLE Reservation (
     CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (CustomerID) REFERENCES Customer(CustomerID) ON DELETE CASCADE,
-    FOREIGN KEY (VehicleTypeID) REFERENCES VehicleType(TypeID) ON DELETE RESTRICT
+    FOREIGN KEY (VehicleTypeID) REFERENCES VehicleType(TypeID) ON DELETE RESTRICT,
+    FOREIGN KEY (VehicleID) REFERENCES Vehicle(VehicleID) ON DELETE SET NULL
 );
 
 -- 7. Maintenance Entity
@@ -113,28 +120,96 @@ CREATE TABLE Maintenance (
     FOREIGN KEY (VehicleID) REFERENCES Vehicle(VehicleID) ON DELETE CASCADE
 );
 
+-- 8. Cache version stamps (cross-worker cache invalidation)
+CREATE TABLE CacheVersion (
+    Name VARCHAR(50) PRIMARY KEY,
+    Version INT NOT NULL DEFAULT 1,
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+INSERT INTO CacheVersion (Name, Version) VALUES ('VehicleType', 1);
+
+-- 9. Booking idempotency keys (one rental per client-generated key)
+CREATE TABLE BookingRequest (
+    IdempotencyKey CHAR(36) PRIMARY KEY,
+    CustomerID INT NOT NULL,
+    RentalID INT NULL,
+    CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (CustomerID) REFERENCES Customer(CustomerID) ON DELETE CASCADE,
+    FOREIGN KEY (RentalID) REFERENCES Rental(RentalID) ON DELETE SET NULL
+);
+
+-- 10. Daily revenue/utilization rollup (maintained by rollup.py)
+CREATE TABLE DailyRollup (
+    RollupDate DATE NOT NULL,
+    TypeID INT NOT NULL,
+    Revenue DECIMAL(12,2) NOT NULL DEFAULT 0.00,           -- rentals returned that day
+    Fines DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    RentalsStarted INT NOT NULL DEFAULT 0,
+    RentalsCompleted INT NOT NULL DEFAULT 0,
+    VehicleDaysRented INT NOT NULL DEFAULT 0,
+    StartedCompleted INT NOT NULL DEFAULT 0,               -- completed rentals that started that day
+    StartedRevenue DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    StartedFines DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    RefreshedAt TIMESTAMP NOT NULL,
+    PRIMARY KEY (RollupDate, TypeID),
+    FOREIGN KEY (TypeID) REFERENCES VehicleType(TypeID) ON DELETE CASCADE
+);
+
+-- 11. Applied schema migrations (migrate.py). This script already contains
+-- every migration in migrations/, so they are recorded as baselined.
+CREATE TABLE SchemaMigration (
+    Version INT PRIMARY KEY,
+    Name VARCHAR(255) NOT NULL,
+    Checksum CHAR(64) NULL,
+    ExecutionMs INT NULL,
+    AppliedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO SchemaMigration (Version, Name) VALUES
+(1, 'fulltext_search'),
+(2, 'cache_version'),
+(3, 'reservation_vehicle'),
+(4, 'booking_request'),
+(5, 'daily_rollup'),
+(6, 'overdue_sweeper'),
+(7, 'composite_indexes');
+
 -- =============================================
 -- INDEXES FOR PERFORMANCE
 -- =============================================
 
 -- Vehicle indexes
 CREATE INDEX idx_vehicle_type ON Vehicle(TypeID);
-CREATE INDEX idx_vehicle_status ON Vehicle(Status);
+CREATE INDEX idx_vehicle_status_type ON Vehicle(Status, TypeID, RatePerDay);
 CREATE INDEX idx_vehicle_plate ON Vehicle(PlateNo);
 
 -- Customer indexes  
 CREATE INDEX idx_customer_email ON Customer(Email);
 CREATE INDEX idx_customer_license ON Customer(LicenseNo);
+CREATE INDEX idx_customer_name ON Customer(Name);
+
+-- Full-text search indexes (MATCH ... AGAINST in search.py)
+CREATE FULLTEXT INDEX ft_vehicle_search ON Vehicle(Make, Model, PlateNo);
+CREATE FULLTEXT INDEX ft_customer_search ON Customer(Name, Email, LicenseNo);
 
 -- Rental indexes
-CREATE INDEX idx_rental_customer ON Rental(CustomerID);
-CREATE INDEX idx_rental_vehicle ON Rental(VehicleID);
+CREATE INDEX idx_rental_customer_start ON Rental(CustomerID, StartDate);
+CREATE INDEX idx_rental_vehicle_start ON Rental(VehicleID, StartDate);
 CREATE INDEX idx_rental_dates ON Rental(StartDate, DueDate);
-CREATE INDEX idx_rental_status ON Rental(Status);
+CREATE INDEX idx_rental_status_due ON Rental(Status, DueDate);
+CREATE INDEX idx_rental_status_start ON Rental(Status, StartDate);
+CREATE INDEX idx_rental_status_return ON Rental(Status, ReturnDate);
+CREATE INDEX idx_rental_updated ON Rental(UpdatedAt);
 
 -- Reservation indexes
-CREATE INDEX idx_reservation_customer ON Reservation(CustomerID);
+CREATE INDEX idx_reservation_customer_status ON Reservation(CustomerID, Status, StartDate);
+CREATE INDEX idx_reservation_status_start ON Reservation(Status, StartDate);
 CREATE INDEX idx_reservation_dates ON Reservation(StartDate, EndDate);
+CREATE INDEX idx_reservation_vehicle ON Reservation(VehicleID, Status);
+
+-- Maintenance indexes
+CREATE INDEX idx_maintenance_date ON Maintenance(Date);
 
 -- =============================================
 -- STORED PROCEDURES
@@ -222,10 +297,8 @@ BEGIN
     DECLARE v_daily_rate DECIMAL(10,2);
     DECLARE v_vehicle_available INT DEFAULT 0;
     
-    -- Check if vehicle is available
-    SELECT COUNT(*) INTO v_vehicle_available
-    FROM Vehicle 
-    WHERE VehicleID = p_vehicle_id AND Status = 'AVAILABLE';
+    -- Check the vehicle is free for the requested dates
+    SET v_vehicle_available = IsVehicleAvailable(p_vehicle_id, p_start_date, p_due_date);
     
     IF v_vehicle_available = 0 THEN
         SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Vehicle is not available for rental';
@@ -280,17 +353,24 @@ DETERMINISTIC
 BEGIN
     DECLARE v_conflict_count INT DEFAULT 0;
     
-    -- Check for conflicting rentals
+    -- Check for overlapping rentals (an overdue rental blocks until it is returned)
     SELECT COUNT(*) INTO v_conflict_count
     FROM Rental 
     WHERE VehicleID = p_vehicle_id 
     AND Status IN ('ACTIVE', 'OVERDUE')
-    AND (
-        (StartDate <= p_end_date AND DueDate >= p_start_date)
-    );
-    
-    -- Check vehicle status
-    IF (SELECT Status FROM Vehicle WHERE VehicleID = p_vehicle_id) != 'AVAILABLE' THEN
+    AND StartDate <= p_end_date
+    AND (DueDate >= p_start_date OR Status = 'OVERDUE');
+    
+    -- Check for confirmed reservations allocated to this vehicle
+    SELECT v_conflict_count + COUNT(*) INTO v_conflict_count
+    FROM Reservation
+    WHERE VehicleID = p_vehicle_id
+    AND Status = 'CONFIRMED'
+    AND StartDate <= p_end_date
+    AND EndDate >= p_start_date;
+    
+    -- Vehicles in maintenance cannot be booked
+    IF (SELECT Status FROM Vehicle WHERE VehicleID = p_vehicle_id) = 'MAINTENANCE' THEN
         SET v_conflict_count = v_conflict_count + 1;
     END IF;
     
@@ -325,9 +405,12 @@ CREATE TRIGGER tr_rental_insert_update_vehicle
 AFTER INSERT ON Rental
 FOR EACH ROW
 BEGIN
-    UPDATE Vehicle 
-    SET Status = 'RENTED', UpdatedAt = CURRENT_TIMESTAMP
-    WHERE VehicleID = NEW.VehicleID;
+    -- Future bookings leave the vehicle available until they start (overdue.py flips it then)
+    IF NEW.StartDate <= CURDATE() THEN
+        UPDATE Vehicle 
+        SET Status = 'RENTED', UpdatedAt = CURRENT_TIMESTAMP
+        WHERE VehicleID = NEW.VehicleID;
+    END IF;
 END$$
 
 -- 2. Trigger to validate rental dates
@@ -386,6 +469,29 @@ BEGIN
     END IF;
 END$$
 
+-- 5. Triggers to bump the VehicleType cache stamp (read by refdata.py)
+DELIMITER $$
+CREATE TRIGGER tr_vehicletype_insert_version
+AFTER INSERT ON VehicleType
+FOR EACH ROW
+BEGIN
+    UPDATE CacheVersion SET Version = Version + 1 WHERE Name = 'VehicleType';
+END$$
+
+CREATE TRIGGER tr_vehicletype_update_version
+AFTER UPDATE ON VehicleType
+FOR EACH ROW
+BEGIN
+    UPDATE CacheVersion SET Version = Version + 1 WHERE Name = 'VehicleType';
+END$$
+
+CREATE TRIGGER tr_vehicletype_delete_version
+AFTER DELETE ON VehicleType
+FOR EACH ROW
+BEGIN
+    UPDATE CacheVersion SET Version = Version + 1 WHERE Name = 'VehicleType';
+END$$
+
 DELIMITER ;
 
 -- =============================================
@@ -469,6 +575,7 @@ CREATE PROCEDURE SafeCreateRental(
 )
 BEGIN
     DECLARE v_total_amount DECIMAL(10,2);
+    DECLARE v_locked_vehicle INT;
     DECLARE EXIT HANDLER FOR SQLEXCEPTION
     BEGIN
         ROLLBACK;
@@ -479,14 +586,22 @@ BEGIN
     
     START TRANSACTION;
     
+    -- Lock the vehicle row first so bookings of it are serialized until
+    -- COMMIT and the checks below read a snapshot taken after the lock
+    SELECT VehicleID INTO v_locked_vehicle FROM Vehicle WHERE VehicleID = p_vehicle_id FOR UPDATE;
+    
     -- Validate customer exists
     IF NOT EXISTS (SELECT 1 FROM Customer WHERE CustomerID = p_customer_id) THEN
         SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Customer does not exist';
     END IF;
     
-    -- Validate vehicle exists and is available
-    IF NOT EXISTS (SELECT 1 FROM Vehicle WHERE VehicleID = p_vehicle_id AND Status = 'AVAILABLE') THEN
-        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Vehicle is not available';
+    -- Validate vehicle exists and is free for the requested dates
+    IF v_locked_vehicle IS NULL THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Vehicle does not exist';
+    END IF;
+    
+    IF NOT IsVehicleAvailable(p_vehicle_id, p_start_date, p_due_date) THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Vehicle is not available for the selected dates';
     END IF;
     
     -- Create rental
@@ -618,13 +733,18 @@ SELECT
     v.Make,
     v.Model,
     v.PlateNo,
+    r.StartDate,
     r.DueDate,
+    r.ReturnDate,
+    r.TotalAmount,
+    r.FineAmount,
+    r.Status,
     DATEDIFF(CURDATE(), r.DueDate) as DaysOverdue,
-    r.DailyRate * 0.10 * DATEDIFF(CURDATE(), r.DueDate) as EstimatedFine
+    r.EstimatedFine
 FROM Rental r
 JOIN Customer c ON r.CustomerID = c.CustomerID
 JOIN Vehicle v ON r.VehicleID = v.VehicleID
-WHERE r.Status = 'ACTIVE' AND r.DueDate < CURDATE();
+WHERE r.Status = 'OVERDUE';
 
 -- =============================================
 -- DATABASE SETUP COMPLETE
@@ -0,0 +1,371 @@
+"""
+SmartRide Database Access Layer
+Connection pooling and query helpers shared by the Flask app
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import MySQLdb
+import MySQLdb.cursors
+from flask import g, has_app_context
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free within the checkout timeout"""
+
+
+# Callables invoked as listener(query, args, elapsed) after each statement
+_query_listeners = []
+
+
+def add_query_listener(listener):
+    """Call ``listener(query, args, elapsed)`` after every statement on a pooled cursor"""
+    _query_listeners.append(listener)
+
+
+def remove_query_listener(listener):
+    if listener in _query_listeners:
+        _query_listeners.remove(listener)
+
+
+def notify_query_listeners(query, args, elapsed):
+    """Report a statement run outside the pool (e.g. by async_db) to the listeners"""
+    for listener in list(_query_listeners):
+        try:
+            listener(query, args, elapsed)
+        except Exception as e:
+            logger.error(f"Query listener error: {e}")
+
+
+class ObservedCursor(MySQLdb.cursors.DictCursor):
+    """DictCursor that reports each statement to the query listeners"""
+
+    _observing = False
+
+    def execute(self, query, args=None):
+        return self._observe(super().execute, query, args)
+
+    def executemany(self, query, args):
+        return self._observe(super().executemany, query, args)
+
+    def _observe(self, run, query, args):
+        # executemany may fall back to execute(); report the batch once
+        if not _query_listeners or self._observing:
+            return run(query, args)
+        self._observing = True
+        started = time.perf_counter()
+        try:
+            return run(query, args)
+        finally:
+            self._observing = False
+            notify_query_listeners(query, args, time.perf_counter() - started)
+
+
+class ConnectionPool:
+    """Bounded, thread-safe MySQLdb connection pool (one per worker process).
+
+    Connections are opened lazily, so a pool built before gunicorn forks its
+    workers never shares sockets with the master. Idle connections above
+    ``min_size`` are closed once they have been idle for ``idle_timeout``
+    seconds, and a connection that has been idle longer than
+    ``ping_interval`` seconds is pinged (and replaced if dead) on checkout.
+    """
+
+    def __init__(self, connect_kwargs, min_size=1, max_size=10,
+                 idle_timeout=300, checkout_timeout=10, ping_interval=5):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Invalid pool size: min=%s max=%s" % (min_size, max_size))
+        self.connect_kwargs = dict(connect_kwargs)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.ping_interval = ping_interval
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = []          # list of (connection, last_used) - most recent last
+        self._size = 0           # open connections, idle + in use
+        self._pid = os.getpid()
+        self._orphaned = []      # connections inherited across fork, never closed here
+        self._stats = {
+            'created': 0,
+            'closed': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'health_check_failures': 0,
+        }
+
+    # -- connection lifecycle ------------------------------------------
+
+    def _connect(self):
+        conn = MySQLdb.connect(**self.connect_kwargs)
+        with self._cond:
+            self._stats['created'] += 1
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats['closed'] += 1
+            self._cond.notify()
+
+    def _check_fork(self):
+        # Sockets inherited from the parent must not be used or closed (closing
+        # would send COM_QUIT on the parent's session), so just park them.
+        if self._pid != os.getpid():
+            self._orphaned.extend(conn for conn, _ in self._idle)
+            self._idle = []
+            self._size = 0
+            self._pid = os.getpid()
+
+    def _reap_idle(self, now):
+        """Pop connections idle past idle_timeout (caller holds the lock)"""
+        expired = []
+        while self._idle and self._size - len(expired) > self.min_size:
+            conn, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.pop(0)
+            expired.append(conn)
+        return expired
+
+    def acquire(self):
+        """Check a healthy connection out of the pool"""
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            conn = last_used = None
+            create = False
+            with self._cond:
+                self._check_fork()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f"No database connection free after {self.checkout_timeout}s "
+                            f"(max_size={self.max_size})"
+                        )
+                    self._stats['waits'] += 1
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+                self._stats['checkouts'] += 1
+
+            if create:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+
+            if time.monotonic() - last_used < self.ping_interval:
+                return conn
+            try:
+                conn.ping()
+                return conn
+            except MySQLdb.Error as e:
+                logger.warning(f"Discarding dead pooled connection: {e}")
+                with self._cond:
+                    self._stats['health_check_failures'] += 1
+                self._close(conn)
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, ending any open transaction"""
+        if not discard:
+            try:
+                # Close the read snapshot so the next borrower sees fresh data
+                conn.rollback()
+            except MySQLdb.Error:
+                discard = True
+        if discard:
+            self._close(conn)
+            return
+
+        now = time.monotonic()
+        with self._cond:
+            if self._pid != os.getpid():
+                self._orphaned.append(conn)
+                return
+            self._idle.append((conn, now))
+            expired = self._reap_idle(now)
+            self._cond.notify()
+        for old in expired:
+            self._close(old)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a ``with`` block"""
+        conn = self.acquire()
+        try:
+            yield conn
+        except MySQLdb.OperationalError:
+            self.release(conn, discard=True)
+            raise
+        except Exception:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def warm_up(self):
+        """Open connections until min_size are idle"""
+        with self._cond:
+            self._check_fork()
+            missing = max(0, self.min_size - self._size)
+            self._size += missing
+        for _ in range(missing):
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (in-use ones close when released)"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        """Snapshot of pool counters"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            })
+        return stats
+
+
+# =============================================
+# Flask integration
+# =============================================
+
+_pool = None
+
+
+def init_app(app):
+    """Create the worker's connection pool from app config and hook teardown"""
+    global _pool
+    _pool = ConnectionPool(
+        {
+            'host': app.config['MYSQL_HOST'],
+            'user': app.config['MYSQL_USER'],
+            'passwd': app.config['MYSQL_PASSWORD'],
+            'db': app.config['MYSQL_DB'],
+            'port': app.config['MYSQL_PORT'],
+            'charset': app.config.get('MYSQL_CHARSET', 'utf8'),
+            'use_unicode': True,
+            'cursorclass': ObservedCursor,
+        },
+        min_size=app.config['MYSQL_POOL_MIN_SIZE'],
+        max_size=app.config['MYSQL_POOL_MAX_SIZE'],
+        idle_timeout=app.config['MYSQL_POOL_IDLE_TIMEOUT'],
+        checkout_timeout=app.config['MYSQL_POOL_TIMEOUT'],
+        ping_interval=app.config['MYSQL_POOL_PING_INTERVAL'],
+    )
+    app.teardown_appcontext(_release_request_connection)
+    return _pool
+
+
+def get_pool():
+    """Return the worker's connection pool"""
+    if _pool is None:
+        raise RuntimeError("Database pool not initialised; call db.init_app(app) first")
+    return _pool
+
+
+def _release_request_connection(exc):
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        get_pool().release(conn, discard=isinstance(exc, MySQLdb.OperationalError))
+
+
+def get_db_connection():
+    """Get the pooled connection bound to the current app context"""
+    try:
+        if '_db_conn' not in g:
+            g._db_conn = get_pool().acquire()
+        return g._db_conn
+    except Exception as e:
+        logger.error(f"Database connection error: {e}")
+        return None
+
+
+def _normalize_keys(row):
+    # This normalization is required by all the templates
+    return {k.lower(): v for k, v in row.items()} if row else None
+
+
+def _run_query(conn, query, params, fetch_one, fetch_all):
+    cursor = conn.cursor()  # DictCursor, set as the pool's cursorclass
+    cursor.execute(query, params or ())
+
+    if fetch_one:
+        result = _normalize_keys(cursor.fetchone())
+    elif fetch_all:
+        result = [_normalize_keys(r) for r in cursor.fetchall()]
+    else:
+        conn.commit()
+        result = cursor.lastrowid if cursor.description is None else cursor.rowcount
+
+    cursor.close()
+    return result
+
+
+def execute_query(query, params=None, fetch_one=False, fetch_all=False):
+    """Execute database query safely and return lowercase dict keys
+
+    Inside a request the connection is borrowed once and held until teardown;
+    outside one (background threads, CLI) it is borrowed for this call only.
+    """
+    if not has_app_context():
+        try:
+            with get_pool().connection() as conn:
+                try:
+                    return _run_query(conn, query, params, fetch_one, fetch_all)
+                except MySQLdb.OperationalError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Query execution error: {e}")
+                    conn.rollback()
+                    return None
+        except Exception as e:
+            logger.error(f"Query execution error: {e}")
+            return None
+
+    conn = get_db_connection()
+    if conn is None:
+        logger.error("Failed to get DB connection.")
+        return None
+
+    try:
+        return _run_query(conn, query, params, fetch_one, fetch_all)
+    except Exception as e:
+        logger.error(f"Query execution error: {e}")
+        conn.rollback()
+        return None
@@ -0,0 +1,108 @@
+"""
+SmartRide CSV Exports
+Streams query results as CSV without materialising the table in memory
+"""
+
+import io
+import csv
+import zlib
+import logging
+
+import MySQLdb.cursors
+
+from db import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Dataset name -> (download filename, query). Customer exports never include
+# password hashes.
+EXPORTS = {
+    'vehicles': ('vehicles_export.csv', """
+        SELECT v.VehicleID, vt.Name as Type, v.Make, v.Model, v.Year, v.PlateNo, v.RatePerDay, v.Status
+        FROM Vehicle v
+        JOIN VehicleType vt ON v.TypeID = vt.TypeID
+        ORDER BY v.VehicleID
+    """),
+    'rentals': ('rentals_export.csv', """
+        SELECT * FROM vw_rental_history ORDER BY RentalID
+    """),
+    'customers': ('customers_export.csv', """
+        SELECT CustomerID, Name, Email, Phone, LicenseNo, CreatedAt, UpdatedAt
+        FROM Customer
+        ORDER BY CustomerID
+    """),
+    'reservations': ('reservations_export.csv', """
+        SELECT r.ResID, r.CustomerID, c.Name as CustomerName, vt.Name as VehicleType,
+               r.ResDate, r.StartDate, r.EndDate, r.Status
+        FROM Reservation r
+        JOIN Customer c ON r.CustomerID = c.CustomerID
+        JOIN VehicleType vt ON r.VehicleTypeID = vt.TypeID
+        ORDER BY r.ResID
+    """),
+    'maintenance': ('maintenance_export.csv', """
+        SELECT m.MaintID, m.VehicleID, v.PlateNo, v.Make, v.Model,
+               m.Date, m.Description, m.Cost, m.Status
+        FROM Maintenance m
+        JOIN Vehicle v ON m.VehicleID = v.VehicleID
+        ORDER BY m.MaintID
+    """),
+}
+
+
+def stream_rows(query, params=None, batch_size=1000):
+    """Yield the column names, then batches of row tuples, from an unbuffered cursor.
+
+    The server-side (SSCursor) result holds a dedicated pooled connection
+    until it is exhausted. If the consumer stops early the connection is
+    discarded rather than drained.
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    finished = False
+    try:
+        cursor = conn.cursor(MySQLdb.cursors.SSCursor)
+        cursor.execute(query, params or ())
+        yield [column[0] for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+        cursor.close()
+        finished = True
+    finally:
+        pool.release(conn, discard=not finished)
+
+
+def csv_chunks(query, params=None, batch_size=1000):
+    """Yield CSV text, one chunk per fetched batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    batches = stream_rows(query, params, batch_size)
+    writer.writerow(next(batches))
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of text chunks on the fly"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(dataset, compress=False, batch_size=1000):
+    """Return ``(filename, chunk iterator)`` for a named export"""
+    filename, query = EXPORTS[dataset]
+    chunks = csv_chunks(query, batch_size=batch_size)
+    if compress:
+        return filename + '.gz', gzip_chunks(chunks)
+    return filename, (chunk.encode('utf-8') for chunk in chunks)
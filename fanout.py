@@ -0,0 +1,100 @@
+"""
+SmartRide Query Fan-out
+Runs independent queries concurrently on separate pooled connections
+"""
+
+import re
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import db
+from db import get_pool
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 8
+TIMEOUT = 5.0
+
+# Top-level SELECTs get a server-side limit too, so a timed-out query
+# stops running instead of holding its connection and worker thread
+_SELECT = re.compile(r'^\s*SELECT\b', re.IGNORECASE)
+
+_settings = {'workers': MAX_WORKERS, 'timeout': TIMEOUT}
+_executor = {'pool': None}
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    # Created on first use so each forked worker gets its own threads
+    with _executor_lock:
+        if _executor['pool'] is None:
+            _executor['pool'] = ThreadPoolExecutor(max_workers=_settings['workers'],
+                                                   thread_name_prefix='query-fanout')
+        return _executor['pool']
+
+
+def _with_time_limit(query, timeout):
+    if not timeout or not _SELECT.match(query):
+        return query
+    return _SELECT.sub(f"SELECT /*+ MAX_EXECUTION_TIME({int(timeout * 1000)}) */", query, count=1)
+
+
+def _run(query, params, fetch_one, fetch_all, timeout):
+    # mysqlclient releases the GIL while it waits on the server, so these overlap
+    with get_pool().connection() as conn:
+        try:
+            return db._run_query(conn, _with_time_limit(query, timeout), params, fetch_one, fetch_all)
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def submit(query, params=None, fetch_one=False, fetch_all=False, timeout=None):
+    """Start one query on its own pooled connection; returns a concurrent Future.
+
+    The caller's context is copied into the worker, so the query listeners
+    still attribute the statement to the current request.
+    """
+    timeout = _settings['timeout'] if timeout is None else timeout
+    context = contextvars.copy_context()
+    return _get_executor().submit(context.run, _run, query, params, fetch_one, fetch_all, timeout)
+
+
+def run_parallel(queries, params=None, timeout=None):
+    """Run named (sql, fetch_all) queries concurrently; returns {name: result}.
+
+    ``params`` maps a name to that query's parameters. Each query gets
+    ``timeout`` seconds (default QUERY_TIMEOUT_MS). One that fails or
+    times out is logged and yields None, like execute_query, without
+    affecting the others. The whole call takes about as long as the
+    slowest query.
+    """
+    timeout = _settings['timeout'] if timeout is None else timeout
+    params = params or {}
+    futures = {
+        name: submit(sql, params.get(name), fetch_one=not fetch_all, fetch_all=fetch_all, timeout=timeout)
+        for name, (sql, fetch_all) in queries.items()
+    }
+    deadline = time.monotonic() + timeout if timeout else None
+    results = {}
+    for name, future in futures.items():
+        try:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            results[name] = future.result(timeout=remaining)
+        except FutureTimeout:
+            future.cancel()
+            logger.error(f"Query '{name}' timed out after {timeout:.1f}s")
+            results[name] = None
+        except Exception as e:
+            logger.error(f"Query '{name}' failed: {e}")
+            results[name] = None
+    return results
+
+
+def init_app(app):
+    """Apply QUERY_FANOUT_WORKERS and QUERY_TIMEOUT_MS from app config"""
+    _settings['workers'] = app.config.get('QUERY_FANOUT_WORKERS', MAX_WORKERS)
+    _settings['timeout'] = app.config.get('QUERY_TIMEOUT_MS', TIMEOUT * 1000) / 1000.0
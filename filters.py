@@ -0,0 +1,36 @@
+"""
+SmartRide List Filters
+WHERE clauses shared by the vehicle list pages and the JSON API
+"""
+
+import refdata
+
+# price_range value -> condition on v.RatePerDay
+PRICE_RANGES = {
+    '0-50': "v.RatePerDay <= 50",
+    '51-100': "v.RatePerDay BETWEEN 51 AND 100",
+    '101-200': "v.RatePerDay BETWEEN 101 AND 200",
+    '201+': "v.RatePerDay > 200",
+}
+
+
+def vehicle_filters(vehicle_type='', status='', year='', price_range=''):
+    """``(" AND ..." clause, params)`` on ``Vehicle v``; empty values don't filter.
+
+    ``vehicle_type`` is a type name, resolved through the reference-data
+    cache so no VehicleType join is needed; an unknown name matches nothing.
+    """
+    clause = ""
+    params = []
+    if vehicle_type:
+        clause += " AND v.TypeID = %s"
+        params.append(refdata.type_id(vehicle_type) or 0)
+    if status:
+        clause += " AND v.Status = %s"
+        params.append(status)
+    if year:
+        clause += " AND v.Year = %s"
+        params.append(year)
+    if price_range in PRICE_RANGES:
+        clause += f" AND {PRICE_RANGES[price_range]}"
+    return clause, params
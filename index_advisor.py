@@ -0,0 +1,188 @@
+"""
+SmartRide Index Advisor
+Records the queries every GET page issues and flags full scans and filesorts in their plans
+"""
+
+import re
+import logging
+
+from flask import has_request_context, request, url_for
+
+import db
+import refdata
+from db import get_pool
+from vehicle_caches import invalidate_vehicle_caches
+
+logger = logging.getLogger(__name__)
+
+# Tables smaller than this are cheaper to scan than to index (VehicleType, Staff)
+MIN_ROWS = 100
+
+# URL arguments filled from the seeded database or with a fixed value
+SAMPLE_ARGS = {
+    'vehicle_id': "SELECT MIN(VehicleID) AS value FROM Vehicle",
+    'item_id': "SELECT MIN(RentalID) AS value FROM Rental",
+}
+LITERAL_ARGS = {
+    'kind': 'vehicles',
+    'name': 'rentals',
+}
+
+# Endpoints that are not crawled, with the reason
+SKIPPED_ENDPOINTS = {
+    'static': 'static files',
+    'admin_export': 'streams whole tables by design',
+    'admin_export_vehicles': 'streams whole tables by design',
+    'customer_logout': 'would end the crawl session',
+    'admin_logout': 'would end the crawl session',
+}
+
+EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+
+class Finding:
+    """One plan row that reads more than it should"""
+
+    def __init__(self, endpoints, query, table, problem, rows, key):
+        self.endpoints = sorted(endpoints)
+        self.query = query
+        self.table = table
+        self.problem = problem
+        self.rows = rows
+        self.key = key
+
+    def __str__(self):
+        return (f"{', '.join(self.endpoints)}: {self.problem} on {self.table} "
+                f"(~{self.rows} rows, key={self.key or 'none'})")
+
+
+class AdvisorReport:
+    """Pages crawled, distinct queries seen and the plan findings"""
+
+    def __init__(self):
+        self.pages = []       # (endpoint, url, status)
+        self.skipped = []     # (endpoint, reason)
+        self.queries = {}     # normalized query -> {'query', 'args', 'endpoints'}
+        self.findings = []
+
+    @property
+    def ok(self):
+        return not self.findings
+
+
+def normalize(query):
+    """Collapse whitespace so the same template from different pages matches"""
+    return ' '.join(query.split())
+
+
+def _sample_values():
+    values = dict(LITERAL_ARGS)
+    for name, query in SAMPLE_ARGS.items():
+        row = db.execute_query(query, fetch_one=True)
+        if row and row['value'] is not None:
+            values[name] = row['value']
+    return values
+
+
+def _sessions():
+    admin = db.execute_query(
+        "SELECT StaffID, Name FROM Staff WHERE Role = 'Admin' ORDER BY StaffID LIMIT 1", fetch_one=True)
+    customer = db.execute_query(
+        "SELECT CustomerID, Name FROM Customer ORDER BY CustomerID LIMIT 1", fetch_one=True)
+    session = {}
+    if admin:
+        session.update(admin_id=admin['staffid'], admin_name=admin['name'])
+    if customer:
+        session.update(customer_id=customer['customerid'], customer_name=customer['name'])
+    return session
+
+
+def crawl(app, report, ignore=()):
+    """GET every routable page as a logged-in admin and customer, recording its queries"""
+    with app.app_context():
+        values = _sample_values()
+        session_values = _sessions()
+
+    def record(query, args, elapsed):
+        if not has_request_context():
+            return  # background refreshers share the pool
+        if isinstance(query, bytes):
+            query = query.decode('utf-8', 'replace')
+        entry = report.queries.setdefault(normalize(query), {'query': query, 'args': args, 'endpoints': set()})
+        entry['endpoints'].add(request.endpoint)
+
+    # Cached results would hide the queries behind them: the dashboard
+    # snapshot, availability, vehicle counts and the vehicles-tagged
+    # fragments, plus this worker's reference data (other workers keep theirs)
+    invalidate_vehicle_caches()
+    refdata.invalidate(bump_version=False)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(session_values)
+
+    db.add_query_listener(record)
+    try:
+        for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+            if 'GET' not in rule.methods:
+                continue
+            if rule.endpoint in SKIPPED_ENDPOINTS or rule.endpoint in ignore:
+                report.skipped.append((rule.endpoint, SKIPPED_ENDPOINTS.get(rule.endpoint, 'ignored')))
+                continue
+            missing = [name for name in rule.arguments if name not in values]
+            if missing:
+                report.skipped.append((rule.endpoint, f"no sample value for {', '.join(missing)}"))
+                continue
+            with app.test_request_context():
+                url = url_for(rule.endpoint, **{name: values[name] for name in rule.arguments})
+            response = client.get(url)
+            report.pages.append((rule.endpoint, url, response.status_code))
+            response.close()
+    finally:
+        db.remove_query_listener(record)
+    return report
+
+
+def _plan_findings(plan, min_rows):
+    for row in plan:
+        table = row.get('table') or ''
+        rows = row.get('rows') or 0
+        extra = row.get('Extra') or ''
+        if table.startswith('<') or rows < min_rows:
+            continue  # derived tables and unions are judged by their own rows
+        if row.get('type') == 'ALL':
+            yield table, 'full table scan', rows, row.get('key')
+        if 'Using filesort' in extra:
+            yield table, 'filesort', rows, row.get('key')
+
+
+def explain(report, min_rows=MIN_ROWS):
+    """EXPLAIN every recorded SELECT and collect findings"""
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for entry in report.queries.values():
+                if not EXPLAINABLE.match(entry['query']):
+                    continue
+                try:
+                    cursor.execute("EXPLAIN " + entry['query'], entry['args'])
+                    plan = cursor.fetchall()
+                except Exception as e:
+                    logger.error(f"EXPLAIN failed for {normalize(entry['query'])[:80]}: {e}")
+                    continue
+                for table, problem, rows, key in _plan_findings(plan, min_rows):
+                    report.findings.append(Finding(entry['endpoints'], entry['query'], table, problem, rows, key))
+        finally:
+            cursor.close()
+    return report
+
+
+def check(app, min_rows=MIN_ROWS, ignore=()):
+    """Crawl the app and EXPLAIN what it ran; ``report.ok`` is False on any finding.
+
+    Run it against a database seeded to production-like sizes, since the
+    optimizer scans small tables whatever indexes exist.
+    """
+    report = AdvisorReport()
+    crawl(app, report, ignore=ignore)
+    return explain(report, min_rows=min_rows)
@@ -0,0 +1,198 @@
+"""
+SmartRide Instrumentation
+Per-request query counts and DB time, slow-query logging and Prometheus metrics
+"""
+
+import re
+import time
+import logging
+import threading
+from functools import lru_cache
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+
+import db
+import response_cache
+
+logger = logging.getLogger(__name__)
+
+# Seconds; the default Prometheus client buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+# Distinct fingerprints kept before the rest are folded into one series
+MAX_FINGERPRINTS = 500
+OTHER_FINGERPRINT = 'other'
+
+_COMMENTS = re.compile(r'--[^\n]*|/\*.*?\*/', re.DOTALL)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'%s|%\(\w+\)s')
+_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_VALUE_ROWS = re.compile(r'(VALUES\s*\(\?\+?\))(?:\s*,\s*\(\?\+?\))+', re.IGNORECASE)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(query):
+    """Query text with literals and parameters replaced by ``?``.
+
+    The same statement with different values gets the same fingerprint,
+    and no parameter value ever appears in it, so it is safe to log.
+    """
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    text = _COMMENTS.sub(' ', query)
+    text = _STRINGS.sub('?', text)
+    text = _PLACEHOLDERS.sub('?', text)
+    text = _NUMBERS.sub('?', text)
+    text = ' '.join(text.split())
+    text = _LISTS.sub('(?+)', text)
+    return _VALUE_ROWS.sub(r'\1, ...', text)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style, keyed by a label tuple"""
+
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}   # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def has(self, labels):
+        return labels in self._series
+
+    def series_count(self):
+        return len(self._series)
+
+    def render(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, values in sorted(series.items()):
+            base = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            prefix = base + ',' if base else ''
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {values[-2]}')
+            lines.append(f'{self.name}_count{{{base}}} {values[-2]}')
+            lines.append(f'{self.name}_sum{{{base}}} {values[-1]:.6f}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_SECONDS = Histogram('smartride_request_seconds', 'Request latency by route.', ('endpoint', 'method'))
+REQUEST_DB_SECONDS = Histogram('smartride_request_db_seconds', 'Database time per request by route.',
+                               ('endpoint',))
+REQUEST_QUERIES = Histogram('smartride_request_queries', 'Queries issued per request by route.',
+                            ('endpoint',), buckets=QUERY_COUNT_BUCKETS)
+QUERY_SECONDS = Histogram('smartride_query_seconds', 'Statement latency by query fingerprint.',
+                          ('fingerprint',))
+
+_settings = {'slow_query_seconds': 0.2, 'server_timing': True}
+# fanout.py runs a request's queries on several threads that share its g
+_request_totals_lock = threading.Lock()
+
+
+def _query_label(query):
+    label = fingerprint(query)
+    if QUERY_SECONDS.series_count() >= MAX_FINGERPRINTS and not QUERY_SECONDS.has((label,)):
+        return OTHER_FINGERPRINT
+    return label
+
+
+def _on_query(query, args, elapsed):
+    QUERY_SECONDS.observe((_query_label(query),), elapsed)
+    endpoint = None
+    if has_request_context():
+        with _request_totals_lock:
+            g._query_count = g.get('_query_count', 0) + 1
+            g._db_time = g.get('_db_time', 0.0) + elapsed
+        endpoint = request.endpoint
+    threshold = _settings['slow_query_seconds']
+    if threshold and elapsed >= threshold:
+        # Parameters are never logged; the fingerprint replaces every value with ?
+        logger.warning(f"Slow query ({elapsed * 1000:.1f} ms, {endpoint or 'background'}): {fingerprint(query)}")
+
+
+def _before_request():
+    g._request_started = time.perf_counter()
+
+
+def _before_render(sender, template, context, **extra):
+    if has_request_context():
+        g._template_started = time.perf_counter()
+
+
+def _rendered(sender, template, context, **extra):
+    if has_request_context() and '_template_started' in g:
+        g._template_time = g.get('_template_time', 0.0) + time.perf_counter() - g.pop('_template_started')
+
+
+def _after_request(response):
+    started = g.get('_request_started')
+    if started is None:
+        return response
+    total = time.perf_counter() - started
+    db_time = g.get('_db_time', 0.0)
+    queries = g.get('_query_count', 0)
+    endpoint = request.endpoint or 'unmatched'
+
+    REQUEST_SECONDS.observe((endpoint, request.method), total)
+    REQUEST_DB_SECONDS.observe((endpoint,), db_time)
+    REQUEST_QUERIES.observe((endpoint,), queries)
+
+    if _settings['server_timing']:
+        timings = [f'db;dur={db_time * 1000:.1f};desc="{queries} queries"']
+        if '_template_time' in g:
+            timings.append(f"tpl;dur={g._template_time * 1000:.1f}")
+        timings.append(f"total;dur={total * 1000:.1f}")
+        response.headers.add('Server-Timing', ', '.join(timings))
+    return response
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format (this worker only)"""
+    lines = []
+    for histogram in (REQUEST_SECONDS, REQUEST_DB_SECONDS, REQUEST_QUERIES, QUERY_SECONDS):
+        lines.extend(histogram.render())
+    pool = db.get_pool().stats()
+    for key in ('size', 'idle', 'in_use', 'max_size'):
+        lines.append(f"# TYPE smartride_db_pool_{key} gauge")
+        lines.append(f"smartride_db_pool_{key} {pool[key]}")
+    for key in ('checkouts', 'waits', 'timeouts', 'created', 'closed'):
+        lines.append(f"# TYPE smartride_db_pool_{key}_total counter")
+        lines.append(f"smartride_db_pool_{key}_total {pool[key]}")
+    caches = response_cache.stats()
+    for key in ('hits', 'misses', 'sets', 'evictions', 'invalidations', 'errors'):
+        lines.append(f"# TYPE smartride_response_cache_{key}_total counter")
+        for name, stats in sorted(caches.items()):
+            lines.append(f'smartride_response_cache_{key}_total{{cache="{name}"}} {stats[key]}')
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Record every pooled statement and time each request (SLOW_QUERY_MS, SERVER_TIMING)"""
+    _settings['slow_query_seconds'] = app.config.get('SLOW_QUERY_MS', 200) / 1000.0
+    _settings['server_timing'] = bool(app.config.get('SERVER_TIMING', True))
+    db.add_query_listener(_on_query)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
@@ -0,0 +1,316 @@
+"""
+SmartRide Schema Migrations
+Applies versioned migrations/NNN_*.sql files and records them in SchemaMigration
+"""
+
+import os
+import re
+import time
+import hashlib
+import logging
+
+import MySQLdb
+
+from db import get_pool
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+FILENAME = re.compile(r'^(\d{3})_([A-Za-z0-9_]+)\.sql$')
+LOCK_NAME = 'smartride_schema_migrations'
+LOCK_TIMEOUT = 60
+
+CREATE_TRACKING_TABLE = """
+    CREATE TABLE IF NOT EXISTS SchemaMigration (
+        Version INT PRIMARY KEY,
+        Name VARCHAR(255) NOT NULL,
+        Checksum CHAR(64) NULL,
+        ExecutionMs INT NULL,
+        AppliedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+RECORD_MIGRATION = """
+    INSERT INTO SchemaMigration (Version, Name, Checksum, ExecutionMs)
+    VALUES (%s, %s, %s, %s)
+"""
+
+# Index-only ALTER TABLE clauses that InnoDB can run without blocking writes
+INDEX_CLAUSE = re.compile(r'^(ADD\s+(UNIQUE\s+|FULLTEXT\s+)?(INDEX|KEY)|DROP\s+(INDEX|KEY)|RENAME\s+(INDEX|KEY))\b',
+                          re.IGNORECASE)
+ALTER_TABLE = re.compile(r'^ALTER\s+TABLE\s+(`[^`]+`|\w+)\s+(.*)$', re.IGNORECASE | re.DOTALL)
+CREATE_INDEX = re.compile(r'^(CREATE\s+(UNIQUE\s+|FULLTEXT\s+)?INDEX|DROP\s+INDEX)\b', re.IGNORECASE)
+ONLINE_OPTIONS = re.compile(r'\b(ALGORITHM|LOCK)\s*=', re.IGNORECASE)
+
+
+class MigrationError(Exception):
+    """A migration file is invalid or one of its statements failed"""
+
+
+class Migration:
+    """One migrations/NNN_name.sql file"""
+
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, encoding='utf-8') as stream:
+            self.sql = stream.read()
+        self.checksum = hashlib.sha256(self.sql.encode('utf-8')).hexdigest()
+
+    def statements(self):
+        return [make_online(statement) for statement in split_statements(self.sql)]
+
+    def __repr__(self):
+        return f"{self.version:03d}_{self.name}"
+
+
+class MigrationReport:
+    """Migrations applied (or planned, for a dry run) by one migrate() call"""
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.applied = []      # (migration, [statements], elapsed seconds)
+        self.elapsed = 0.0
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """Migrations in version order; duplicate or malformed versions are an error"""
+    migrations = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.sql'):
+            continue
+        match = FILENAME.match(filename)
+        if not match:
+            raise MigrationError(f"Migration file name must look like 001_description.sql: {filename}")
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f"Duplicate migration version {version:03d}: {filename}")
+        migrations[version] = Migration(version, match.group(2), os.path.join(directory, filename))
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def split_statements(sql):
+    """Split a script into statements the way the mysql client does.
+
+    Honours ``DELIMITER`` lines (for routine and trigger bodies), quoted
+    strings and ``--``, ``#`` and ``/* */`` comments.
+    """
+    statements = []
+    delimiter = ';'
+    current = []
+    quote = None
+    i = 0
+    at_line_start = True
+    while i < len(sql):
+        if at_line_start and quote is None:
+            line_end = sql.find('\n', i)
+            line = sql[i:line_end if line_end != -1 else len(sql)]
+            if line.strip().upper().startswith('DELIMITER '):
+                delimiter = line.strip().split(None, 1)[1]
+                i = len(sql) if line_end == -1 else line_end + 1
+                continue
+        char = sql[i]
+        at_line_start = char == '\n'
+        if quote:
+            current.append(char)
+            if char == '\\' and quote != '`':
+                current.append(sql[i + 1:i + 2])
+                i += 2
+                continue
+            if char == quote:
+                quote = None
+            i += 1
+        elif char in ("'", '"', '`'):
+            quote = char
+            current.append(char)
+            i += 1
+        elif sql.startswith('--', i) and (i + 2 >= len(sql) or sql[i + 2] in ' \t\r\n') or char == '#':
+            line_end = sql.find('\n', i)
+            i = len(sql) if line_end == -1 else line_end
+        elif sql.startswith('/*', i):
+            comment_end = sql.find('*/', i + 2)
+            i = len(sql) if comment_end == -1 else comment_end + 2
+        elif sql.startswith(delimiter, i):
+            statement = ''.join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+            i += len(delimiter)
+        else:
+            current.append(char)
+            i += 1
+    statement = ''.join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+def _split_clauses(text):
+    clauses, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            clauses.append(text[start:i].strip())
+            start = i + 1
+    clauses.append(text[start:].strip())
+    return clauses
+
+
+def make_online(statement):
+    """Ask for an in-place, non-locking build on index-only DDL.
+
+    Statements that already name ALGORITHM or LOCK are left alone. If
+    InnoDB can't honour the request, the statement fails instead of
+    silently blocking writes to the table. FULLTEXT indexes can't be
+    built with LOCK=NONE, so they get LOCK=SHARED.
+    """
+    if ONLINE_OPTIONS.search(statement):
+        return statement
+    lock = 'SHARED' if re.search(r'\bFULLTEXT\b', statement, re.IGNORECASE) else 'NONE'
+    if CREATE_INDEX.match(statement):
+        return f"{statement} ALGORITHM=INPLACE LOCK={lock}"
+    match = ALTER_TABLE.match(statement)
+    if match and all(INDEX_CLAUSE.match(clause) for clause in _split_clauses(match.group(2))):
+        return f"{statement}, ALGORITHM=INPLACE, LOCK={lock}"
+    return statement
+
+
+def _applied(cursor):
+    cursor.execute(CREATE_TRACKING_TABLE)
+    cursor.execute("SELECT Version, Name, Checksum FROM SchemaMigration")
+    return {row['Version']: row for row in cursor.fetchall()}
+
+
+def status(migrations=None):
+    """``[(migration, state)]`` with state 'applied', 'baselined', 'modified' or 'pending'.
+
+    'baselined' rows were created by the schema scripts (or ``baseline()``)
+    without a checksum; 'modified' means the file changed after it ran.
+    """
+    migrations = discover() if migrations is None else migrations
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            applied = _applied(cursor)
+            conn.commit()
+        finally:
+            cursor.close()
+    states = []
+    for migration in migrations:
+        row = applied.get(migration.version)
+        if row is None:
+            states.append((migration, 'pending'))
+        elif row['Checksum'] is None:
+            states.append((migration, 'baselined'))
+        elif row['Checksum'] != migration.checksum:
+            states.append((migration, 'modified'))
+        else:
+            states.append((migration, 'applied'))
+    return states
+
+
+def pending():
+    """Migrations not yet recorded in SchemaMigration"""
+    return [migration for migration, state in status() if state == 'pending']
+
+
+def _run(conn, cursor, migration):
+    started = time.perf_counter()
+    for number, statement in enumerate(migration.statements(), start=1):
+        try:
+            cursor.execute(statement)
+            if cursor.description is not None:
+                cursor.fetchall()
+        except MySQLdb.Error as e:
+            conn.rollback()
+            # DDL commits implicitly, so earlier statements of this migration stay applied
+            raise MigrationError(f"{migration} failed at statement {number}: {e}") from e
+    elapsed = time.perf_counter() - started
+    cursor.execute(RECORD_MIGRATION, (migration.version, migration.name, migration.checksum,
+                                      int(elapsed * 1000)))
+    conn.commit()
+    return elapsed
+
+
+def migrate(target=None, dry_run=False):
+    """Apply pending migrations up to ``target`` (default: all), in order.
+
+    Runs under a named lock so workers starting together don't race. A
+    dry run returns the statements that would run without executing
+    them. A failed migration stops the run and is not recorded. DDL
+    can't be rolled back in MySQL, so write each file so it can be
+    finished by hand.
+    """
+    report = MigrationReport(dry_run)
+    started = time.perf_counter()
+    migrations = [m for m in discover() if target is None or m.version <= target]
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, %s) AS acquired", (LOCK_NAME, LOCK_TIMEOUT))
+            if not cursor.fetchone()['acquired']:
+                raise MigrationError("Another process is applying migrations")
+            try:
+                applied = _applied(cursor)
+                conn.commit()
+                for migration in migrations:
+                    if migration.version in applied:
+                        continue
+                    if dry_run:
+                        report.applied.append((migration, migration.statements(), 0.0))
+                        continue
+                    logger.info(f"Applying migration {migration}")
+                    elapsed = _run(conn, cursor, migration)
+                    report.applied.append((migration, migration.statements(), elapsed))
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+                cursor.fetchall()
+        finally:
+            cursor.close()
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def baseline(version):
+    """Record migrations up to ``version`` as applied without running them.
+
+    For databases that already received those changes by hand.
+    """
+    recorded = []
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            applied = _applied(cursor)
+            for migration in discover():
+                if migration.version <= version and migration.version not in applied:
+                    cursor.execute(RECORD_MIGRATION, (migration.version, migration.name, None, None))
+                    recorded.append(migration)
+            conn.commit()
+        finally:
+            cursor.close()
+    return recorded
+
+
+def check(mode):
+    """Schema check for app start-up: 'off', 'warn', 'require' or 'apply'.
+
+    'warn' and 'require' only report; 'apply' runs pending migrations
+    first. Returns False if migrations are still pending afterwards (or
+    a recorded migration file has changed).
+    """
+    if mode == 'off':
+        return True
+    if mode == 'apply':
+        report = migrate()
+        for migration, _, elapsed in report.applied:
+            logger.info(f"Applied migration {migration} in {elapsed:.2f}s")
+    states = status()
+    for migration, state in states:
+        if state == 'pending':
+            logger.warning(f"Schema migration {migration} has not been applied (run `flask db-migrate`)")
+        elif state == 'modified':
+            logger.warning(f"Schema migration {migration} changed after it was applied")
+    return all(state in ('applied', 'baselined') for _, state in states)
@@ -0,0 +1,7 @@
+-- FULLTEXT indexes for ranked vehicle and customer search (search.py).
+-- InnoDB builds FULLTEXT indexes in place but only with LOCK=SHARED, and
+-- one per ALTER; the first one on a table rebuilds it to add FTS_DOC_ID.
+
+ALTER TABLE Vehicle ADD FULLTEXT INDEX ft_vehicle_search (Make, Model, PlateNo);
+
+ALTER TABLE Customer ADD FULLTEXT INDEX ft_customer_search (Name, Email, LicenseNo);
@@ -0,0 +1,36 @@
+-- Cross-worker cache version stamps, bumped by triggers on VehicleType (refdata.py)
+
+CREATE TABLE CacheVersion (
+    Name VARCHAR(50) PRIMARY KEY,
+    Version INT NOT NULL DEFAULT 1,
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+INSERT IGNORE INTO CacheVersion (Name, Version) VALUES ('VehicleType', 1);
+
+DELIMITER $$
+DROP TRIGGER IF EXISTS tr_vehicletype_insert_version$$
+DROP TRIGGER IF EXISTS tr_vehicletype_update_version$$
+DROP TRIGGER IF EXISTS tr_vehicletype_delete_version$$
+CREATE TRIGGER tr_vehicletype_insert_version
+AFTER INSERT ON VehicleType
+FOR EACH ROW
+BEGIN
+    UPDATE CacheVersion SET Version = Version + 1 WHERE Name = 'VehicleType';
+END$$
+
+CREATE TRIGGER tr_vehicletype_update_version
+AFTER UPDATE ON VehicleType
+FOR EACH ROW
+BEGIN
+    UPDATE CacheVersion SET Version = Version + 1 WHERE Name = 'VehicleType';
+END$$
+
+CREATE TRIGGER tr_vehicletype_delete_version
+AFTER DELETE ON VehicleType
+FOR EACH ROW
+BEGIN
+    UPDATE CacheVersion SET Version = Version + 1 WHERE Name = 'VehicleType';
+END$$
+
+DELIMITER ;
@@ -0,0 +1,81 @@
+-- Reservations allocated to a specific vehicle (allocator.py), and
+-- availability checks that see date overlaps and confirmed reservations.
+-- Adding the foreign key copies Reservation (in-place needs foreign_key_checks=0).
+
+ALTER TABLE Reservation
+    ADD COLUMN VehicleID INT NULL AFTER VehicleTypeID,
+    ADD CONSTRAINT fk_reservation_vehicle FOREIGN KEY (VehicleID) REFERENCES Vehicle(VehicleID) ON DELETE SET NULL,
+    ADD INDEX idx_reservation_vehicle (VehicleID, Status);
+
+DELIMITER $$
+DROP FUNCTION IF EXISTS IsVehicleAvailable$$
+CREATE FUNCTION IsVehicleAvailable(p_vehicle_id INT, p_start_date DATE, p_end_date DATE) 
+RETURNS BOOLEAN
+READS SQL DATA
+DETERMINISTIC
+BEGIN
+    DECLARE v_conflict_count INT DEFAULT 0;
+    
+    -- Check for overlapping rentals (an overdue rental blocks until it is returned)
+    SELECT COUNT(*) INTO v_conflict_count
+    FROM Rental 
+    WHERE VehicleID = p_vehicle_id 
+    AND Status IN ('ACTIVE', 'OVERDUE')
+    AND StartDate <= p_end_date
+    AND (DueDate >= p_start_date OR Status = 'OVERDUE');
+    
+    -- Check for confirmed reservations allocated to this vehicle
+    SELECT v_conflict_count + COUNT(*) INTO v_conflict_count
+    FROM Reservation
+    WHERE VehicleID = p_vehicle_id
+    AND Status = 'CONFIRMED'
+    AND StartDate <= p_end_date
+    AND EndDate >= p_start_date;
+    
+    -- Vehicles in maintenance cannot be booked
+    IF (SELECT Status FROM Vehicle WHERE VehicleID = p_vehicle_id) = 'MAINTENANCE' THEN
+        SET v_conflict_count = v_conflict_count + 1;
+    END IF;
+    
+    RETURN (v_conflict_count = 0);
+END$$
+
+DROP PROCEDURE IF EXISTS CreateNewRental$$
+CREATE PROCEDURE CreateNewRental(
+    IN p_vehicle_id INT,
+    IN p_customer_id INT,
+    IN p_start_date DATE,
+    IN p_due_date DATE,
+    IN p_processed_by INT,
+    OUT p_rental_id INT,
+    OUT p_total_amount DECIMAL(10,2)
+)
+BEGIN
+    DECLARE v_daily_rate DECIMAL(10,2);
+    DECLARE v_vehicle_available INT DEFAULT 0;
+    
+    -- Check the vehicle is free for the requested dates
+    SET v_vehicle_available = IsVehicleAvailable(p_vehicle_id, p_start_date, p_due_date);
+    
+    IF v_vehicle_available = 0 THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Vehicle is not available for rental';
+    END IF;
+    
+    -- Calculate rental amount
+    CALL CalculateRentalAmount(p_vehicle_id, p_start_date, p_due_date, v_daily_rate, p_total_amount);
+    
+    -- Create rental record
+    INSERT INTO Rental (VehicleID, CustomerID, StartDate, DueDate, DailyRate, TotalAmount, ProcessedBy)
+    VALUES (p_vehicle_id, p_customer_id, p_start_date, p_due_date, v_daily_rate, p_total_amount, p_processed_by);
+    
+    SET p_rental_id = LAST_INSERT_ID();
+    
+    -- Update vehicle status
+    UPDATE Vehicle 
+    SET Status = 'RENTED',
+        UpdatedAt = CURRENT_TIMESTAMP
+    WHERE VehicleID = p_vehicle_id;
+    
+END$$
+
+DELIMITER ;
@@ -0,0 +1,63 @@
+-- Booking idempotency keys (booking.py), and SafeCreateRental locking the
+-- vehicle row before its availability checks
+
+CREATE TABLE BookingRequest (
+    IdempotencyKey CHAR(36) PRIMARY KEY,
+    CustomerID INT NOT NULL,
+    RentalID INT NULL,
+    CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (CustomerID) REFERENCES Customer(CustomerID) ON DELETE CASCADE,
+    FOREIGN KEY (RentalID) REFERENCES Rental(RentalID) ON DELETE SET NULL
+);
+
+DELIMITER $$
+DROP PROCEDURE IF EXISTS SafeCreateRental$$
+CREATE PROCEDURE SafeCreateRental(
+    IN p_vehicle_id INT,
+    IN p_customer_id INT,
+    IN p_start_date DATE,
+    IN p_due_date DATE,
+    IN p_processed_by INT,
+    OUT p_result VARCHAR(255),
+    OUT p_rental_id INT
+)
+BEGIN
+    DECLARE v_total_amount DECIMAL(10,2);
+    DECLARE v_locked_vehicle INT;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        GET DIAGNOSTICS CONDITION 1
+            p_result = MESSAGE_TEXT;
+        SET p_rental_id = -1;
+    END;
+    
+    START TRANSACTION;
+    
+    -- Lock the vehicle row first so bookings of it are serialized until
+    -- COMMIT and the checks below read a snapshot taken after the lock
+    SELECT VehicleID INTO v_locked_vehicle FROM Vehicle WHERE VehicleID = p_vehicle_id FOR UPDATE;
+    
+    -- Validate customer exists
+    IF NOT EXISTS (SELECT 1 FROM Customer WHERE CustomerID = p_customer_id) THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Customer does not exist';
+    END IF;
+    
+    -- Validate vehicle exists and is free for the requested dates
+    IF v_locked_vehicle IS NULL THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Vehicle does not exist';
+    END IF;
+    
+    IF NOT IsVehicleAvailable(p_vehicle_id, p_start_date, p_due_date) THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Vehicle is not available for the selected dates';
+    END IF;
+    
+    -- Create rental
+    CALL CreateNewRental(p_vehicle_id, p_customer_id, p_start_date, p_due_date, p_processed_by, p_rental_id, v_total_amount);
+    
+    COMMIT;
+    SET p_result = 'SUCCESS';
+    
+END$$
+
+DELIMITER ;
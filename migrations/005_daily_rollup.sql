@@ -0,0 +1,22 @@
+-- Pre-aggregated daily revenue and utilization (rollup.py); fill it with
+-- `flask rollup-backfill` after applying
+
+CREATE TABLE DailyRollup (
+    RollupDate DATE NOT NULL,
+    TypeID INT NOT NULL,
+    Revenue DECIMAL(12,2) NOT NULL DEFAULT 0.00,           -- rentals returned that day
+    Fines DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    RentalsStarted INT NOT NULL DEFAULT 0,
+    RentalsCompleted INT NOT NULL DEFAULT 0,
+    VehicleDaysRented INT NOT NULL DEFAULT 0,
+    StartedCompleted INT NOT NULL DEFAULT 0,               -- completed rentals that started that day
+    StartedRevenue DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    StartedFines DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+    RefreshedAt TIMESTAMP NOT NULL,
+    PRIMARY KEY (RollupDate, TypeID),
+    FOREIGN KEY (TypeID) REFERENCES VehicleType(TypeID) ON DELETE CASCADE
+);
+
+ALTER TABLE Rental
+    ADD INDEX idx_rental_updated (UpdatedAt),
+    ADD INDEX idx_rental_return (ReturnDate);
@@ -0,0 +1,31 @@
+-- OVERDUE status and fine estimate maintained by overdue.py, read through
+-- an indexed (Status, DueDate) path
+
+ALTER TABLE Rental
+    ADD COLUMN EstimatedFine DECIMAL(10,2) DEFAULT 0.00 AFTER FineAmount,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE Rental
+    ADD INDEX idx_rental_status_due (Status, DueDate),
+    DROP INDEX idx_rental_status;
+
+CREATE OR REPLACE VIEW vw_overdue_rentals AS
+SELECT 
+    r.RentalID,
+    c.Name as CustomerName,
+    c.Phone as CustomerPhone,
+    v.Make,
+    v.Model,
+    v.PlateNo,
+    r.StartDate,
+    r.DueDate,
+    r.ReturnDate,
+    r.TotalAmount,
+    r.FineAmount,
+    r.Status,
+    DATEDIFF(CURDATE(), r.DueDate) as DaysOverdue,
+    r.EstimatedFine
+FROM Rental r
+JOIN Customer c ON r.CustomerID = c.CustomerID
+JOIN Vehicle v ON r.VehicleID = v.VehicleID
+WHERE r.Status = 'OVERDUE';
@@ -0,0 +1,41 @@
+-- Composite indexes for the query shapes app.py issues (checked with `flask index-advisor`).
+-- Each replacement index is added in the same ALTER that drops the index it
+-- supersedes, so foreign keys always have a usable index.
+
+-- Customer/admin vehicle lists: Status [+ TypeID] ORDER BY RatePerDay; availability counts
+ALTER TABLE Vehicle
+    ADD INDEX idx_vehicle_status_type (Status, TypeID, RatePerDay),
+    DROP INDEX idx_vehicle_status,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Admin customer list ORDER BY Name LIMIT/OFFSET
+ALTER TABLE Customer
+    ADD INDEX idx_customer_name (Name),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Customer bookings/dashboard (CustomerID [, Status] ORDER BY StartDate),
+-- vehicle history and booking conflicts (VehicleID, StartDate),
+-- admin active list and revenue reports (Status, StartDate),
+-- DailyRollup returned-rental totals (Status = 'COMPLETED', ReturnDate range)
+ALTER TABLE Rental
+    ADD INDEX idx_rental_customer_start (CustomerID, StartDate),
+    ADD INDEX idx_rental_vehicle_start (VehicleID, StartDate),
+    ADD INDEX idx_rental_status_start (Status, StartDate),
+    ADD INDEX idx_rental_status_return (Status, ReturnDate),
+    DROP INDEX idx_rental_customer,
+    DROP INDEX idx_rental_vehicle,
+    DROP INDEX idx_rental_return,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Customer dashboard pending reservations (CustomerID, Status ORDER BY StartDate),
+-- allocator window (Status = 'PENDING', StartDate range)
+ALTER TABLE Reservation
+    ADD INDEX idx_reservation_customer_status (CustomerID, Status, StartDate),
+    ADD INDEX idx_reservation_status_start (Status, StartDate),
+    DROP INDEX idx_reservation_customer,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Maintenance log ORDER BY Date DESC
+ALTER TABLE Maintenance
+    ADD INDEX idx_maintenance_date (Date),
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,26 @@
+-- A booking made ahead of time no longer marks its vehicle RENTED from
+-- today; overdue.py marks it RENTED once the rental starts
+
+DELIMITER $$
+DROP TRIGGER IF EXISTS tr_rental_insert_update_vehicle$$
+CREATE TRIGGER tr_rental_insert_update_vehicle
+AFTER INSERT ON Rental
+FOR EACH ROW
+BEGIN
+    IF NEW.Status = 'ACTIVE' AND NEW.StartDate <= CURDATE() THEN
+        UPDATE Vehicle 
+        SET Status = 'RENTED', UpdatedAt = CURRENT_TIMESTAMP
+        WHERE VehicleID = NEW.VehicleID;
+    END IF;
+END$$
+
+DELIMITER ;
+
+-- Vehicles held by a booking that hasn't started yet
+UPDATE Vehicle v
+SET v.Status = 'AVAILABLE'
+WHERE v.Status = 'RENTED'
+  AND NOT EXISTS (
+      SELECT 1 FROM Rental r
+      WHERE r.VehicleID = v.VehicleID AND r.Status IN ('ACTIVE', 'OVERDUE') AND r.StartDate <= CURDATE()
+  );
@@ -0,0 +1,160 @@
+"""
+SmartRide Overdue Sweeper
+Marks ACTIVE rentals past their due date as OVERDUE and keeps their fine estimate current
+"""
+
+import time
+import logging
+import threading
+
+import MySQLdb
+
+import availability
+import response_cache
+import stats_service
+from db import get_pool
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = 'smartride_overdue_sweep'
+BATCH_SIZE = 500
+
+# Same rate as ProcessVehicleReturn: 10% of the daily rate per day late
+FINE_ESTIMATE = "ROUND(DailyRate * 0.10 * DATEDIFF(CURDATE(), DueDate), 2)"
+
+# Both statements walk idx_rental_status_due; rows they update stop
+# matching, so repeating them until a short batch drains the backlog
+MARK_OVERDUE = f"""
+    UPDATE Rental
+    SET Status = 'OVERDUE', EstimatedFine = {FINE_ESTIMATE}
+    WHERE Status = 'ACTIVE' AND DueDate < CURDATE() AND ReturnDate IS NULL
+    ORDER BY DueDate
+    LIMIT %s
+"""
+# The estimate is derived, so UpdatedAt is kept and the DailyRollup
+# refresh doesn't treat every overdue rental as changed each day
+REFRESH_FINES = f"""
+    UPDATE Rental
+    SET EstimatedFine = {FINE_ESTIMATE}, UpdatedAt = UpdatedAt
+    WHERE Status = 'OVERDUE' AND DueDate < CURDATE()
+      AND EstimatedFine <> {FINE_ESTIMATE}
+    ORDER BY DueDate
+    LIMIT %s
+"""
+
+# Bookings made ahead of time leave their vehicle AVAILABLE (see
+# tr_rental_insert_update_vehicle); mark it RENTED once the rental starts
+START_RENTALS = """
+    UPDATE Vehicle v
+    JOIN Rental r ON r.VehicleID = v.VehicleID
+    SET v.Status = 'RENTED'
+    WHERE v.Status = 'AVAILABLE' AND r.Status IN ('ACTIVE', 'OVERDUE') AND r.StartDate <= CURDATE()
+"""
+
+_sweeper = {'thread': None, 'stop': threading.Event()}
+
+
+class SweepReport:
+    """Rows touched by one sweep"""
+
+    def __init__(self):
+        self.marked = 0
+        self.fines_updated = 0
+        self.started = 0
+        self.batches = 0
+        self.elapsed = 0.0
+
+
+def _drain(conn, cursor, statement, batch_size, report):
+    total = 0
+    while True:
+        cursor.execute(statement, (batch_size,))
+        conn.commit()  # short transactions keep row locks brief for bookings and returns
+        report.batches += 1
+        total += cursor.rowcount
+        if cursor.rowcount < batch_size:
+            return total
+
+
+def sweep(batch_size=BATCH_SIZE):
+    """Flip overdue rentals and refresh fine estimates in batches of ``batch_size``.
+
+    Returns a SweepReport, or None when another worker holds the sweep lock.
+    """
+    report = SweepReport()
+    t0 = time.perf_counter()
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, 0) AS acquired", (LOCK_NAME,))
+            if not cursor.fetchone()['acquired']:
+                return None
+            try:
+                report.marked = _drain(conn, cursor, MARK_OVERDUE, batch_size, report)
+                report.fines_updated = _drain(conn, cursor, REFRESH_FINES, batch_size, report)
+                cursor.execute(START_RENTALS)
+                conn.commit()
+                report.started = cursor.rowcount
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+                cursor.fetchall()
+        finally:
+            cursor.close()
+    report.elapsed = time.perf_counter() - t0
+    if report.marked or report.started:
+        # Overdue rentals block every later date, and the dashboard counts them
+        availability.invalidate()
+        stats_service.invalidate()
+        response_cache.invalidate_tag('vehicles')
+    return report
+
+
+def _sweep_loop(interval, batch_size, stop):
+    while not stop.is_set():
+        started = time.monotonic()
+        try:
+            report = sweep(batch_size)
+            if report and report.marked:
+                logger.info(f"Marked {report.marked} rentals overdue")
+        except MySQLdb.Error as e:
+            logger.error(f"Overdue sweep failed: {e}")
+        except Exception as e:
+            logger.error(f"Overdue sweep error: {e}")
+        stop.wait(max(1.0, interval - (time.monotonic() - started)))
+
+
+def start_sweeper(interval, batch_size=BATCH_SIZE):
+    """Sweep every ``interval`` seconds on a daemon thread"""
+    thread = _sweeper['thread']
+    if thread is not None and thread.is_alive():
+        return thread
+    _sweeper['stop'].clear()
+    thread = threading.Thread(target=_sweep_loop, args=(interval, batch_size, _sweeper['stop']),
+                              name='overdue-sweeper', daemon=True)
+    thread.start()
+    _sweeper['thread'] = thread
+    return thread
+
+
+def stop_sweeper():
+    _sweeper['stop'].set()
+
+
+def init_app(app):
+    """Run the background sweeper in each serving worker when OVERDUE_SWEEP_INTERVAL > 0.
+
+    Started on the worker's first request, like the rollup refresher, so
+    CLI commands and spawned helper processes never run a sweeper.
+    """
+    interval = app.config.get('OVERDUE_SWEEP_INTERVAL', 0)
+    if not interval:
+        return
+    batch_size = app.config.get('OVERDUE_SWEEP_BATCH', BATCH_SIZE)
+
+    def ensure_sweeper():
+        start_sweeper(interval, batch_size)
+
+    app.before_request(ensure_sweeper)
@@ -0,0 +1,78 @@
+"""
+SmartRide Pagination Helpers
+Opaque keyset cursors and windowed page lists for list views
+"""
+
+import json
+import base64
+import binascii
+
+
+def encode_cursor(key):
+    """Encode a sort-key value as an opaque URL-safe token"""
+    raw = json.dumps({'k': key}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a token from encode_cursor(); returns None if it is malformed"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))['k']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+
+
+def keyset_clause(key_column, after=None, before=None):
+    """WHERE fragment, ORDER BY fragment and params for a keyset page.
+
+    ``after`` pages forward (key > cursor, ascending); ``before`` pages back
+    (key < cursor, descending - callers reverse the rows afterwards).
+    """
+    if before is not None:
+        return f" AND {key_column} < %s", f" ORDER BY {key_column} DESC", [before]
+    if after is not None:
+        return f" AND {key_column} > %s", f" ORDER BY {key_column} ASC", [after]
+    return "", f" ORDER BY {key_column} ASC", []
+
+
+def keyset_page(rows, per_page, key, after=None, before=None, has_prev=None):
+    """Trim a LIMIT per_page + 1 result and work out the neighbouring cursors.
+
+    Returns ``(rows, prev_cursor, next_cursor)``; a cursor is None when
+    there is no page in that direction.
+    """
+    rows = list(rows or [])
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if before is not None:
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_next = more
+        if has_prev is None:
+            has_prev = after is not None
+    prev_cursor = encode_cursor(rows[0][key]) if rows and has_prev else None
+    next_cursor = encode_cursor(rows[-1][key]) if rows and has_next else None
+    return rows, prev_cursor, next_cursor
+
+
+def page_window(page, total_pages, radius=2):
+    """Page numbers around ``page`` with None marking elided gaps.
+
+    page_window(10, 40) -> [1, None, 8, 9, 10, 11, 12, None, 40]
+    """
+    if total_pages <= 1:
+        return [1]
+    pages = {1, total_pages}
+    pages.update(range(max(1, page - radius), min(total_pages, page + radius) + 1))
+    window = []
+    previous = 0
+    for p in sorted(pages):
+        if p - previous > 1:
+            window.append(None)
+        window.append(p)
+        previous = p
+    return window
@@ -0,0 +1,116 @@
+"""
+SmartRide Reference Data Cache
+Keeps the rarely-changing VehicleType table in memory
+"""
+
+import time
+import logging
+import threading
+
+from cache import TTLCache
+from db import execute_query
+
+logger = logging.getLogger(__name__)
+
+VERSION_NAME = 'VehicleType'
+
+_cache = TTLCache(ttl=300, maxsize=4, name='refdata')
+_EMPTY = {'list': [], 'by_id': {}, 'by_name': {}}
+_last_good = {'types': None}  # served while VehicleType can't be read
+_version_lock = threading.Lock()
+_version_state = {
+    'check_interval': 0,   # seconds between CacheVersion reads; 0 disables
+    'checked_at': 0.0,
+    'version': None,
+}
+
+
+def init_app(app):
+    """Apply REFDATA_TTL and REFDATA_VERSION_CHECK from app config"""
+    _cache.ttl = app.config.get('REFDATA_TTL', _cache.ttl)
+    _version_state['check_interval'] = app.config.get('REFDATA_VERSION_CHECK', 0)
+
+
+def _read_version():
+    row = execute_query("SELECT Version FROM CacheVersion WHERE Name = %s", (VERSION_NAME,), fetch_one=True)
+    return row['version'] if row else None
+
+
+def _check_version():
+    """Drop the local copy when another worker (or a trigger) bumped the stamp"""
+    interval = _version_state['check_interval']
+    if not interval:
+        return
+    now = time.monotonic()
+    with _version_lock:
+        if now - _version_state['checked_at'] < interval:
+            return
+        _version_state['checked_at'] = now
+    version = _read_version()
+    with _version_lock:
+        changed = version is not None and _version_state['version'] not in (None, version)
+        _version_state['version'] = version
+    if changed:
+        logger.info(f"{VERSION_NAME} version changed to {version}; reloading reference data")
+        _cache.invalidate()
+
+
+def _load_vehicle_types():
+    rows = execute_query("SELECT * FROM VehicleType ORDER BY Name", fetch_all=True)
+    if rows is None:
+        raise RuntimeError("Failed to load VehicleType")
+    types = {
+        'list': rows,
+        'by_id': {row['typeid']: row for row in rows},
+        'by_name': {row['name'].lower(): row for row in rows},
+    }
+    _last_good['types'] = types
+    return types
+
+
+def _types():
+    """Cached types; on a failed load, the last good copy (or nothing) until the next attempt"""
+    _check_version()
+    try:
+        return _cache.get('vehicle_types', _load_vehicle_types)
+    except RuntimeError as e:
+        stale = _last_good['types']
+        logger.error(f"{e}; serving {'the last good copy' if stale else 'no vehicle types'}")
+        return stale or _EMPTY
+
+
+def vehicle_types():
+    """All vehicle types ordered by name (rows shaped like execute_query's)"""
+    return _types()['list']
+
+
+def type_names():
+    """TypeID -> Name map"""
+    return {type_id: row['name'] for type_id, row in _types()['by_id'].items()}
+
+
+def type_name(type_id):
+    """Name for a TypeID, or None if unknown"""
+    row = _types()['by_id'].get(int(type_id)) if str(type_id).isdigit() else None
+    return row['name'] if row else None
+
+
+def type_id(name):
+    """TypeID for a type name (case-insensitive), or None if unknown"""
+    row = _types()['by_name'].get((name or '').strip().lower())
+    return row['typeid'] if row else None
+
+
+def invalidate(bump_version=True):
+    """Forget cached types; optionally bump the shared stamp for other workers
+
+    Returns True when the stamp was bumped, False when it wasn't asked for
+    or REFDATA_VERSION_CHECK is 0, and None when the bump failed.
+    """
+    _cache.invalidate()
+    if not (bump_version and _version_state['check_interval']):
+        return False
+    if execute_query("UPDATE CacheVersion SET Version = Version + 1 WHERE Name = %s", (VERSION_NAME,)) is None:
+        logger.error(f"Failed to bump the {VERSION_NAME} cache version")
+        return None
+    return True
@@ -0,0 +1,143 @@
+"""
+SmartRide Revenue Reports
+Set-based revenue aggregation over any date range and grouping
+"""
+
+import logging
+from datetime import date, timedelta
+
+import refdata
+import rollup
+from cache import TTLCache
+from db import execute_query
+
+logger = logging.getLogger(__name__)
+
+# Dimension -> (SELECT expressions for group id and label, extra joins, GROUP BY).
+# Every report is driven from Rental with a StartDate range predicate so
+# idx_rental_dates is usable.
+DIMENSIONS = {
+    'type': ("v.TypeID AS GroupID, NULL AS Label",
+             "JOIN Vehicle v ON r.VehicleID = v.VehicleID",
+             "v.TypeID"),
+    'vehicle': ("v.VehicleID AS GroupID, CONCAT(v.Make, ' ', v.Model, ' (', v.PlateNo, ')') AS Label",
+                "JOIN Vehicle v ON r.VehicleID = v.VehicleID",
+                "v.VehicleID"),
+    'customer': ("c.CustomerID AS GroupID, c.Name AS Label",
+                 "JOIN Customer c ON r.CustomerID = c.CustomerID",
+                 "c.CustomerID"),
+    'staff': ("r.ProcessedBy AS GroupID, COALESCE(MAX(s.Name), 'Unassigned') AS Label",
+              "LEFT JOIN Staff s ON r.ProcessedBy = s.StaffID",
+              "r.ProcessedBy"),
+}
+
+REPORT_QUERY = """
+    SELECT {select},
+           COUNT(*) AS rental_count,
+           SUM(r.TotalAmount) AS rental_revenue,
+           SUM(r.FineAmount) AS fine_revenue,
+           SUM(r.TotalAmount + r.FineAmount) AS total_revenue
+    FROM Rental r
+    {joins}
+    WHERE r.Status = 'COMPLETED'
+      AND r.StartDate >= %s AND r.StartDate < %s
+    GROUP BY {group_by}
+    ORDER BY total_revenue DESC
+"""
+
+ROLLUP_TYPE_QUERY = """
+    SELECT TypeID AS GroupID,
+           SUM(StartedCompleted) AS rental_count,
+           SUM(StartedRevenue) AS rental_revenue,
+           SUM(StartedFines) AS fine_revenue,
+           SUM(StartedRevenue + StartedFines) AS total_revenue
+    FROM DailyRollup
+    WHERE RollupDate BETWEEN %s AND %s
+    GROUP BY TypeID
+    ORDER BY total_revenue DESC
+"""
+
+# Rentals are attributed to the month they start in, so a range can still
+# change while any rental that started in it is open
+OLDEST_OPEN_RENTAL_QUERY = """
+    SELECT MIN(StartDate) AS oldest
+    FROM Rental
+    WHERE Status IN ('ACTIVE', 'OVERDUE')
+"""
+
+# Finalized ranges never change, so they are kept until evicted by LRU
+_finalized = TTLCache(ttl=float('inf'), maxsize=512, name='finalized-reports')
+
+
+def month_range(year, month):
+    """First and last day of a calendar month"""
+    first = date(year, month, 1)
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return first, following - timedelta(days=1)
+
+
+def is_finalized(start, end):
+    """True once no rental starting in ``[start, end]`` can still change.
+
+    That needs the range to end before the current month and before the
+    start of the oldest rental that is still ACTIVE or OVERDUE.
+    """
+    if end >= date.today().replace(day=1):
+        return False
+    row = execute_query(OLDEST_OPEN_RENTAL_QUERY, fetch_one=True)
+    if row is None:
+        return False
+    return row['oldest'] is None or end < row['oldest']
+
+
+def _compute(start, end, group_by, use_rollup):
+    # No rental can have started after today, so the rollup need only cover up to today
+    rollup_end = min(end, date.today())
+    if use_rollup and group_by == 'type' and rollup.covers(start, rollup_end):
+        rows = execute_query(ROLLUP_TYPE_QUERY, (start, rollup_end), fetch_all=True)
+    else:
+        select, joins, group = DIMENSIONS[group_by]
+        rows = execute_query(REPORT_QUERY.format(select=select, joins=joins, group_by=group),
+                             (start, end + timedelta(days=1)), fetch_all=True)
+    if rows is None:
+        raise RuntimeError("Failed to compute revenue report")
+
+    if group_by == 'type':
+        # Label from cached reference data, and list types with no rentals too
+        names = refdata.type_names()
+        seen = {row['groupid'] for row in rows}
+        for row in rows:
+            row['label'] = names.get(row['groupid'], str(row['groupid']))
+        rows.extend({'groupid': type_id, 'label': name, 'rental_count': 0, 'rental_revenue': 0,
+                     'fine_revenue': 0, 'total_revenue': 0}
+                    for type_id, name in names.items() if type_id not in seen)
+    return rows
+
+
+def revenue_report(start, end, group_by='type'):
+    """Revenue from COMPLETED rentals that started in ``[start, end]``, grouped.
+
+    ``group_by`` is one of DIMENSIONS. Rows carry ``groupid``, ``label``,
+    ``rental_count``, ``rental_revenue``, ``fine_revenue`` and
+    ``total_revenue``, largest total first. Open ranges grouped by type
+    read the DailyRollup table when it covers them; finalized ranges are
+    served from a permanent cache.
+    """
+    if group_by not in DIMENSIONS:
+        raise ValueError(f"Unknown report dimension '{group_by}'")
+    if start > end:
+        raise ValueError("Report start date is after its end date")
+    if is_finalized(start, end):
+        # Computed once from Rental itself, since a lagging rollup must never be cached forever
+        return _finalized.get((start, end, group_by), lambda: _compute(start, end, group_by, use_rollup=False))
+    return _compute(start, end, group_by, use_rollup=True)
+
+
+def monthly_report(year, month, group_by='type'):
+    """revenue_report() for one calendar month"""
+    return revenue_report(*month_range(year, month), group_by=group_by)
+
+
+def invalidate():
+    """Drop cached finalized reports (after correcting historical data)"""
+    _finalized.invalidate()
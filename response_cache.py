@@ -0,0 +1,300 @@
+"""
+SmartRide Response Cache
+Whole-response and fragment caching with tag-based invalidation, in memory or in Redis
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import Response, request, session
+
+from db import execute_query
+
+logger = logging.getLogger(__name__)
+
+TTL = 30
+MAX_ENTRIES = 1024
+MAX_BYTES = 32 * 1024 * 1024
+KEY_PREFIX = 'smartride:'
+
+
+class SharedTagVersions:
+    """Tag version counters shared by every worker through the CacheVersion table.
+
+    Each worker re-reads the ``tag:*`` rows at most every ``check_interval``
+    seconds, so a purge made in one worker reaches the others within that
+    interval. A purge bumps the row and reads it straight back, so this
+    worker sees its own purges at once. Versions are ``"<shared>.<local>"``:
+    the local part only moves when the database can't be reached, so a
+    failed bump still purges this worker and a version is never reused.
+    """
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._shared = {}
+        self._local = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+        rows = execute_query("SELECT Name, Version FROM CacheVersion WHERE Name LIKE 'tag:%%'", fetch_all=True)
+        if rows is None:
+            return
+        with self._lock:
+            for row in rows:
+                self._shared[row['name']] = row['version']
+
+    def counters(self, keys):
+        self._refresh()
+        with self._lock:
+            return [f"{self._shared.get(key, 0)}.{self._local.get(key, 0)}" for key in keys]
+
+    def incr(self, key):
+        bumped = execute_query("INSERT INTO CacheVersion (Name, Version) VALUES (%s, 1) "
+                               "ON DUPLICATE KEY UPDATE Version = Version + 1", (key,))
+        row = execute_query("SELECT Version FROM CacheVersion WHERE Name = %s", (key,),
+                            fetch_one=True) if bumped is not None else None
+        with self._lock:
+            if row is not None:
+                self._shared[key] = row['version']
+            else:
+                logger.error(f"Shared purge of '{key}' failed; purged in this worker only")
+                self._local[key] = self._local.get(key, 0) + 1
+
+
+class MemoryBackend:
+    """Per-worker LRU bounded by entry count and total size.
+
+    Tag versions are per worker too unless ``versions`` (a
+    SharedTagVersions) is given, in which case purges reach every worker.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, versions=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.versions = versions
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._counters = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._bytes += len(value)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def counters(self, keys):
+        if self.versions is not None:
+            return self.versions.counters(keys)
+        with self._lock:
+            return [self._counters.get(key, 0) for key in keys]
+
+    def incr(self, key):
+        if self.versions is not None:
+            self.versions.incr(key)
+            return
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def size(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes}
+
+
+class RedisBackend:
+    """Shared cache in Redis (or a compatible server), so a purge reaches every worker"""
+
+    def __init__(self, url):
+        import redis  # only needed when RESPONSE_CACHE_URL is set
+        self._client = redis.Redis.from_url(url, socket_timeout=0.25)
+        self.evictions = 0  # Redis evicts by its own maxmemory policy
+
+    def get(self, key):
+        return self._client.get(KEY_PREFIX + key)
+
+    def set(self, key, value, ttl):
+        self._client.set(KEY_PREFIX + key, value, ex=max(1, int(ttl)))
+
+    def counters(self, keys):
+        return [int(value or 0) for value in self._client.mget([KEY_PREFIX + key for key in keys])]
+
+    def incr(self, key):
+        self._client.incr(KEY_PREFIX + key)
+
+    def size(self):
+        return {'entries': None, 'bytes': None}
+
+
+class ResponseCache:
+    """Values keyed by endpoint and arguments, tagged by the data they show.
+
+    Each tag has a version counter that is part of every key it tags, so
+    purging a tag is one increment and stale entries simply stop being
+    read (the LRU or Redis expiry removes them). Backend errors count as
+    misses, so an unreachable Redis slows pages down but never breaks them.
+    """
+
+    def __init__(self, name, backend=None, ttl=TTL):
+        self.name = name
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'invalidations': 0, 'errors': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def key(self, endpoint, args, tags):
+        versions = self.backend.counters([f"tag:{tag}" for tag in tags])
+        tag_part = ','.join(f"{tag}.{version}" for tag, version in zip(tags, versions))
+        return f"{self.name}:{endpoint}:{normalize_args(args)}:{tag_part}"
+
+    def get(self, endpoint, args, tags=()):
+        """Cached bytes, or None; also returns the key to store under on a miss"""
+        try:
+            key = self.key(endpoint, args, tags)
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.error(f"{self.name} cache read failed: {e}")
+            self._count('errors')
+            return None, None
+        self._count('hits' if value is not None else 'misses')
+        return value, key
+
+    def set(self, key, value, ttl=None):
+        if key is None:
+            return
+        try:
+            self.backend.set(key, value, self.ttl if ttl is None else ttl)
+            self._count('sets')
+        except Exception as e:
+            logger.error(f"{self.name} cache write failed: {e}")
+            self._count('errors')
+
+    def invalidate_tag(self, tag):
+        try:
+            self.backend.incr(f"tag:{tag}")
+            self._count('invalidations')
+        except Exception as e:
+            logger.error(f"{self.name} cache purge of '{tag}' failed: {e}")
+            self._count('errors')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['evictions'] = self.backend.evictions
+        stats.update(self.backend.size())
+        return stats
+
+
+def normalize_args(args):
+    """Stable text for a dict (or MultiDict) of arguments: sorted, repeated keys kept"""
+    items = args.items(multi=True) if hasattr(args, 'getlist') else args.items()
+    return urlencode(sorted((str(k), '' if v is None else str(v)) for k, v in items))
+
+
+pages = ResponseCache('page')
+fragments = ResponseCache('fragment')
+
+
+def get_fragment(endpoint, args, tags=()):
+    """Cached HTML fragment as text, and the key to pass to set_fragment() on a miss"""
+    value, key = fragments.get(endpoint, args, tags)
+    return (value.decode('utf-8') if value is not None else None), key
+
+
+def set_fragment(key, html, ttl=None):
+    fragments.set(key, html.encode('utf-8'), ttl)
+
+
+def cached_page(tags=(), ttl=None):
+    """Serve a GET view from the page cache for visitors without a session.
+
+    Anything in the session (a login, pending flash messages) means the
+    page may be personalised, so those requests always render.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or session:
+                return view(*args, **kwargs)
+            value, key = pages.get(request.endpoint, request.args, tags)
+            if value is not None:
+                mimetype, _, body = value.partition(b'\n')
+                response = Response(body, mimetype=mimetype.decode('ascii'))
+                response.headers['X-Cache'] = 'HIT'
+                return response
+            response = view(*args, **kwargs)
+            if not isinstance(response, Response):
+                response = Response(response)
+            if response.status_code == 200 and not response.direct_passthrough:
+                pages.set(key, response.mimetype.encode('ascii') + b'\n' + response.get_data(), ttl)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidate_tag(tag):
+    """Purge every page and fragment tagged ``tag``"""
+    pages.invalidate_tag(tag)
+    fragments.invalidate_tag(tag)
+
+
+def stats():
+    return {'page': pages.stats(), 'fragment': fragments.stats()}
+
+
+def init_app(app):
+    """Size the caches (RESPONSE_CACHE_*) and use Redis when RESPONSE_CACHE_URL is set.
+
+    In memory, purges reach the other workers through CacheVersion every
+    RESPONSE_CACHE_VERSION_CHECK seconds (0 = this worker only).
+    """
+    url = app.config.get('RESPONSE_CACHE_URL')
+    check_interval = app.config.get('RESPONSE_CACHE_VERSION_CHECK', 0)
+    versions = SharedTagVersions(check_interval) if check_interval else None
+    for cache in (pages, fragments):
+        cache.ttl = app.config.get('RESPONSE_CACHE_TTL', TTL)
+        backend = None
+        if url:
+            try:
+                backend = RedisBackend(url)
+            except Exception as e:
+                logger.error(f"Response cache at {url} unavailable, caching in memory: {e}")
+        cache.backend = backend or MemoryBackend(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', MAX_ENTRIES),
+                                                 app.config.get('RESPONSE_CACHE_MAX_BYTES', MAX_BYTES),
+                                                 versions)
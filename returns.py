@@ -0,0 +1,239 @@
+"""
+SmartRide Return Processing
+Checks in a batch of rentals in one transaction, computing fines set-based like ProcessVehicleReturn
+"""
+
+import csv
+import time
+import logging
+from datetime import date, datetime
+
+from db import get_pool
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 200
+MAX_BATCH = 5000
+
+OPEN_STATUSES = ('ACTIVE', 'OVERDUE')
+
+LOCK_QUERY = """
+    SELECT RentalID, VehicleID, StartDate, Status
+    FROM Rental
+    WHERE RentalID IN ({placeholders})
+    FOR UPDATE
+"""
+# Same rule as ProcessVehicleReturn: 10% of the daily rate per day late.
+# The chunk's (RentalID, ReturnDate) pairs are joined in as a derived
+# table, so one statement completes the whole chunk.
+RETURN_UPDATE = """
+    UPDATE Rental r
+    JOIN ({pairs}) b ON b.RentalID = r.RentalID
+    SET r.ReturnDate = b.ReturnDate,
+        r.FineAmount = ROUND(GREATEST(DATEDIFF(b.ReturnDate, r.DueDate), 0) * r.DailyRate * 0.10, 2),
+        r.EstimatedFine = 0,
+        r.Status = 'COMPLETED',
+        r.ProcessedBy = %s
+    WHERE r.Status IN ('ACTIVE', 'OVERDUE')
+"""
+# A vehicle can also hold other bookings; it stays RENTED while one of them
+# has started, and vehicles pulled into maintenance while out keep that status
+VEHICLE_UPDATE = """
+    UPDATE Vehicle v
+    SET v.Status = 'AVAILABLE'
+    WHERE v.VehicleID IN ({placeholders}) AND v.Status <> 'MAINTENANCE'
+      AND NOT EXISTS (
+          SELECT 1 FROM Rental r
+          WHERE r.VehicleID = v.VehicleID AND r.Status IN ('ACTIVE', 'OVERDUE')
+            AND r.StartDate <= CURDATE()
+      )
+"""
+FINES_QUERY = "SELECT RentalID, FineAmount FROM Rental WHERE RentalID IN ({placeholders})"
+
+
+class ReturnReport:
+    """Per-rental outcome of one batch of returns"""
+
+    def __init__(self):
+        self.submitted = 0
+        self.returned = 0
+        self.rejected = 0
+        self.total_fines = 0
+        self.results = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def ok(self, rental_id, return_date, fine):
+        self.returned += 1
+        self.total_fines += fine
+        self.results.append({'rental_id': rental_id, 'return_date': return_date.isoformat(),
+                             'status': 'returned', 'fine': fine})
+
+    def reject(self, rental_id, return_date, error):
+        self.rejected += 1
+        self.results.append({'rental_id': rental_id,
+                             'return_date': return_date.isoformat() if return_date else None,
+                             'status': 'rejected', 'error': error})
+
+    def invalid(self, line, error):
+        """An input line (or API item) that didn't parse"""
+        self.rejected += 1
+        self.results.append({'rental_id': None, 'return_date': None, 'line': line,
+                             'status': 'rejected', 'error': error})
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def to_dict(self):
+        return {
+            'submitted': self.submitted,
+            'returned': self.returned,
+            'rejected': self.rejected,
+            'total_fines': self.total_fines,
+            'results': self.results,
+            'elapsed': round(self.elapsed, 3),
+        }
+
+
+def _parse_date(value, default):
+    value = str(value or '').strip()
+    if not value:
+        return default
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"invalid return date '{value}'")
+
+
+def parse_pair(rental_id, return_date=None, default=None):
+    """``(rental_id, return_date)`` from raw values; raises ValueError when either is malformed"""
+    rental_id = str(rental_id).strip().lstrip('#')
+    if not rental_id.isdigit():
+        raise ValueError(f"invalid RentalID '{rental_id}'")
+    return int(rental_id), _parse_date(return_date, default or date.today())
+
+
+def parse_lines(text, default_date=None):
+    """``(pairs, errors)`` from "RentalID[, YYYY-MM-DD]" lines; the date defaults to ``default_date`` or today"""
+    default_date = default_date or date.today()
+    pairs, errors = [], []
+    for line_no, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        rental_id, _, return_date = line.replace('\t', ',').replace(' ', ',').partition(',')
+        try:
+            pairs.append(parse_pair(rental_id, return_date.strip(', '), default_date))
+        except ValueError as e:
+            errors.append({'line': line_no, 'error': str(e)})
+    return pairs, errors
+
+
+def parse_csv(stream, default_date=None):
+    """``(pairs, errors)`` from a CSV with RentalID and (optionally) ReturnDate columns"""
+    default_date = default_date or date.today()
+    pairs, errors = [], []
+    for line_no, row in enumerate(csv.DictReader(stream), start=2):
+        row = {(key or '').strip().lower(): (value or '') for key, value in row.items()}
+        try:
+            pairs.append(parse_pair(row.get('rentalid') or row.get('rental_id', ''),
+                                    row.get('returndate') or row.get('return_date', ''), default_date))
+        except ValueError as e:
+            errors.append({'line': line_no, 'error': str(e)})
+    return pairs, errors
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def _validate(pairs, locked, report):
+    """Pairs that can be returned; everything else is rejected in ``report``"""
+    today = date.today()
+    valid = []
+    for rental_id, return_date in pairs:
+        row = locked.get(rental_id)
+        if row is None:
+            report.reject(rental_id, return_date, 'rental not found')
+        elif row['Status'] not in OPEN_STATUSES:
+            report.reject(rental_id, return_date, f"rental is already {row['Status'].lower()}")
+        elif return_date > today:
+            report.reject(rental_id, return_date, 'return date is in the future')
+        elif return_date < row['StartDate']:
+            report.reject(rental_id, return_date, f"return date is before the start date {row['StartDate']}")
+        else:
+            valid.append((rental_id, return_date))
+    return valid
+
+
+def process_returns(pairs, processed_by=None, chunk_size=CHUNK_SIZE, dry_run=False, parse_errors=()):
+    """Complete the rentals in ``pairs`` of ``(rental_id, return_date)`` in one transaction.
+
+    Each chunk is locked with SELECT ... FOR UPDATE, validated, then
+    completed with one multi-row UPDATE of Rental and one of Vehicle.
+    Unknown, already closed or misdated rentals are rejected without
+    affecting the rest, and so are the lines in ``parse_errors`` (from
+    parse_lines/parse_csv). Returns a ReturnReport; the caller drops the
+    vehicle caches (invalidate_vehicle_caches) when anything was returned.
+    """
+    report = ReturnReport()
+    report.submitted = len(pairs) + len(parse_errors)
+    if len(pairs) > MAX_BATCH:
+        raise ValueError(f"at most {MAX_BATCH} returns per batch")
+    for error in parse_errors:
+        report.invalid(error['line'], error['error'])
+
+    seen = set()
+    unique = []
+    for rental_id, return_date in pairs:
+        if rental_id in seen:
+            report.reject(rental_id, return_date, 'duplicate RentalID in batch')
+            continue
+        seen.add(rental_id)
+        unique.append((rental_id, return_date))
+    if not unique:
+        return report.finish()
+
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for chunk in _chunks(unique, chunk_size):
+                ids = [rental_id for rental_id, _ in chunk]
+                cursor.execute(LOCK_QUERY.format(placeholders=_placeholders(ids)), tuple(ids))
+                locked = {row['RentalID']: row for row in cursor.fetchall()}
+                valid = _validate(chunk, locked, report)
+                if not valid:
+                    continue
+
+                pairs_sql = ' UNION ALL '.join(
+                    ["SELECT CAST(%s AS UNSIGNED) AS RentalID, CAST(%s AS DATE) AS ReturnDate"]
+                    + ["SELECT %s, %s"] * (len(valid) - 1))
+                params = [value for pair in valid for value in pair]
+                cursor.execute(RETURN_UPDATE.format(pairs=pairs_sql), tuple(params + [processed_by]))
+
+                vehicle_ids = sorted({locked[rental_id]['VehicleID'] for rental_id, _ in valid})
+                cursor.execute(VEHICLE_UPDATE.format(placeholders=_placeholders(vehicle_ids)), tuple(vehicle_ids))
+
+                valid_ids = [rental_id for rental_id, _ in valid]
+                cursor.execute(FINES_QUERY.format(placeholders=_placeholders(valid_ids)), tuple(valid_ids))
+                fines = {row['RentalID']: row['FineAmount'] for row in cursor.fetchall()}
+                for rental_id, return_date in valid:
+                    report.ok(rental_id, return_date, fines.get(rental_id) or 0)
+
+            if dry_run:
+                conn.rollback()
+            else:
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    return report.finish()
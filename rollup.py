@@ -0,0 +1,263 @@
+"""
+SmartRide Daily Rollup
+Maintains the DailyRollup fact table (one row per day and vehicle type)
+"""
+
+import time
+import logging
+import threading
+from datetime import date, timedelta
+
+import MySQLdb
+
+from db import execute_query, get_pool
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = 'smartride_daily_rollup'
+BACKFILL_CHUNK_DAYS = 92
+# Rentals updated this long before a refresh started are looked at again by
+# the next one, to catch transactions that committed after the refresh read
+WATERMARK_MARGIN = timedelta(minutes=5)
+
+# Rentals touched since the last refresh; idx_rental_updated keeps this cheap
+DIRTY_QUERY = """
+    SELECT MIN(StartDate) AS first_dirty
+    FROM Rental
+    WHERE UpdatedAt >= %s
+"""
+STARTED_QUERY = """
+    SELECT r.StartDate AS Day, v.TypeID,
+           COUNT(*) AS started,
+           SUM(r.Status = 'COMPLETED') AS started_completed,
+           SUM(CASE WHEN r.Status = 'COMPLETED' THEN r.TotalAmount ELSE 0 END) AS started_revenue,
+           SUM(CASE WHEN r.Status = 'COMPLETED' THEN r.FineAmount ELSE 0 END) AS started_fines
+    FROM Rental r
+    JOIN Vehicle v ON r.VehicleID = v.VehicleID
+    WHERE r.StartDate BETWEEN %s AND %s AND r.Status <> 'CANCELLED'
+    GROUP BY r.StartDate, v.TypeID
+"""
+RETURNED_QUERY = """
+    SELECT r.ReturnDate AS Day, v.TypeID,
+           COUNT(*) AS completed,
+           SUM(r.TotalAmount) AS revenue,
+           SUM(r.FineAmount) AS fines
+    FROM Rental r
+    JOIN Vehicle v ON r.VehicleID = v.VehicleID
+    WHERE r.Status = 'COMPLETED' AND r.ReturnDate BETWEEN %s AND %s
+    GROUP BY r.ReturnDate, v.TypeID
+"""
+# A vehicle counts as rented on every day from StartDate through its
+# ReturnDate, or through today while the rental is still open
+VEHICLE_DAYS_QUERY = """
+    WITH RECURSIVE days (Day) AS (
+        SELECT CAST(%s AS DATE)
+        UNION ALL
+        SELECT Day + INTERVAL 1 DAY FROM days WHERE Day < %s
+    )
+    SELECT days.Day, v.TypeID, COUNT(*) AS vehicle_days
+    FROM days
+    JOIN Rental r ON r.StartDate <= days.Day
+                 AND COALESCE(r.ReturnDate, CURDATE()) >= days.Day
+    JOIN Vehicle v ON r.VehicleID = v.VehicleID
+    WHERE r.Status <> 'CANCELLED'
+      AND r.StartDate <= %s AND COALESCE(r.ReturnDate, CURDATE()) >= %s
+    GROUP BY days.Day, v.TypeID
+"""
+DELETE_RANGE = "DELETE FROM DailyRollup WHERE RollupDate BETWEEN %s AND %s"
+INSERT_ROW = """
+    INSERT INTO DailyRollup (RollupDate, TypeID, Revenue, Fines, RentalsStarted, RentalsCompleted,
+                             VehicleDaysRented, StartedCompleted, StartedRevenue, StartedFines, RefreshedAt)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+MEASURES = ('revenue', 'fines', 'started', 'completed', 'vehicle_days',
+            'started_completed', 'started_revenue', 'started_fines')
+
+_refresher = {'thread': None, 'stop': threading.Event()}
+
+
+def _days(start, end):
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def compute_range(cursor, start, end):
+    """Rollup rows for ``[start, end]``: ``{(day, type_id): {measure: value}}``.
+
+    Every day gets a row for every vehicle type (zeros included), so a
+    covered range can be recognised by its row count.
+    """
+    cursor.execute("SELECT TypeID FROM VehicleType")
+    type_ids = [row['TypeID'] for row in cursor.fetchall()]
+    rows = {(day, type_id): dict.fromkeys(MEASURES, 0) for day in _days(start, end) for type_id in type_ids}
+
+    for query, params in ((STARTED_QUERY, (start, end)),
+                          (RETURNED_QUERY, (start, end)),
+                          (VEHICLE_DAYS_QUERY, (start, end, end, start))):
+        cursor.execute(query, params)
+        for row in cursor.fetchall():
+            target = rows.get((row['Day'], row['TypeID']))
+            if target is None:
+                continue
+            for measure in MEASURES:
+                if measure in row:
+                    target[measure] = row[measure] or 0
+    return rows
+
+
+def rebuild_range(start, end, conn=None, refreshed_at=None):
+    """Replace DailyRollup rows for ``[start, end]`` in one transaction; returns row count
+
+    Rows are stamped with ``refreshed_at`` (default NOW()), which must not be
+    later than the moment the rentals they summarise were read.
+    """
+    end = min(end, date.today())
+    if start > end:
+        return 0
+    if conn is None:
+        with get_pool().connection() as pooled:
+            return rebuild_range(start, end, pooled, refreshed_at)
+
+    cursor = conn.cursor()
+    try:
+        if refreshed_at is None:
+            cursor.execute("SELECT NOW() AS now")
+            refreshed_at = cursor.fetchone()['now']
+        rows = compute_range(cursor, start, end)
+        cursor.execute(DELETE_RANGE, (start, end))
+        cursor.executemany(INSERT_ROW, [
+            (day, type_id, m['revenue'], m['fines'], m['started'], m['completed'], m['vehicle_days'],
+             m['started_completed'], m['started_revenue'], m['started_fines'], refreshed_at)
+            for (day, type_id), m in sorted(rows.items())
+        ])
+        conn.commit()
+        return len(rows)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def backfill(start=None, end=None, chunk_days=BACKFILL_CHUNK_DAYS, refreshed_at=None):
+    """Rebuild the rollup from the first rental (or ``start``) through ``end``.
+
+    Works in chunks of ``chunk_days`` so each transaction stays short and
+    the day-calendar CTE stays under cte_max_recursion_depth. Every chunk
+    is stamped with the same ``refreshed_at`` (default NOW() before the
+    first chunk), so an update landing between chunks is newer than the
+    watermark and the next refresh picks it up.
+    """
+    if refreshed_at is None:
+        row = execute_query("SELECT NOW() AS now", fetch_one=True)
+        if row is None:
+            raise RuntimeError("Failed to read the database clock")
+        refreshed_at = row['now']
+    if start is None:
+        row = execute_query("SELECT MIN(StartDate) AS first FROM Rental", fetch_one=True)
+        start = row['first'] if row and row['first'] else date.today()
+    end = min(end or date.today(), date.today())
+    written = 0
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end)
+        written += rebuild_range(chunk_start, chunk_end, refreshed_at=refreshed_at)
+        chunk_start = chunk_end + timedelta(days=1)
+    return written
+
+
+def refresh():
+    """Incrementally bring the rollup up to date; returns the rebuilt range or None.
+
+    The watermark is the newest RefreshedAt, i.e. when the previous refresh
+    started, less WATERMARK_MARGIN. Days from the earliest StartDate among
+    rentals updated since then are rebuilt, and so is every day since the
+    watermark, because open rentals add a rented day each day without their
+    row changing. An empty table is backfilled. Only one worker refreshes
+    at a time (GET_LOCK).
+    """
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, 0) AS acquired", (LOCK_NAME,))
+            if not cursor.fetchone()['acquired']:
+                return None
+            try:
+                cursor.execute("SELECT NOW() AS now")
+                refreshed_at = cursor.fetchone()['now']
+                cursor.execute("SELECT MAX(RefreshedAt) AS watermark FROM DailyRollup")
+                watermark = cursor.fetchone()['watermark']
+                if watermark is None:
+                    start = None
+                else:
+                    watermark -= WATERMARK_MARGIN
+                    cursor.execute(DIRTY_QUERY, (watermark,))
+                    first_dirty = cursor.fetchone()['first_dirty']
+                    start = watermark.date()
+                    if first_dirty is not None and first_dirty < start:
+                        start = first_dirty
+                conn.commit()
+                backfill(start, date.today(), refreshed_at=refreshed_at)
+                return (start, date.today())
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+                cursor.fetchall()
+        finally:
+            cursor.close()
+
+
+def covers(start, end):
+    """True if every day in ``[start, end]`` has rollup rows"""
+    if end > date.today():
+        return False
+    row = execute_query(
+        "SELECT COUNT(DISTINCT RollupDate) AS days FROM DailyRollup WHERE RollupDate BETWEEN %s AND %s",
+        (start, end), fetch_one=True
+    )
+    return bool(row) and row['days'] == (end - start).days + 1
+
+
+def _refresh_loop(interval, stop):
+    while not stop.is_set():
+        started = time.monotonic()
+        try:
+            refresh()
+        except MySQLdb.Error as e:
+            logger.error(f"DailyRollup refresh failed: {e}")
+        except Exception as e:
+            logger.error(f"DailyRollup refresh error: {e}")
+        stop.wait(max(1.0, interval - (time.monotonic() - started)))
+
+
+def start_refresher(interval):
+    """Refresh the rollup every ``interval`` seconds on a daemon thread"""
+    thread = _refresher['thread']
+    if thread is not None and thread.is_alive():
+        return thread
+    _refresher['stop'].clear()
+    thread = threading.Thread(target=_refresh_loop, args=(interval, _refresher['stop']),
+                              name='daily-rollup', daemon=True)
+    thread.start()
+    _refresher['thread'] = thread
+    return thread
+
+
+def stop_refresher():
+    _refresher['stop'].set()
+
+
+def init_app(app):
+    """Run the background refresher in each serving worker when ROLLUP_REFRESH_INTERVAL > 0.
+
+    The thread starts on the worker's first request rather than at import,
+    so CLI commands, spawned helper processes and a preloading master
+    (whose threads would not survive the fork) never start one.
+    """
+    interval = app.config.get('ROLLUP_REFRESH_INTERVAL', 0)
+    if not interval:
+        return
+
+    def ensure_refresher():
+        start_refresher(interval)
+
+    app.before_request(ensure_refresher)
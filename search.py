@@ -0,0 +1,94 @@
+"""
+SmartRide Search
+Index-friendly search over vehicles and customers
+
+Leading-wildcard ``LIKE '%term%'`` forces a full scan, so a search term is
+turned into a derived table of matching primary keys built from:
+
+- prefix lookups (``col LIKE 'term%'``) on the B-tree indexed identifier
+  columns - plate number, email, licence number - ranked first, and
+- a ``MATCH ... AGAINST`` branch over the FULLTEXT index, ranked by
+  relevance.
+
+Each branch is its own SELECT joined with UNION ALL, so every branch can use
+its own index. The caller joins the hits back to the base table.
+"""
+
+import re
+
+# InnoDB ignores FULLTEXT tokens shorter than innodb_ft_min_token_size (3)
+MIN_TOKEN_SIZE = 3
+
+# Ranks above any MATCH() relevance so exact identifier prefixes sort first
+PREFIX_RANK = 1000
+
+_BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@.]+')
+_IDENTIFIER = re.compile(r'^[\w.@+-]+$')
+
+SEARCH_TARGETS = {
+    'vehicle': {
+        'table': 'Vehicle',
+        'key': 'VehicleID',
+        'fulltext': ('Make', 'Model', 'PlateNo'),
+        'prefix': ('PlateNo',),
+        'fallback': ('Make', 'Model'),
+    },
+    'customer': {
+        'table': 'Customer',
+        'key': 'CustomerID',
+        'fulltext': ('Name', 'Email', 'LicenseNo'),
+        'prefix': ('Email', 'LicenseNo'),
+        'fallback': ('Name',),
+    },
+}
+
+
+def escape_like(value):
+    """Escape LIKE wildcards so user input only matches literally"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def boolean_query(term):
+    """Turn free text into a BOOLEAN MODE query requiring every word as a prefix.
+
+    Returns '' when no word is long enough for the FULLTEXT index.
+    """
+    words = _BOOLEAN_OPERATORS.sub(' ', term).split()
+    return ' '.join(f'+{w}*' for w in words if len(w) >= MIN_TOKEN_SIZE)
+
+
+def hits_query(target, term):
+    """Build ``(sql, params)`` selecting ``(key, relevance)`` rows for ``term``.
+
+    Returns None when the term is empty.
+    """
+    spec = SEARCH_TARGETS[target]
+    term = (term or '').strip()
+    if not term:
+        return None
+
+    table, key = spec['table'], spec['key']
+    branches, params = [], []
+
+    if _IDENTIFIER.match(term):
+        prefix = escape_like(term) + '%'
+        for column in spec['prefix']:
+            branches.append(f"SELECT {key}, {PREFIX_RANK} AS relevance FROM {table} WHERE {column} LIKE %s")
+            params.append(prefix)
+
+    against = boolean_query(term)
+    if against:
+        match = f"MATCH({', '.join(spec['fulltext'])}) AGAINST (%s IN BOOLEAN MODE)"
+        branches.append(f"SELECT {key}, {match} AS relevance FROM {table} WHERE {match}")
+        params.extend([against, against])
+    else:
+        # Too short for the FULLTEXT index: prefix-match the descriptive columns
+        prefix = escape_like(term) + '%'
+        condition = ' OR '.join(f"{column} LIKE %s" for column in spec['fallback'])
+        branches.append(f"SELECT {key}, 1 AS relevance FROM {table} WHERE {condition}")
+        params.extend([prefix] * len(spec['fallback']))
+
+    sql = (f"SELECT {key}, MAX(relevance) AS relevance FROM ("
+           + " UNION ALL ".join(branches)
+           + f") search_hits GROUP BY {key}")
+    return sql, params
@@ -410,10 +410,33 @@ ThemeManager.init();
 
 // Dashboard Functions
 const Dashboard = {
+    etag: null,
+    
     refreshStats: function() {
-        makeRequest('/api/dashboard/stats')
+        const container = document.querySelector('.dashboard-stats');
+        const scope = container ? container.getAttribute('data-stats-scope') : null;
+        const url = scope ? `/api/dashboard/stats?scope=${scope}` : '/api/dashboard/stats';
+        const headers = {};
+        if (this.etag) {
+            headers['If-None-Match'] = this.etag;
+        }
+        
+        // Bypass the browser cache so a 304 reaches us instead of a cached 200
+        fetch(url, { headers: headers, cache: 'no-store', credentials: 'same-origin' })
+            .then(response => {
+                if (response.status === 304) {
+                    return null;
+                }
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                this.etag = response.headers.get('ETag');
+                return response.json();
+            })
             .then(data => {
-                this.updateStats(data);
+                if (data) {
+                    this.updateStats(data);
+                }
             })
             .catch(error => {
                 console.error('Failed to refresh stats:', error);
@@ -430,11 +453,11 @@ const Dashboard = {
     }
 };
 
-// Auto-refresh dashboard every 5 minutes
+// Auto-refresh dashboard every minute; unchanged stats cost a bodiless 304
 if (document.querySelector('.dashboard-stats')) {
     setInterval(() => {
         Dashboard.refreshStats();
-    }, 300000); // 5 minutes
+    }, 60000); // 1 minute
 }
 
 // Initialize search on load
@@ -0,0 +1,155 @@
+"""
+SmartRide Dashboard Statistics Service
+Computes the admin dashboard snapshot once and shares it across requests
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+
+import async_db
+import fanout
+from cache import TTLCache
+from db import execute_query
+
+logger = logging.getLogger(__name__)
+
+# Each entry is (sql, fetch_all). Kept independent of one another so they
+# can be issued in any order.
+ADMIN_DASHBOARD_QUERIES = {
+    # Fleet status and per-type availability in one GROUP BY
+    'fleet': ("""
+        SELECT vt.TypeID, vt.Name, v.Status, COUNT(v.VehicleID) AS count
+        FROM VehicleType vt
+        LEFT JOIN Vehicle v ON vt.TypeID = v.TypeID
+        GROUP BY vt.TypeID, vt.Name, v.Status
+    """, True),
+    # Open rentals; OVERDUE is set by the overdue sweeper, so both counts
+    # come from idx_rental_status_due
+    'rentals': ("""
+        SELECT COUNT(*) AS active_rentals,
+               COALESCE(SUM(Status = 'OVERDUE'), 0) AS overdue_rentals
+        FROM Rental
+        WHERE Status IN ('ACTIVE', 'OVERDUE')
+    """, False),
+    # Read from the DailyRollup fact table (a few rows per day) instead of
+    # Rental; covered_days is the rollup.covers() check done in the same read
+    'revenue': ("""
+        SELECT COALESCE(SUM(Revenue + Fines), 0) AS monthly_revenue,
+               COALESCE(SUM(CASE WHEN RollupDate = CURDATE()
+                                 THEN Revenue + Fines END), 0) AS daily_revenue,
+               COUNT(DISTINCT RollupDate) AS covered_days,
+               DAYOFMONTH(CURDATE()) AS month_days
+        FROM DailyRollup
+        WHERE RollupDate >= CURDATE() - INTERVAL (DAYOFMONTH(CURDATE()) - 1) DAY
+          AND RollupDate <= CURDATE()
+    """, False),
+    'customers': ("SELECT COUNT(*) AS total_customers FROM Customer", False),
+    'recent_rentals': ("""
+        SELECT r.RentalID, r.StartDate, r.DueDate, r.Status,
+               c.Name as CustomerName, v.Make, v.Model
+        FROM Rental r
+        JOIN Customer c ON r.CustomerID = c.CustomerID
+        JOIN Vehicle v ON r.VehicleID = v.VehicleID
+        ORDER BY r.StartDate DESC LIMIT 10
+    """, True),
+}
+
+# Same figures from Rental, for when the rollup doesn't cover the month
+# yet (fresh deploy, before rollup-backfill, or a stopped refresher)
+REVENUE_FALLBACK_QUERY = """
+    SELECT COALESCE(SUM(TotalAmount + FineAmount), 0) AS monthly_revenue,
+           COALESCE(SUM(CASE WHEN ReturnDate = CURDATE()
+                             THEN TotalAmount + FineAmount END), 0) AS daily_revenue
+    FROM Rental
+    WHERE Status = 'COMPLETED'
+      AND ReturnDate >= CURDATE() - INTERVAL (DAYOFMONTH(CURDATE()) - 1) DAY
+      AND ReturnDate <= CURDATE()
+"""
+
+_cache = TTLCache(ttl=30, maxsize=4, refresh_ahead=0.75, name='dashboard-stats')
+
+
+def init_app(app):
+    """Apply DASHBOARD_STATS_TTL from app config"""
+    _cache.ttl = app.config.get('DASHBOARD_STATS_TTL', _cache.ttl)
+
+
+def build_admin_snapshot(results):
+    """Assemble the dashboard context from the ADMIN_DASHBOARD_QUERIES results"""
+    stats = {
+        'total_vehicles': 0,
+        'available_vehicles': 0,
+        'rented_vehicles': 0,
+        'maintenance_vehicles': 0,
+    }
+    type_stats = {}
+    for row in results.get('fleet') or []:
+        key = f"{row['name'].lower()}_stats"
+        bucket = type_stats.setdefault(key, {'total': 0, 'available': 0})
+        if row['status'] is None:
+            continue  # type with no vehicles
+        count = int(row['count'] or 0)
+        bucket['total'] += count
+        stats['total_vehicles'] += count
+        if row['status'] == 'AVAILABLE':
+            bucket['available'] += count
+            stats['available_vehicles'] += count
+        elif row['status'] == 'RENTED':
+            stats['rented_vehicles'] += count
+        elif row['status'] == 'MAINTENANCE':
+            stats['maintenance_vehicles'] += count
+
+    rentals = results.get('rentals') or {}
+    stats['active_rentals'] = int(rentals.get('active_rentals') or 0)
+    stats['overdue_rentals'] = int(rentals.get('overdue_rentals') or 0)
+
+    customers = results.get('customers') or {}
+    stats['total_customers'] = int(customers.get('total_customers') or 0)
+
+    revenue = results.get('revenue') or {}
+    stats['monthly_revenue'] = f"{revenue.get('monthly_revenue') or 0:.2f}"
+    stats['daily_revenue'] = f"{revenue.get('daily_revenue') or 0:.2f}"
+
+    return {
+        'stats': stats,
+        'type_stats': type_stats,
+        'recent_rentals': results.get('recent_rentals') or [],
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+def _rollup_covers_month(revenue):
+    return bool(revenue) and revenue['covered_days'] == revenue['month_days']
+
+
+def compute_admin_snapshot():
+    """Query the database for a fresh dashboard snapshot"""
+    # Concurrently, so a miss costs the slowest query rather than their sum
+    if async_db.enabled():
+        results = async_db.run(async_db.gather_queries(ADMIN_DASHBOARD_QUERIES))
+    else:
+        results = fanout.run_parallel(ADMIN_DASHBOARD_QUERIES)
+    if not _rollup_covers_month(results.get('revenue')):
+        logger.info("DailyRollup doesn't cover this month yet; dashboard revenue read from Rental")
+        results['revenue'] = execute_query(REVENUE_FALLBACK_QUERY, fetch_one=True)
+    return build_admin_snapshot(results)
+
+
+def get_admin_snapshot():
+    """Cached dashboard snapshot shared by every admin in this worker"""
+    return _cache.get('admin', compute_admin_snapshot)
+
+
+async def get_admin_snapshot_async():
+    """get_admin_snapshot() for async views; a miss loads off the view's event loop"""
+    return await asyncio.to_thread(get_admin_snapshot)
+
+
+def invalidate():
+    """Forget the cached snapshot after a write that changes the dashboard"""
+    _cache.invalidate()
+
+
+def cache_stats():
+    return _cache.stats()
@@ -0,0 +1,62 @@
+"""
+SmartRide Dashboard Query Count
+Guards the customer dashboard's round-trip budget without a database
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip('MySQLdb')
+
+os.environ.setdefault('ROLLUP_REFRESH_INTERVAL', '0')
+os.environ.setdefault('OVERDUE_SWEEP_INTERVAL', '0')
+
+import app as smartride  # noqa: E402
+
+STATS_ROW = {'active_rentals': 2, 'completed_rentals': 5, 'total_spent': 450, 'pending_reservations': 1}
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    """Every statement the request issues, through either data-access path"""
+    issued = []
+
+    def record(query, fetch_one):
+        issued.append(query)
+        return dict(STATS_ROW) if fetch_one else []
+
+    async def async_execute(query, params=None, fetch_one=False, fetch_all=False):
+        return record(query, fetch_one)
+
+    def sync_execute(query, params=None, fetch_one=False, fetch_all=False):
+        return record(query, fetch_one)
+
+    monkeypatch.setattr(smartride.async_db, 'execute_query', async_execute)
+    monkeypatch.setattr(smartride, 'execute_query', sync_execute)
+    return issued
+
+
+@pytest.fixture
+def customer_client():
+    client = smartride.app.test_client()
+    with client.session_transaction() as session:
+        session['customer_id'] = 1
+        session['customer_name'] = 'Test Customer'
+    return client
+
+
+def test_customer_dashboard_issues_three_queries(queries, customer_client):
+    response = customer_client.get('/customer/dashboard')
+
+    assert response.status_code == 200
+    # One aggregated stats query plus the two short lists
+    assert len(queries) == 3
+    assert queries.count(smartride.CUSTOMER_STATS_QUERY) == 1
+    assert not any('GetCustomerTotalSpending' in query for query in queries)
+
+
+def test_customer_dashboard_renders_aggregated_stats(queries, customer_client):
+    body = customer_client.get('/customer/dashboard').get_data(as_text=True)
+
+    assert '450.00' in body
@@ -0,0 +1,136 @@
+"""
+SmartRide Rollup Watermark
+Checks that an update landing between backfill chunks is picked up by the next refresh
+"""
+
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import pytest
+
+pytest.importorskip('MySQLdb')
+
+import rollup  # noqa: E402
+
+
+class FakeDatabase:
+    """Just enough of Rental and DailyRollup for refresh(); NOW() ticks on every read"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.rentals = {}      # RentalID -> {'StartDate', 'UpdatedAt'}
+        self.stamps = {}       # RollupDate -> RefreshedAt
+        self.on_delete = None  # called as each chunk replaces its rows
+
+    def now(self):
+        self.clock += timedelta(seconds=10)
+        return self.clock
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def execute(self, query, params=()):
+        db = self.db
+        if 'GET_LOCK' in query:
+            self.rows = [{'acquired': 1}]
+        elif 'NOW()' in query:
+            self.rows = [{'now': db.now()}]
+        elif 'MAX(RefreshedAt)' in query:
+            self.rows = [{'watermark': max(db.stamps.values(), default=None)}]
+        elif query == rollup.DIRTY_QUERY:
+            dirty = [r['StartDate'] for r in db.rentals.values() if r['UpdatedAt'] >= params[0]]
+            self.rows = [{'first_dirty': min(dirty, default=None)}]
+        elif 'FROM VehicleType' in query:
+            self.rows = [{'TypeID': 1}]
+        elif query == rollup.DELETE_RANGE:
+            if db.on_delete:
+                db.on_delete()
+            self.rows = []
+        else:
+            self.rows = []
+
+    def executemany(self, query, rows):
+        for row in rows:
+            self.db.stamps[row[0]] = row[-1]
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, db):
+        self.db = db
+
+    @contextmanager
+    def connection(self):
+        yield FakeConnection(self.db)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    today = date.today()
+    db = FakeDatabase(datetime.combine(today, datetime.min.time()) - timedelta(hours=1))
+    # Rolled up an hour ago, back to well before the rentals below
+    for offset in range(200):
+        db.stamps[today - timedelta(days=offset)] = db.clock
+    monkeypatch.setattr(rollup, 'get_pool', lambda: FakePool(db))
+    return db
+
+
+def test_update_between_backfill_chunks_is_seen_by_the_next_refresh(db):
+    today = date.today()
+    # Dirty rental far enough back that the refresh takes two chunks
+    db.rentals[1] = {'StartDate': today - timedelta(days=150), 'UpdatedAt': db.now()}
+    db.rentals[2] = {'StartDate': today - timedelta(days=140), 'UpdatedAt': db.clock - timedelta(hours=2)}
+
+    deletes = []
+
+    def update_rental_2_after_first_chunk():
+        deletes.append(db.clock)
+        if len(deletes) == 1:
+            # Lands after the first chunk read its rentals, before the second chunk starts
+            db.rentals[2]['UpdatedAt'] = db.now()
+
+    db.on_delete = update_rental_2_after_first_chunk
+    first = rollup.refresh()
+    assert first[0] == today - timedelta(days=150)
+    assert len(deletes) == 2
+    # One stamp for the whole run, taken before either chunk read anything
+    assert len({db.stamps[today - timedelta(days=offset)] for offset in range(151)}) == 1
+
+    db.on_delete = None
+    second = rollup.refresh()
+    assert second[0] <= today - timedelta(days=140)
+
+
+def test_late_commit_inside_the_margin_is_seen_by_the_next_refresh(db):
+    today = date.today()
+    rollup.refresh()
+    watermark = max(db.stamps.values())
+
+    # Updated just before the refresh read NOW(), but committed after it
+    db.rentals[3] = {'StartDate': today - timedelta(days=30), 'UpdatedAt': watermark - timedelta(seconds=30)}
+    assert rollup.refresh()[0] == today - timedelta(days=30)
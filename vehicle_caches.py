@@ -0,0 +1,20 @@
+"""
+SmartRide Vehicle Caches
+Caches derived from the Vehicle table, and the one call that drops them after a write
+"""
+
+import availability
+import response_cache
+import stats_service
+from cache import TTLCache
+
+# Filtered fleet counts for the admin vehicle list; exact but cached briefly
+vehicle_count_cache = TTLCache(ttl=60, maxsize=256, name='vehicle-counts')
+
+
+def invalidate_vehicle_caches(reindex=True):
+    """Drop cached data derived from the Vehicle table after a write"""
+    stats_service.invalidate()
+    availability.invalidate(reindex=reindex)
+    vehicle_count_cache.invalidate()
+    response_cache.invalidate_tag('vehicles')